@@ -0,0 +1,47 @@
+"""Bulk writes with Postgres COPY."""
+
+from django.db import connection
+
+
+class RowStream:
+    """File-like object that feeds COPY ... FROM STDIN from an iterable of
+    rows, so no table is ever held in memory as a whole."""
+
+    def __init__(self, rows):
+        self._lines = ("\t".join(map(str, row)) + "\n" for row in rows)
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            chunk = line.encode()
+            chunks.append(chunk)
+            length += len(chunk)
+        data = b"".join(chunks)
+        if size < 0:
+            size = len(data)
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def copy_rows(model, columns, rows) -> None:
+    table = connection.ops.quote_name(model._meta.db_table)
+    fields = ", ".join(connection.ops.quote_name(column) for column in columns)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({fields}) FROM STDIN", RowStream(rows))
+
+
+def reserve_ids(model, count: int) -> list[int]:
+    """Takes count ids off the sequence of the model's table, for rows
+    written with COPY that other rows have to point at."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+            "FROM generate_series(1, %s)",
+            [connection.ops.quote_name(model._meta.db_table), count],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,241 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from airport_service import metrics
+from airport_service.db_router import primary
+
+_stats_lock = threading.Lock()
+_stats = Counter()
+
+
+def cache_stats() -> dict:
+    """Hits and misses of the response cache in this process,
+    keyed by (viewset basename, "hit" or "miss")."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(basename: str, outcome: str) -> None:
+    with _stats_lock:
+        _stats[(basename, outcome)] += 1
+    metrics.response_cache_requests.labels(basename, outcome).inc()
+
+
+def _version_key(model) -> str:
+    return f"airport:version:{model._meta.label_lower}"
+
+
+def model_versions(models) -> list[int]:
+    """Versions of the tables behind the models.
+
+    A version is the time of the last write to the table in nanoseconds.
+    Missing versions are seeded with the current time, so an evicted
+    version never comes back with a value that was already used.
+    """
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def amodel_versions(models) -> list[int]:
+    keys = [_version_key(model) for model in models]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model) -> None:
+    key = _version_key(model)
+    cache.set(key, max(time.time_ns(), (cache.get(key) or 0) + 1), timeout=None)
+
+
+def written_reads(versions):
+    """Keeps the reads of a response on the primary while the replicas
+    may still lag behind the latest write to its tables.
+
+    Whatever the response reads is cached or validated under the new
+    versions, where rows from before the write would outlive the lag.
+    """
+    if settings.DATABASE_REPLICAS and versions:
+        if time.time_ns() - max(versions) < settings.REPLICA_PIN_SECONDS * 10**9:
+            return primary()
+    return nullcontext()
+
+
+class CachedResponseMixin:
+    """Caches list and retrieve responses of a viewset.
+
+    Entries are keyed by the full URL, the role of the user and the
+    versions of ``cache_models``, so a write to any of those tables
+    makes the previous entries unreachable.
+    """
+
+    cache_models = ()
+
+    def response_cache_key(self, request, versions) -> str:
+        role = "staff" if request.user.is_staff else "user"
+        versions = ":".join(map(str, versions))
+        url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        return f"airport:response:{self.basename}:{role}:{versions}:{url}"
+
+    def cached_response(self, view, request, *args, **kwargs):
+        versions = model_versions(self.cache_models)
+        key = self.response_cache_key(request, versions)
+
+        data = cache.get(key)
+        if data is not None:
+            _count(self.basename, "hit")
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        _count(self.basename, "miss")
+        with written_reads(versions):
+            response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
+
+    async def acached_response(self, view, request, *args, **kwargs):
+        versions = await amodel_versions(self.cache_models)
+        key = self.response_cache_key(request, versions)
+
+        data = await cache.aget(key)
+        if data is not None:
+            _count(self.basename, "hit")
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        _count(self.basename, "miss")
+        with written_reads(versions):
+            response = await view(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(
+                key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT
+            )
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(super().aretrieve, request, *args, **kwargs)
+
+
+class ConditionalResponseMixin:
+    """Answers conditional list and retrieve requests with 304 Not Modified.
+
+    The ETag is derived from the URL, the user, the negotiated renderer
+    and the versions of ``cache_models``; Last-Modified is the latest of
+    those versions. Both are known before the view runs, so unchanged
+    lists skip the database and the serializer. A retrieve looks its
+    object up first, for a missing or forbidden object to answer 404 or
+    403 rather than 304, and the view then reuses the object.
+
+    Last-Modified has whole seconds, so it is only sent and honored once
+    the second of the latest write has passed: a later write then falls
+    in a later second and moves it forward.
+    """
+
+    cache_models = ()
+    _object = None
+
+    def get_object(self):
+        if self._object is None:
+            self._object = super().get_object()
+        return self._object
+
+    async def aget_object(self):
+        if self._object is None:
+            self._object = await super().aget_object()
+        return self._object
+
+    @staticmethod
+    def validators(request, versions) -> tuple[str, int | None]:
+        """ETag and Last-Modified timestamp of the response."""
+        url = request.build_absolute_uri()
+        renderer = request.accepted_renderer.format
+        etag = quote_etag(
+            hashlib.md5(
+                f"{request.user.pk}:{renderer}:{versions}:{url}".encode()
+            ).hexdigest()
+        )
+        last_modified = None
+        if versions and max(versions) // 10**9 < time.time_ns() // 10**9:
+            last_modified = max(versions) // 10**9
+        return etag, last_modified
+
+    @staticmethod
+    def add_validators(response, etag, last_modified):
+        if response.status_code not in (200, 304):
+            return response
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def conditional_response(self, view, request, *args, **kwargs):
+        if self.action == "retrieve":
+            self.get_object()
+        versions = model_versions(self.cache_models)
+        etag, last_modified = self.validators(request, versions)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            with written_reads(versions):
+                response = view(request, *args, **kwargs)
+        return self.add_validators(response, etag, last_modified)
+
+    async def aconditional_response(self, view, request, *args, **kwargs):
+        if self.action == "retrieve":
+            await self.aget_object()
+        versions = await amodel_versions(self.cache_models)
+        etag, last_modified = self.validators(request, versions)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            with written_reads(versions):
+                response = await view(request, *args, **kwargs)
+        return self.add_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.aconditional_response(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aconditional_response(
+            super().aretrieve, request, *args, **kwargs
+        )
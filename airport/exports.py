@@ -0,0 +1,163 @@
+"""Streaming export of tickets with their order, flight and route.
+
+Rows come off a server-side cursor as tuples and are written out in
+chunks as they arrive, so memory stays flat whatever the size of the
+export. Parquet needs pyarrow and is left out without it.
+"""
+
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from airport.models import Ticket
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+# Column names and the ticket fields they come from
+COLUMNS = (
+    ("order_id", "order_id"),
+    ("order_created_at", "order__created_at"),
+    ("user_id", "order__user_id"),
+    ("user_email", "order__user__email"),
+    ("ticket_id", "id"),
+    ("row", "row"),
+    ("seat", "seat"),
+    ("flight_id", "flight_id"),
+    ("departure_time", "flight__departure_time"),
+    ("arrival_time", "flight__arrival_time"),
+    ("route_id", "flight__route_id"),
+    ("source", "flight__route__source__name"),
+    ("destination", "flight__route__destination__name"),
+    ("distance", "flight__route__distance"),
+    ("airplane", "flight__airplane__name"),
+)
+
+
+def export_rows(queryset=None):
+    """The export rows of the tickets of queryset, or of all tickets, by
+    order and ticket id."""
+    if queryset is None:
+        queryset = Ticket.objects.all()
+    return (
+        queryset.order_by("order_id", "id")
+        .values_list(*(field for _, field in COLUMNS))
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+def _chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == settings.EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in COLUMNS)
+    for chunk in _chunks(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_ndjson(rows):
+    names = [name for name, _ in COLUMNS]
+    encoder = DjangoJSONEncoder()
+    for chunk in _chunks(rows):
+        yield "".join(
+            json.dumps(dict(zip(names, row)), default=encoder.default) + "\n"
+            for row in chunk
+        )
+
+
+class _Sink(io.RawIOBase):
+    """A file that keeps what is written to it until it is drained."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def parquet_schema():
+    timestamp = pyarrow.timestamp("us", tz="UTC")
+    types = {
+        "order_created_at": timestamp,
+        "departure_time": timestamp,
+        "arrival_time": timestamp,
+        "user_email": pyarrow.string(),
+        "source": pyarrow.string(),
+        "destination": pyarrow.string(),
+        "airplane": pyarrow.string(),
+    }
+    return pyarrow.schema(
+        [(name, types.get(name, pyarrow.int64())) for name, _ in COLUMNS]
+    )
+
+
+def write_parquet(rows):
+    """A row group per chunk of rows, each sent as soon as it is written."""
+    schema = parquet_schema()
+    sink = _Sink()
+    with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+        for chunk in _chunks(rows):
+            columns = list(zip(*chunk))
+            writer.write_batch(
+                pyarrow.record_batch(
+                    [
+                        pyarrow.array(column, type=field.type)
+                        for column, field in zip(columns, schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            yield sink.drain()
+    yield sink.drain()
+
+
+WRITERS = {"csv": write_csv, "ndjson": write_ndjson}
+if pyarrow is not None:
+    WRITERS["parquet"] = write_parquet
+
+
+async def aiterate(iterator):
+    """Yields the items of a sync iterator from a thread one at a time.
+
+    Under ASGI, StreamingHttpResponse reads a sync iterator to the end
+    before it sends the first byte.
+    """
+    done = object()
+    next_item = sync_to_async(next)
+    while (item := await next_item(iterator, done)) is not done:
+        yield item
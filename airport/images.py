@@ -0,0 +1,110 @@
+"""Resized variants of airplane images.
+
+An upload only stores the original. The variants, one per width in
+settings.AIRPLANE_IMAGE_WIDTHS in the format of the original and as
+WebP, are built after the upload commits on a pool of worker threads:
+Pillow releases the GIL while it decodes, resizes and encodes, so the
+workers run in parallel with each other and with the requests.
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from airport.cache import bump_model_version
+from airport.models import Airplane
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AIRPLANE_IMAGE_WORKERS,
+                thread_name_prefix="airplane-images",
+            )
+        return _executor
+
+
+def schedule_image_variants(airplane: Airplane) -> None:
+    """Builds the variants of the airplane image once the upload commits,
+    on the worker pool, or right away with AIRPLANE_IMAGE_WORKERS = 0."""
+    airplane_id, name = airplane.id, airplane.image.name
+
+    def schedule():
+        if settings.AIRPLANE_IMAGE_WORKERS:
+            executor().submit(_build_in_worker, airplane_id, name)
+        else:
+            build_image_variants(airplane_id, name)
+
+    transaction.on_commit(schedule)
+
+
+def _build_in_worker(airplane_id: int, name: str) -> None:
+    try:
+        build_image_variants(airplane_id, name)
+    except Exception:
+        logger.exception("Could not build the variants of %s", name)
+    finally:
+        connections.close_all()
+
+
+def build_image_variants(airplane_id: int, name: str) -> dict:
+    """Writes the variants of the image ``name`` and records them on the
+    airplane, unless the airplane has moved on to another image since."""
+    base, _ = os.path.splitext(name)
+    variants = {}
+    with default_storage.open(name) as file, Image.open(file) as original:
+        keep_alpha = original.mode in ("RGBA", "LA") or (
+            original.mode == "P" and "transparency" in original.info
+        )
+        largest = max(settings.AIRPLANE_IMAGE_WIDTHS)
+        # JPEGs decode at the smallest scale that still covers the largest
+        # variant, either way up, a fraction of the work of a full decode
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if keep_alpha else "RGB")
+
+        for width in sorted(settings.AIRPLANE_IMAGE_WIDTHS, reverse=True):
+            if image.width > width:
+                # Each size is scaled down from the one before, not from
+                # the original
+                image = image.resize(
+                    (width, max(1, round(image.height * width / image.width))),
+                    Image.Resampling.LANCZOS,
+                    reducing_gap=3.0,
+                )
+            fallback, extension = ("PNG", "png") if keep_alpha else ("JPEG", "jpg")
+            variants[str(width)] = {
+                extension: _save(image, f"{base}-{width}.{extension}", fallback),
+                "webp": _save(image, f"{base}-{width}.webp", "WEBP"),
+            }
+
+    updated = Airplane.objects.filter(id=airplane_id, image=name).update(
+        image_variants=variants
+    )
+    if updated:
+        bump_model_version(Airplane)
+    return variants
+
+
+def _save(image: Image.Image, name: str, format: str) -> str:
+    buffer = io.BytesIO()
+    options = {"optimize": True} if format == "PNG" else {"quality": 82}
+    if format == "JPEG":
+        options.update(optimize=True, progressive=True)
+    image.save(buffer, format, **options)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
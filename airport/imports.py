@@ -0,0 +1,540 @@
+"""Bulk import of reference data and flight schedules from CSV or NDJSON.
+
+Rows are read one at a time and written in batches, so memory stays flat
+however long the input. Related rows are named by their natural keys,
+e.g. a flight by the names of its airports and airplane, and resolved
+through maps of the existing rows loaded once per import. Rows whose
+natural key already exists are skipped, so an import can be run again.
+A row that can not be imported is reported with its line and the rest
+go on.
+
+    report = import_rows("flights", read_rows(file, "csv"))
+"""
+
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from airport.bulk import copy_rows, reserve_ids
+from airport.cache import bump_model_version
+from airport.itineraries import itinerary_index
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Country,
+    Crew,
+    Flight,
+    Route,
+)
+
+FORMATS = ("csv", "ndjson")
+
+# Errors past this many are counted but not listed
+MAX_REPORTED_ERRORS = 100
+
+# Separates the crew of a flight in CSV
+CREW_SEPARATOR = ";"
+
+AMBIGUOUS = object()
+
+
+class ImportRowError(Exception):
+    """A row that can not be imported, with the error of each field."""
+
+    def __init__(self, errors: dict):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def read_rows(file, format: str):
+    """Yields (line, row) pairs from a binary file, where a row is a dict
+    of column names to values, or an ImportRowError for a line that can
+    not be parsed."""
+    text = codecs.getreader("utf-8-sig")(file)
+    if format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == "ndjson":
+        for line, raw in enumerate(text, 1):
+            if not raw.strip():
+                continue
+            try:
+                row = json.loads(raw)
+            except ValueError as error:
+                yield line, ImportRowError({"row": f"Invalid JSON: {error}"})
+                continue
+            if not isinstance(row, dict):
+                row = ImportRowError({"row": "Expected a JSON object."})
+            yield line, row
+    else:
+        raise ValueError(f"Unknown format {format!r}")
+
+
+def format_of(name: str) -> str | None:
+    """The format of a file by its extension."""
+    extension = name.rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    return None
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line: int, errors: dict) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+    def as_dict(self) -> dict:
+        return {
+            "created": self.created,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+class Lookup:
+    """Ids of the rows of a model by natural key. A key shared by several
+    rows can not be resolved."""
+
+    def __init__(self, label: str, queryset, *fields):
+        self.label = label
+        self.ids = {}
+        for *key, id_ in queryset.values_list(*fields, "id").iterator():
+            self.add(key[0] if len(key) == 1 else tuple(key), id_)
+
+    def __contains__(self, key) -> bool:
+        return key in self.ids
+
+    def add(self, key, id_: int) -> None:
+        self.ids[key] = AMBIGUOUS if key in self.ids else id_
+
+    def get(self, key) -> int:
+        id_ = self.ids.get(key)
+        if id_ is None:
+            raise ValueError(f"No {self.label} {_describe(key)}.")
+        if id_ is AMBIGUOUS:
+            raise ValueError(f"More than one {self.label} {_describe(key)}.")
+        return id_
+
+
+def _describe(key) -> str:
+    if isinstance(key, tuple):
+        return "from " + " to ".join(f'"{part}"' for part in key)
+    return f'named "{key}"'
+
+
+def _text(row, errors, field, max_length=255) -> str | None:
+    value = row.get(field)
+    value = "" if value is None else str(value).strip()
+    if not value:
+        errors[field] = "This field is required."
+    elif len(value) > max_length:
+        errors[field] = f"Ensure this field has no more than {max_length} characters."
+    else:
+        return value
+
+
+def _integer(row, errors, field, minimum=1) -> int | None:
+    value = _text(row, errors, field)
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        errors[field] = "A valid integer is required."
+    else:
+        if number >= minimum:
+            return number
+        errors[field] = f"Ensure this value is greater than or equal to {minimum}."
+
+
+def _datetime(row, errors, field):
+    value = _text(row, errors, field)
+    if value is None:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        errors[field] = "A valid ISO 8601 datetime is required."
+    elif timezone.is_naive(parsed):
+        return timezone.make_aware(parsed)
+    else:
+        return parsed
+
+
+def _resolve(lookup, errors, field, key):
+    if key is None:
+        return None
+    try:
+        return lookup.get(key)
+    except ValueError as error:
+        errors[field] = str(error)
+
+
+class Importer:
+    """Imports the rows of one model, named by the fields of natural_key.
+
+    parse() turns a row into an object to write or raises ImportRowError,
+    write() inserts a batch of objects in one go.
+    """
+
+    model = None
+    label = None
+    natural_key = ("name",)
+
+    def __init__(self):
+        self.lookups = {}
+
+    def lookup(self, model, label, *fields) -> Lookup:
+        if model not in self.lookups:
+            self.lookups[model] = Lookup(label, model.objects.order_by(), *fields)
+        return self.lookups[model]
+
+    def known(self) -> Lookup:
+        return self.lookup(self.model, self.label, *self.natural_key)
+
+    def parse(self, row):
+        raise NotImplementedError
+
+    def key(self, obj):
+        key = tuple(getattr(obj, field) for field in self.natural_key)
+        return key[0] if len(key) == 1 else key
+
+    def existing(self, keys) -> set:
+        return {key for key in keys if key in self.known()}
+
+    def write(self, objs) -> None:
+        self.model.objects.bulk_create(objs)
+
+    def remember(self, objs) -> None:
+        for obj in objs:
+            self.known().add(self.key(obj), obj.id)
+
+    def finish(self) -> None:
+        # Bulk writes send no signals
+        bump_model_version(self.model)
+
+
+class CountryImporter(Importer):
+    model = Country
+    label = "country"
+
+    def parse(self, row):
+        errors = {}
+        name = _text(row, errors, "name")
+        if errors:
+            raise ImportRowError(errors)
+        return Country(name=name)
+
+
+class AirportImporter(Importer):
+    model = Airport
+    label = "airport"
+
+    def parse(self, row):
+        errors = {}
+        name = _text(row, errors, "name")
+        closest_big_city = _text(row, errors, "closest_big_city")
+        country_id = _resolve(
+            self.lookup(Country, "country", "name"),
+            errors,
+            "country",
+            _text(row, errors, "country"),
+        )
+        if errors:
+            raise ImportRowError(errors)
+        return Airport(
+            name=name, closest_big_city=closest_big_city, country_id=country_id
+        )
+
+
+class RouteImporter(Importer):
+    model = Route
+    label = "route"
+    natural_key = ("source_id", "destination_id")
+
+    def parse(self, row):
+        errors = {}
+        airports = self.lookup(Airport, "airport", "name")
+        source_id = _resolve(airports, errors, "source", _text(row, errors, "source"))
+        destination_id = _resolve(
+            airports, errors, "destination", _text(row, errors, "destination")
+        )
+        distance = _integer(row, errors, "distance")
+        if source_id is not None and source_id == destination_id:
+            errors["destination"] = "The destination must differ from the source."
+        if errors:
+            raise ImportRowError(errors)
+        return Route(
+            source_id=source_id, destination_id=destination_id, distance=distance
+        )
+
+    def finish(self) -> None:
+        super().finish()
+        itinerary_index.clear()
+
+
+class AirplaneTypeImporter(Importer):
+    model = AirplaneType
+    label = "airplane type"
+
+    def parse(self, row):
+        errors = {}
+        name = _text(row, errors, "name")
+        if errors:
+            raise ImportRowError(errors)
+        return AirplaneType(name=name)
+
+
+class AirplaneImporter(Importer):
+    model = Airplane
+    label = "airplane"
+
+    def parse(self, row):
+        errors = {}
+        name = _text(row, errors, "name")
+        rows = _integer(row, errors, "rows")
+        seats_in_row = _integer(row, errors, "seats_in_row")
+        airplane_type_id = _resolve(
+            self.lookup(AirplaneType, "airplane type", "name"),
+            errors,
+            "airplane_type",
+            _text(row, errors, "airplane_type"),
+        )
+        if errors:
+            raise ImportRowError(errors)
+        return Airplane(
+            name=name,
+            rows=rows,
+            seats_in_row=seats_in_row,
+            airplane_type_id=airplane_type_id,
+        )
+
+
+class CrewImporter(Importer):
+    model = Crew
+    label = "crew member"
+    natural_key = ("first_name", "last_name")
+
+    def parse(self, row):
+        errors = {}
+        first_name = _text(row, errors, "first_name")
+        last_name = _text(row, errors, "last_name")
+        if errors:
+            raise ImportRowError(errors)
+        return Crew(first_name=first_name, last_name=last_name)
+
+
+class FlightImporter(Importer):
+    """Flights name their route by its source and destination airports,
+    their airplane by name and their crew by full name, separated by
+    semicolons in CSV or as a list in NDJSON. A flight exists already if
+    its route, airplane and departure time do."""
+
+    model = Flight
+
+    def __init__(self):
+        super().__init__()
+        self.crew_names = {}
+        for first_name, last_name, id_ in Crew.objects.values_list(
+            "first_name", "last_name", "id"
+        ).iterator():
+            name = f"{first_name} {last_name}"
+            self.crew_names[name] = AMBIGUOUS if name in self.crew_names else id_
+
+    def parse(self, row):
+        errors = {}
+        airports = self.lookup(Airport, "airport", "name")
+        source = _text(row, errors, "source")
+        destination = _text(row, errors, "destination")
+        source_id = _resolve(airports, errors, "source", source)
+        destination_id = _resolve(airports, errors, "destination", destination)
+        route_id = None
+        if source_id is not None and destination_id is not None:
+            routes = self.lookup(Route, "route", "source_id", "destination_id")
+            try:
+                route_id = routes.get((source_id, destination_id))
+            except ValueError:
+                errors["route"] = f'No route from "{source}" to "{destination}".'
+        airplane_id = _resolve(
+            self.lookup(Airplane, "airplane", "name"),
+            errors,
+            "airplane",
+            _text(row, errors, "airplane"),
+        )
+        departure_time = _datetime(row, errors, "departure_time")
+        arrival_time = _datetime(row, errors, "arrival_time")
+        if departure_time and arrival_time and arrival_time <= departure_time:
+            errors["arrival_time"] = "The arrival must be after the departure."
+        crew_ids = self.parse_crew(row.get("crew"), errors)
+        if errors:
+            raise ImportRowError(errors)
+        return (
+            Flight(
+                route_id=route_id,
+                airplane_id=airplane_id,
+                departure_time=departure_time,
+                arrival_time=arrival_time,
+            ),
+            crew_ids,
+        )
+
+    def parse_crew(self, value, errors) -> list[int]:
+        if value is None or value == "":
+            return []
+        if isinstance(value, str):
+            value = value.split(CREW_SEPARATOR)
+        if not isinstance(value, list):
+            errors["crew"] = "Expected a list of full names."
+            return []
+        crew_ids, unknown = [], []
+        for name in value:
+            id_ = self.crew_names.get(str(name).strip())
+            if id_ is None or id_ is AMBIGUOUS:
+                unknown.append(str(name).strip())
+            elif id_ not in crew_ids:
+                crew_ids.append(id_)
+        if unknown:
+            errors["crew"] = "No single crew member named " + ", ".join(
+                f'"{name}"' for name in unknown
+            )
+        return crew_ids
+
+    def key(self, obj):
+        flight, _ = obj
+        return flight.route_id, flight.airplane_id, flight.departure_time
+
+    def existing(self, keys) -> set:
+        if not keys:
+            return set()
+        return set(
+            Flight.objects.filter(
+                route_id__in={route_id for route_id, _, _ in keys},
+                departure_time__in={departure_time for _, _, departure_time in keys},
+            )
+            .order_by()
+            .values_list("route_id", "airplane_id", "departure_time")
+        )
+
+    def write(self, objs) -> None:
+        ids = reserve_ids(Flight, len(objs))
+        for id_, (flight, _) in zip(ids, objs):
+            flight.id = id_
+        copy_rows(
+            Flight,
+            [
+                "id",
+                "route_id",
+                "airplane_id",
+                "departure_time",
+                "arrival_time",
+                "tickets_sold",
+            ],
+            (
+                (
+                    flight.id,
+                    flight.route_id,
+                    flight.airplane_id,
+                    flight.departure_time,
+                    flight.arrival_time,
+                    0,
+                )
+                for flight, _ in objs
+            ),
+        )
+        copy_rows(
+            Flight.crew.through,
+            ["flight_id", "crew_id"],
+            ((flight.id, crew_id) for flight, crew_ids in objs for crew_id in crew_ids),
+        )
+
+    def remember(self, objs) -> None:
+        pass
+
+    def finish(self) -> None:
+        super().finish()
+        itinerary_index.clear()
+
+
+IMPORTERS = {
+    "countries": CountryImporter,
+    "airports": AirportImporter,
+    "routes": RouteImporter,
+    "airplane_types": AirplaneTypeImporter,
+    "airplanes": AirplaneImporter,
+    "crew": CrewImporter,
+    "flights": FlightImporter,
+}
+
+
+def import_rows(kind: str, rows, batch_size: int = 1000) -> ImportReport:
+    """Imports the (line, row) pairs of read_rows() as the kind of
+    IMPORTERS, batch_size rows to a transaction."""
+    importer = IMPORTERS[kind]()
+    report = ImportReport()
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        _import_batch(importer, batch, report)
+    if report.created:
+        importer.finish()
+    return report
+
+
+def _import_batch(importer, batch, report) -> None:
+    parsed = {}
+    for line, row in batch:
+        try:
+            if isinstance(row, ImportRowError):
+                raise row
+            obj = importer.parse(row)
+        except ImportRowError as error:
+            report.error(line, error.errors)
+            continue
+        key = importer.key(obj)
+        if key in parsed:
+            report.skipped += 1
+        else:
+            parsed[key] = (line, obj)
+
+    existing = importer.existing(list(parsed)) & parsed.keys()
+    report.skipped += len(existing)
+    pending = [entry for key, entry in parsed.items() if key not in existing]
+    if not pending:
+        return
+
+    try:
+        with transaction.atomic():
+            importer.write([obj for _, obj in pending])
+    except DatabaseError:
+        # Find the rows at fault one at a time, and keep the others
+        written = []
+        for line, obj in pending:
+            try:
+                with transaction.atomic():
+                    importer.write([obj])
+            except DatabaseError as error:
+                report.error(line, {"row": str(error).strip()})
+            else:
+                written.append(obj)
+    else:
+        written = [obj for _, obj in pending]
+    importer.remember(written)
+    report.created += len(written)
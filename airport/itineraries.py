@@ -0,0 +1,305 @@
+import bisect
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from airport.models import Flight, Route
+
+
+@dataclass(frozen=True)
+class Leg:
+    flight_id: int
+    route_id: int
+    source_id: int
+    destination_id: int
+    departure_time: datetime
+    arrival_time: datetime
+    distance: int
+
+
+@dataclass(frozen=True)
+class Itinerary:
+    legs: tuple[Leg, ...]
+
+    @property
+    def departure_time(self) -> datetime:
+        return self.legs[0].departure_time
+
+    @property
+    def arrival_time(self) -> datetime:
+        return self.legs[-1].arrival_time
+
+    @property
+    def stops(self) -> int:
+        return len(self.legs) - 1
+
+    @property
+    def distance(self) -> int:
+        return sum(leg.distance for leg in self.legs)
+
+
+def _utc(value: datetime) -> datetime:
+    """value as an aware UTC datetime, naive ones being in the current
+    time zone the way the ORM stores them."""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.astimezone(UTC)
+
+
+class _Graph:
+    """Routes and time-ordered departures per route of one build.
+
+    Copy on write: the sets of routes per airport and the departures per
+    route are immutable, and a change replaces them whole. A search
+    reads them without the lock of the index while it changes them.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.routes_from = {}
+        self.departures = {}
+        self.flights = {}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def load(cls, horizon: datetime) -> "_Graph":
+        graph = cls()
+        for route_id, source_id, destination_id, distance in Route.objects.values_list(
+            "id", "source_id", "destination_id", "distance"
+        ):
+            graph.add_route(route_id, source_id, destination_id, distance)
+
+        departures = defaultdict(list)
+        for flight_id, route_id, departure_time, arrival_time in (
+            Flight.objects.filter(departure_time__gte=horizon)
+            .order_by()
+            .values_list("id", "route_id", "departure_time", "arrival_time")
+        ):
+            departure_time, arrival_time = _utc(departure_time), _utc(arrival_time)
+            graph.flights[flight_id] = (route_id, departure_time, arrival_time)
+            departures[route_id].append((departure_time, flight_id, arrival_time))
+        graph.departures = {
+            route_id: tuple(sorted(flights)) for route_id, flights in departures.items()
+        }
+        return graph
+
+    def stale(self) -> bool:
+        return time.monotonic() - self.built_at > settings.ITINERARY_INDEX_MAX_AGE
+
+    def add_route(self, route_id, source_id, destination_id, distance) -> None:
+        self.routes[route_id] = (source_id, destination_id, distance)
+        routes = self.routes_from.get(source_id, frozenset())
+        self.routes_from[source_id] = routes | {route_id}
+
+    def remove_route(self, route_id) -> None:
+        route = self.routes.pop(route_id, None)
+        if route is not None:
+            self.routes_from[route[0]] = self.routes_from[route[0]] - {route_id}
+
+    def add_flight(self, flight_id, route_id, departure_time, arrival_time) -> None:
+        self.flights[flight_id] = (route_id, departure_time, arrival_time)
+        departures = list(self.departures.get(route_id, ()))
+        bisect.insort(departures, (departure_time, flight_id, arrival_time))
+        self.departures[route_id] = tuple(departures)
+
+    def remove_flight(self, flight_id) -> None:
+        flight = self.flights.pop(flight_id, None)
+        if flight is None:
+            return
+        route_id, departure_time, arrival_time = flight
+        departures = self.departures.get(route_id, ())
+        index = bisect.bisect_left(departures, (departure_time, flight_id))
+        if index < len(departures) and departures[index][1] == flight_id:
+            self.departures[route_id] = departures[:index] + departures[index + 1 :]
+
+
+class ItineraryIndex:
+    """In-memory graph of routes with time-ordered departures per route.
+
+    The index is built lazily from the database, kept up to date by the
+    Route and Flight signals of this process and rebuilt from scratch
+    every ITINERARY_INDEX_MAX_AGE seconds to pick up changes made by
+    other processes. Only flights that depart today or later are kept.
+
+    Searches read the graph without the lock, which only serializes the
+    changes (see _Graph). A rebuild reads the database outside the lock:
+    searches keep using the previous graph meanwhile, and the new one is
+    swapped in with the changes signalled during the build replayed on
+    it. Only the first build makes searches wait.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._graph = None
+        self._generation = 0
+        self._pending = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._graph = None
+            self._generation += 1
+
+    @staticmethod
+    def _horizon() -> datetime:
+        return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _current(self) -> _Graph:
+        graph = self._graph
+        if graph is not None and not graph.stale():
+            return graph
+        if graph is None:
+            self._build_lock.acquire()
+        elif not self._build_lock.acquire(blocking=False):
+            # Another thread is rebuilding, the stale graph still answers
+            return graph
+
+        try:
+            with self._lock:
+                if self._graph is not None and not self._graph.stale():
+                    return self._graph
+                generation = self._generation
+                self._pending = []
+            built = _Graph.load(self._horizon())
+            with self._lock:
+                for change in self._pending:
+                    change(built)
+                self._pending = None
+                # A clear() during the build may have been for data the
+                # build did not see, so the graph serves this search only
+                if self._generation == generation:
+                    self._graph = built
+            return built
+        finally:
+            self._build_lock.release()
+
+    def _change(self, change) -> None:
+        with self._lock:
+            if self._graph is not None:
+                change(self._graph)
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def update_route(self, route: Route) -> None:
+        def change(graph):
+            graph.remove_route(route.id)
+            graph.add_route(
+                route.id, route.source_id, route.destination_id, route.distance
+            )
+
+        self._change(change)
+
+    def remove_route(self, route_id: int) -> None:
+        def change(graph):
+            graph.remove_route(route_id)
+            graph.departures.pop(route_id, None)
+
+        self._change(change)
+
+    def update_flight(self, flight: Flight) -> None:
+        departure_time = _utc(flight.departure_time)
+        arrival_time = _utc(flight.arrival_time)
+        keep = departure_time >= self._horizon()
+
+        def change(graph):
+            graph.remove_flight(flight.id)
+            if keep:
+                graph.add_flight(
+                    flight.id, flight.route_id, departure_time, arrival_time
+                )
+
+        self._change(change)
+
+    def remove_flight(self, flight_id: int) -> None:
+        self._change(lambda graph: graph.remove_flight(flight_id))
+
+    @staticmethod
+    def _legs_from(graph, airport_id, earliest, latest):
+        for route_id in graph.routes_from.get(airport_id, ()):
+            route = graph.routes.get(route_id)
+            if route is None:
+                # Removed since routes_from was read
+                continue
+            _, destination_id, distance = route
+            departures = graph.departures.get(route_id, ())
+            start = bisect.bisect_left(departures, (earliest,))
+            for departure_time, flight_id, arrival_time in itertools.islice(
+                departures, start, None
+            ):
+                if departure_time >= latest:
+                    break
+                yield Leg(
+                    flight_id,
+                    route_id,
+                    airport_id,
+                    destination_id,
+                    departure_time,
+                    arrival_time,
+                    distance,
+                )
+
+    def search(
+        self,
+        source_id: int,
+        destination_id: int,
+        earliest: datetime,
+        latest: datetime,
+        max_stops: int,
+        limit: int = 10,
+    ) -> list[Itinerary]:
+        """Itineraries leaving source between earliest and latest, ranked
+        by arrival time, then by number of stops.
+
+        Partial itineraries are expanded in order of their arrival time, so
+        the first ones to reach the destination are the best ones.
+        Connections respect the minimum connection time and the maximum
+        layover, and never visit the same airport twice.
+        """
+        min_connection = timedelta(minutes=settings.ITINERARY_MIN_CONNECTION_MINUTES)
+        max_layover = timedelta(hours=settings.ITINERARY_MAX_LAYOVER_HOURS)
+
+        graph = self._current()
+        counter = itertools.count()
+        heap = []
+        for leg in self._legs_from(graph, source_id, earliest, latest):
+            heapq.heappush(heap, (leg.arrival_time, 0, next(counter), (leg,)))
+
+        results = []
+        expansions = 0
+        while heap and len(results) < limit:
+            arrival_time, stops, _, legs = heapq.heappop(heap)
+            last = legs[-1]
+            if last.destination_id == destination_id:
+                results.append(Itinerary(legs))
+                continue
+            if stops >= max_stops:
+                continue
+
+            expansions += 1
+            if expansions > settings.ITINERARY_MAX_EXPANSIONS:
+                break
+            visited = {legs[0].source_id} | {leg.destination_id for leg in legs}
+            for leg in self._legs_from(
+                graph,
+                last.destination_id,
+                arrival_time + min_connection,
+                arrival_time + max_layover,
+            ):
+                if leg.destination_id in visited:
+                    continue
+                heapq.heappush(
+                    heap,
+                    (leg.arrival_time, stops + 1, next(counter), legs + (leg,)),
+                )
+
+        return results
+
+
+itinerary_index = ItineraryIndex()
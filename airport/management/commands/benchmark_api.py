@@ -0,0 +1,274 @@
+import contextlib
+import json
+import random
+import subprocess
+import time
+from collections import Counter, defaultdict
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.models import Flight
+
+DEFAULT_MIX = "flight_search=50,flight_detail=25,order_create=10,order_list=15"
+
+# Requests come from outside INTERNAL_IPS, so the debug toolbar stays off.
+REMOTE_ADDR = "203.0.113.1"
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    values = sorted(values)
+    rank = max(1, round(percent / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in Workload.operations:
+            raise CommandError(
+                f"Unknown operation {name!r}, expected one of "
+                + ", ".join(Workload.operations)
+            )
+        weights[name] = int(weight or 1)
+    return weights
+
+
+class Workload:
+    """Builds the requests of the mixed workload from the data in the
+    database: flights departing from now on and users who are not staff."""
+
+    operations = ("flight_search", "flight_detail", "order_create", "order_list")
+
+    def __init__(self, rng: random.Random, sample_size: int = 1000):
+        self.rng = rng
+        now = timezone.now()
+        bounds = Flight.objects.aggregate(first=Min("id"), last=Max("id"))
+        if bounds["first"] is None:
+            raise CommandError("No flights to benchmark, run generate_dataset first")
+        candidates = rng.sample(
+            range(bounds["first"], bounds["last"] + 1),
+            min(sample_size, bounds["last"] - bounds["first"] + 1),
+        )
+        self.flights = list(
+            Flight.objects.filter(id__in=candidates, departure_time__gte=now)
+            .order_by("id")
+            .values_list(
+                "id", "departure_time", "airplane__rows", "airplane__seats_in_row"
+            )
+        )
+        if not self.flights:
+            raise CommandError("No upcoming flights to benchmark")
+
+        users = list(
+            get_user_model()
+            .objects.filter(is_staff=False)
+            .order_by("id")
+            .values_list("id", flat=True)[:sample_size]
+        )
+        if not users:
+            raise CommandError("No users to benchmark, run generate_dataset first")
+        user_model = get_user_model()
+        self.tokens = [
+            f"Bearer {AccessToken.for_user(user_model(id=user_id))}"
+            for user_id in users
+        ]
+
+    def request(self, operation: str) -> tuple[str, str, dict]:
+        """An operation as (method, url, data)."""
+        flight_id, departure_time, rows, seats_in_row = self.rng.choice(self.flights)
+        if operation == "flight_search":
+            return (
+                "get",
+                reverse("airport:flight-list"),
+                {
+                    "departure": departure_time.replace(
+                        hour=0, minute=0, second=0
+                    ).isoformat(),
+                    "has_seats": "true",
+                },
+            )
+        if operation == "flight_detail":
+            return "get", reverse("airport:flight-detail", args=[flight_id]), {}
+        if operation == "order_create":
+            return (
+                "post",
+                reverse("airport:order-list"),
+                {
+                    "tickets": [
+                        {
+                            "flight": flight_id,
+                            "row": self.rng.randint(1, rows),
+                            "seat": self.rng.randint(1, seats_in_row),
+                        }
+                    ]
+                },
+            )
+        return "get", reverse("airport:order-list"), {}
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a mixed workload against the app in-process and report "
+        "latency percentiles and queries per request. Writes are rolled "
+        "back, so runs on the same dataset stay comparable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--warmup", type=int, default=50)
+        parser.add_argument("--mix", default=DEFAULT_MIX)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--asgi",
+            action="store_true",
+            help="Go through the ASGI handler instead of the WSGI one",
+        )
+        parser.add_argument(
+            "--throttle",
+            action="store_true",
+            help="Keep request throttling on (off by default, few users "
+            "send all the requests)",
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the report as JSON"
+        )
+
+    def handle(self, *args, **options):
+        weights = parse_mix(options["mix"])
+        rng = random.Random(options["seed"])
+
+        with transaction.atomic():
+            workload = Workload(rng)
+            schedule = rng.choices(
+                list(weights), weights=list(weights.values()), k=options["requests"]
+            )
+            warmup = rng.choices(list(weights), k=options["warmup"])
+            # The test clients send requests to "testserver".
+            hosts = override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+            )
+            throttles = (
+                contextlib.nullcontext()
+                if options["throttle"]
+                else mock.patch.object(APIView, "check_throttles")
+            )
+            client = self.asgi_client() if options["asgi"] else self.wsgi_client()
+            with hosts, throttles:
+                for operation in warmup:
+                    self.send(client, workload, operation)
+                samples = [
+                    self.send(client, workload, operation) for operation in schedule
+                ]
+            transaction.set_rollback(True)
+
+        report = self.report(samples, asgi=options["asgi"])
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_table(report)
+
+    @staticmethod
+    def wsgi_client():
+        client = Client(REMOTE_ADDR=REMOTE_ADDR)
+
+        def request(method, url, data, **kwargs):
+            return getattr(client, method)(url, data, **kwargs)
+
+        return request
+
+    @staticmethod
+    def asgi_client():
+        """Awaits every request from this thread, so the thread-sensitive
+        parts of the handler share its connection and its transaction."""
+        client = AsyncClient(client=[REMOTE_ADDR, 0])
+
+        @async_to_sync
+        async def request(method, url, data, **kwargs):
+            return await getattr(client, method)(url, data, **kwargs)
+
+        return request
+
+    @staticmethod
+    def send(client, workload, operation) -> tuple[str, int, float, int]:
+        method, url, data = workload.request(operation)
+        kwargs = {"headers": {"Authorization": workload.rng.choice(workload.tokens)}}
+        if method == "post":
+            kwargs["content_type"] = "application/json"
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client(method, url, data, **kwargs)
+            elapsed = time.perf_counter() - start
+        return operation, response.status_code, elapsed, len(queries)
+
+    @staticmethod
+    def report(samples, asgi: bool) -> dict:
+        latencies = defaultdict(list)
+        queries = defaultdict(list)
+        statuses = defaultdict(Counter)
+        for operation, status, elapsed, query_count in samples:
+            latencies[operation].append(elapsed * 1000)
+            queries[operation].append(query_count)
+            statuses[operation][str(status)] += 1
+
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+
+        return {
+            "commit": commit,
+            "handler": "asgi" if asgi else "wsgi",
+            "operations": {
+                operation: {
+                    "requests": len(latencies[operation]),
+                    "statuses": dict(statuses[operation]),
+                    "p50_ms": round(percentile(latencies[operation], 50), 2),
+                    "p95_ms": round(percentile(latencies[operation], 95), 2),
+                    "p99_ms": round(percentile(latencies[operation], 99), 2),
+                    "queries_per_request": round(
+                        sum(queries[operation]) / len(queries[operation]), 2
+                    ),
+                }
+                for operation in Workload.operations
+                if latencies[operation]
+            },
+        }
+
+    def write_table(self, report: dict) -> None:
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"{report['handler'].upper()} at {report['commit'] or 'unknown commit'}"
+            )
+        )
+        self.stdout.write(
+            f"  {'operation':<14} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8}"
+            f" {'p99 ms':>8} {'queries':>8}  statuses"
+        )
+        for operation, row in report["operations"].items():
+            statuses = " ".join(
+                f"{status}x{count}" for status, count in sorted(row["statuses"].items())
+            )
+            self.stdout.write(
+                f"  {operation:<14} {row['requests']:>8} {row['p50_ms']:>8}"
+                f" {row['p95_ms']:>8} {row['p99_ms']:>8}"
+                f" {row['queries_per_request']:>8}  {statuses}"
+            )
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.management.commands.benchmark_api import percentile
+from airport.models import Flight
+
+DEFAULT_PATHS = ("/api/airport/flights/", "/api/airport/routes/")
+
+
+async def read_response(reader) -> int:
+    """Reads one HTTP/1.1 response and returns its status code."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+    if headers.get("connection", "").lower() == "close":
+        raise ConnectionResetError
+    return status
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a running server with many concurrent keep-alive connections "
+        "and report throughput and latency percentiles. Run it against a "
+        "sync WSGI and an async ASGI deployment to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Base URL, e.g. http://localhost:8000")
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument("--duration", type=float, default=15)
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=0,
+            help="Seconds each connection idles between requests, "
+            "to mimic slow clients",
+        )
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path to request, may be repeated. Defaults to the flight "
+            "list, flight detail and route list.",
+        )
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("Only plain http:// URLs are supported")
+
+        user = get_user_model().objects.filter(is_staff=False).first()
+        if user is None:
+            raise CommandError("No users to benchmark, run generate_dataset first")
+        self.token = str(AccessToken.for_user(user))
+        self.paths = options["paths"] or self.default_paths()
+        self.host, self.port = url.hostname, url.port or 80
+
+        samples, errors, elapsed = asyncio.run(
+            self.run(options["concurrency"], options["duration"], options["think_time"])
+        )
+
+        latencies = [latency * 1000 for _, latency in samples]
+        report = {
+            "url": options["url"],
+            "concurrency": options["concurrency"],
+            "requests": len(samples),
+            "errors": errors,
+            "statuses": dict(Counter(str(status) for status, _ in samples)),
+            "requests_per_second": round(len(samples) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name, value in report.items():
+            self.stdout.write(f"  {name:<20} {value}")
+
+    @staticmethod
+    def default_paths() -> list[str]:
+        flight_ids = list(
+            Flight.objects.order_by("-id").values_list("id", flat=True)[:100]
+        )
+        return [
+            *DEFAULT_PATHS,
+            *(f"/api/airport/flights/{flight_id}/" for flight_id in flight_ids),
+        ]
+
+    async def run(self, concurrency, duration, think_time):
+        samples = []
+        errors = Counter()
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                self.connection(deadline, think_time, samples, errors)
+                for _ in range(concurrency)
+            )
+        )
+        return samples, dict(errors), time.perf_counter() - start
+
+    async def connection(self, deadline, think_time, samples, errors):
+        rng = random.Random()
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                request = (
+                    f"GET {rng.choice(self.paths)} HTTP/1.1\r\n"
+                    f"Host: {self.host}\r\n"
+                    f"Authorization: Bearer {self.token}\r\n"
+                    "Accept: application/json\r\n"
+                    "\r\n"
+                )
+                sent = time.perf_counter()
+                writer.write(request.encode())
+                await writer.drain()
+                status = await read_response(reader)
+                samples.append((status, time.perf_counter() - sent))
+            except ConnectionResetError:
+                # The server closed a keep-alive connection after answering
+                writer.close()
+                writer = None
+                continue
+            except (OSError, ConnectionError, ValueError, IndexError) as exc:
+                errors[type(exc).__name__] += 1
+                if writer is not None:
+                    writer.close()
+                writer = None
+                await asyncio.sleep(0.01)
+                continue
+            if think_time:
+                await asyncio.sleep(think_time)
+        if writer is not None:
+            writer.close()
@@ -0,0 +1,111 @@
+import datetime
+import timeit
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from airport_service.renderers import ORJSONRenderer
+
+
+def flight_detail_payload(rows: int = 40, seats_in_row: int = 8) -> dict:
+    """Shaped like FlightDetailSerializer output for a flight sold at 90%."""
+    taken = int(rows * seats_in_row * 0.9)
+    return {
+        "id": 1,
+        "route": {
+            "id": 1,
+            "source": {
+                "id": 1,
+                "name": "Boryspil International Airport",
+                "closest_big_city": "Kyiv",
+                "country": 1,
+            },
+            "destination": {
+                "id": 2,
+                "name": "Warsaw Chopin Airport",
+                "closest_big_city": "Warsaw",
+                "country": 2,
+            },
+            "distance": 690,
+        },
+        "airplane": {
+            "id": 1,
+            "name": "Boeing 737-800",
+            "rows": rows,
+            "seats_in_row": seats_in_row,
+            "airplane_type": 1,
+            "capacity": rows * seats_in_row,
+        },
+        "crew": [
+            {
+                "id": crew_id,
+                "first_name": "Olena",
+                "last_name": "Kovalenko",
+                "full_name": "Olena Kovalenko",
+            }
+            for crew_id in range(6)
+        ],
+        "departure_time": datetime.datetime(
+            2024, 8, 31, 21, 0, tzinfo=datetime.timezone.utc
+        ),
+        "arrival_time": datetime.datetime(
+            2024, 8, 31, 22, 30, tzinfo=datetime.timezone.utc
+        ),
+        "taken_places": [
+            {"row": index // seats_in_row + 1, "seat": index % seats_in_row + 1}
+            for index in range(taken)
+        ],
+    }
+
+
+def order_detail_payload(tickets: int = 6) -> dict:
+    """Shaped like OrderDetailSerializer output, with a few extra types."""
+    flight = flight_detail_payload()
+    return {
+        "id": 1,
+        "created_at": datetime.datetime(
+            2024, 8, 1, 12, 0, tzinfo=datetime.timezone.utc
+        ),
+        "user": 1,
+        "reference": uuid.uuid4(),
+        "total_price": Decimal("1234.50"),
+        "tickets": [
+            {"id": index, "row": 1, "seat": index + 1, "flight": flight}
+            for index in range(tickets)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare JSONRenderer and ORJSONRenderer on flight and order payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        payloads = {
+            "flight detail": flight_detail_payload(),
+            "order detail": order_detail_payload(),
+        }
+        renderers = {
+            "JSONRenderer": JSONRenderer(),
+            "ORJSONRenderer": ORJSONRenderer(),
+        }
+
+        for payload_name, payload in payloads.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(payload_name))
+            timings = {}
+            for renderer_name, renderer in renderers.items():
+                size = len(renderer.render(payload))
+                seconds = timeit.timeit(lambda: renderer.render(payload), number=number)
+                timings[renderer_name] = seconds
+                self.stdout.write(
+                    f"  {renderer_name:<16} {seconds / number * 1e6:9.1f} us/render"
+                    f" {size:8} bytes"
+                )
+            self.stdout.write(
+                f"  speedup: {timings['JSONRenderer'] / timings['ORJSONRenderer']:.1f}x"
+            )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from airport.images import build_image_variants
+from airport.models import Airplane
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the resized variants of airplane images that have none, e.g. "
+        "images uploaded before the variants existed or whose worker was "
+        "stopped. --all rebuilds every image."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true")
+
+    def handle(self, *args, **options):
+        airplanes = Airplane.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["all"]:
+            airplanes = airplanes.filter(image_variants={})
+
+        built = 0
+        for airplane_id, name in airplanes.values_list("id", "image").iterator():
+            try:
+                build_image_variants(airplane_id, name)
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f"  airplane {airplane_id}: {exc}")
+                continue
+            built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built variants of {built} images"))
@@ -0,0 +1,347 @@
+import datetime
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from airport.bulk import copy_rows
+from airport.cache import bump_model_version
+from airport.itineraries import itinerary_index
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Country,
+    Crew,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+from airport.signals import VERSIONED_MODELS
+
+# Row counts at --scale 1.
+DEFAULT_COUNTS = {
+    "countries": 200,
+    "airports": 5_000,
+    "routes": 50_000,
+    "airplane_types": 20,
+    "airplanes": 1_000,
+    "crew": 10_000,
+    "users": 10_000,
+    "flights": 2_000_000,
+    "tickets": 20_000_000,
+}
+
+USER_EMAIL_DOMAIN = "dataset.example"
+
+SYLLABLES = (
+    "ka", "lo", "mi", "ra", "to", "ve", "zan", "dor", "bel", "nis",
+    "por", "ta", "lin", "gra", "vo", "sel", "mar", "ku", "den", "ash",
+)  # fmt: skip
+
+FIRST_NAMES = (
+    "Olena", "Andrii", "Iryna", "Taras", "Maria", "Oleh", "Sofia", "Dmytro",
+    "Anna", "Petro", "Kateryna", "Ivan", "Yulia", "Mykola", "Daria", "Serhii",
+)  # fmt: skip
+
+LAST_NAMES = (
+    "Kovalenko", "Shevchenko", "Bondarenko", "Tkachenko", "Kravchenko",
+    "Melnyk", "Boyko", "Moroz", "Lysenko", "Rudenko", "Savchenko", "Marchenko",
+)  # fmt: skip
+
+AIRPLANE_MODELS = (
+    ("Airbus A320", 30, 6),
+    ("Airbus A321", 37, 6),
+    ("Boeing 737-800", 32, 6),
+    ("Embraer E195", 28, 4),
+    ("Boeing 787-9", 42, 9),
+    ("Airbus A350-900", 44, 9),
+)
+
+CRUISE_SPEED_KMH = 800
+
+
+def _name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic dataset for load testing. Reference data is "
+        "written with bulk_create, flights, crews, orders and tickets with COPY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=0.01,
+            help="Multiplier for the default row counts (1 = 2M flights, 20M tickets)",
+        )
+        for name in DEFAULT_COUNTS:
+            parser.add_argument(
+                f"--{name.replace('_', '-')}",
+                type=int,
+                help=f"Number of {name.replace('_', ' ')} (overrides --scale)",
+            )
+        parser.add_argument("--days", type=int, default=90)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100_000,
+            help="Flights written per COPY transaction",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("generate_dataset needs PostgreSQL for COPY")
+
+        counts = {
+            name: (
+                options[name]
+                if options[name] is not None
+                else max(1, round(default * options["scale"]))
+            )
+            for name, default in DEFAULT_COUNTS.items()
+        }
+        if counts["airports"] < 2:
+            raise CommandError("At least 2 airports are needed to build routes")
+        self.batch_size = options["batch_size"]
+        rng = random.Random(options["seed"])
+
+        self.stdout.write(
+            "Generating "
+            + ", ".join(f"{count} {name}" for name, count in counts.items())
+        )
+        with transaction.atomic():
+            countries = self.create_countries(rng, counts["countries"])
+            airports = self.create_airports(rng, counts["airports"], countries)
+            self.routes = self.create_routes(rng, counts["routes"], airports)
+            self.airplanes = self.create_airplanes(
+                rng, counts["airplane_types"], counts["airplanes"]
+            )
+            self.crew = self.create_crew(rng, counts["crew"])
+            self.users = self.create_users(counts["users"])
+
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.slots = options["days"] * 24 * 12
+        self.tickets_per_flight = counts["tickets"] / counts["flights"]
+        self.write_flights(rng, counts["flights"], options["chunk_size"])
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Flight, Order]):
+                cursor.execute(sql)
+            for model in VERSIONED_MODELS + (Flight.crew.through,):
+                cursor.execute(
+                    f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}"
+                )
+
+        # Bulk writes send no signals, so caches and the itinerary index
+        # have to be told about the new rows.
+        for model in VERSIONED_MODELS:
+            bump_model_version(model)
+        itinerary_index.clear()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {Flight.objects.count()} flights"
+                f" and {Ticket.objects.count()} tickets"
+            )
+        )
+
+    def create_countries(self, rng, count) -> list[int]:
+        countries = Country.objects.bulk_create(
+            [Country(name=f"{_name(rng)}ia") for _ in range(count)],
+            batch_size=self.batch_size,
+        )
+        return [country.id for country in countries]
+
+    def create_airports(self, rng, count, countries) -> list[int]:
+        airports = []
+        for _ in range(count):
+            city = _name(rng)
+            airports.append(
+                Airport(
+                    name=f"{city} International Airport",
+                    closest_big_city=city,
+                    country_id=rng.choice(countries),
+                )
+            )
+        airports = Airport.objects.bulk_create(airports, batch_size=self.batch_size)
+        return [airport.id for airport in airports]
+
+    def create_routes(self, rng, count, airports) -> list[tuple[int, int]]:
+        """Distinct (source, destination) pairs, as (route id, distance)."""
+        count = min(count, len(airports) * (len(airports) - 1))
+        pairs = set()
+        while len(pairs) < count:
+            source, destination = rng.sample(airports, 2)
+            pairs.add((source, destination))
+        routes = Route.objects.bulk_create(
+            [
+                Route(
+                    source_id=source,
+                    destination_id=destination,
+                    distance=rng.randint(150, 9000),
+                )
+                for source, destination in sorted(pairs)
+            ],
+            batch_size=self.batch_size,
+        )
+        return [(route.id, route.distance) for route in routes]
+
+    def create_airplanes(self, rng, type_count, count) -> list[tuple[int, int, int]]:
+        """Airplanes as (airplane id, rows, seats in row)."""
+        names = [name for name, _, _ in AIRPLANE_MODELS][:type_count]
+        names += [f"{_name(rng)} Jet" for _ in range(type_count - len(names))]
+        airplane_types = AirplaneType.objects.bulk_create(
+            [AirplaneType(name=name) for name in names], batch_size=self.batch_size
+        )
+        airplanes = []
+        for index in range(count):
+            name, rows, seats_in_row = AIRPLANE_MODELS[index % len(AIRPLANE_MODELS)]
+            airplanes.append(
+                Airplane(
+                    name=f"{name} #{index + 1}",
+                    rows=rows + rng.randint(-4, 4),
+                    seats_in_row=seats_in_row,
+                    airplane_type=airplane_types[index % len(airplane_types)],
+                )
+            )
+        airplanes = Airplane.objects.bulk_create(airplanes, batch_size=self.batch_size)
+        return [
+            (airplane.id, airplane.rows, airplane.seats_in_row)
+            for airplane in airplanes
+        ]
+
+    def create_crew(self, rng, count) -> list[int]:
+        crew = Crew.objects.bulk_create(
+            [
+                Crew(
+                    first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES)
+                )
+                for _ in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        return [member.id for member in crew]
+
+    def create_users(self, count) -> list[int]:
+        """Users the orders belong to. Reruns reuse the existing ones."""
+        User = get_user_model()
+        password = make_password(None)
+        User.objects.bulk_create(
+            [
+                User(email=f"user{index}@{USER_EMAIL_DOMAIN}", password=password)
+                for index in range(count)
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        return list(
+            User.objects.filter(email__endswith=f"@{USER_EMAIL_DOMAIN}")
+            .order_by("id")
+            .values_list("id", flat=True)[:count]
+        )
+
+    def flight_plan(self, rng, flight_id):
+        """A flight as its row, its crew and its orders, where an order is
+        (user id, created at, [(row, seat), ...])."""
+        route_id, distance = rng.choice(self.routes)
+        airplane_id, rows, seats_in_row = rng.choice(self.airplanes)
+        departure_time = self.start + datetime.timedelta(
+            minutes=5 * rng.randrange(self.slots)
+        )
+        arrival_time = departure_time + datetime.timedelta(
+            minutes=30 + 60 * distance // CRUISE_SPEED_KMH
+        )
+        crew = rng.sample(self.crew, min(len(self.crew), rng.randint(2, 6)))
+
+        capacity = rows * seats_in_row
+        sold = min(capacity, rng.randint(0, round(2 * self.tickets_per_flight)))
+        places = [
+            (place // seats_in_row + 1, place % seats_in_row + 1)
+            for place in rng.sample(range(capacity), sold)
+        ]
+        orders = []
+        while places:
+            size = rng.randint(1, 4)
+            created_at = departure_time - datetime.timedelta(
+                minutes=rng.randint(60, 60 * 24 * 60)
+            )
+            orders.append((rng.choice(self.users), created_at, places[:size]))
+            places = places[size:]
+
+        return (
+            (flight_id, route_id, airplane_id, departure_time, arrival_time, sold),
+            crew,
+            orders,
+        )
+
+    def write_flights(self, rng, count, chunk_size) -> None:
+        """Writes flights in chunks, each chunk with its crews, orders and
+        tickets in one transaction. Ids are assigned here rather than by
+        the database, so tickets can point at their flight and order."""
+        flight_id = (Flight.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+        order_id = (Order.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+        for start in range(0, count, chunk_size):
+            plans = [
+                self.flight_plan(rng, flight_id + index)
+                for index in range(start, min(count, start + chunk_size))
+            ]
+            orders = [
+                (order_id + index, flight[0], order)
+                for index, (flight, order) in enumerate(
+                    (flight, order) for flight, _, orders in plans for order in orders
+                )
+            ]
+            with transaction.atomic():
+                copy_rows(
+                    Flight,
+                    [
+                        "id",
+                        "route_id",
+                        "airplane_id",
+                        "departure_time",
+                        "arrival_time",
+                        "tickets_sold",
+                    ],
+                    (flight for flight, _, _ in plans),
+                )
+                copy_rows(
+                    Flight.crew.through,
+                    ["flight_id", "crew_id"],
+                    (
+                        (flight[0], crew_id)
+                        for flight, crew, _ in plans
+                        for crew_id in crew
+                    ),
+                )
+                copy_rows(
+                    Order,
+                    ["id", "created_at", "user_id"],
+                    (
+                        (id_, created_at, user_id)
+                        for id_, _, (user_id, created_at, _) in orders
+                    ),
+                )
+                copy_rows(
+                    Ticket,
+                    ["row", "seat", "flight_id", "order_id"],
+                    (
+                        (row, seat, flight_id, id_)
+                        for id_, flight_id, (_, _, places) in orders
+                        for row, seat in places
+                    ),
+                )
+            order_id += len(orders)
+            self.stdout.write(f"  {start + len(plans)}/{count} flights")
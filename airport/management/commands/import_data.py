@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from airport.imports import FORMATS, IMPORTERS, format_of, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import countries, airports, routes, airplane types, airplanes, crew "
+        "or flights from a CSV or NDJSON file, naming related rows by their "
+        "natural keys. Rows that fail are reported and the others imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(IMPORTERS))
+        parser.add_argument("path", help="File to import, - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Format of the file, by default taken from its extension",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or format_of(path)
+        if format is None:
+            raise CommandError("Pass --format for a file without a .csv or .ndjson")
+
+        if path == "-":
+            report = self.import_file(sys.stdin.buffer, format, options)
+        else:
+            with open(path, "rb") as file:
+                report = self.import_file(file, format, options)
+
+        for error in report.errors:
+            self.stderr.write(f"  line {error['line']}: {error['errors']}")
+        summary = (
+            f"Created {report.created} {options['kind']}, "
+            f"skipped {report.skipped} that exist"
+        )
+        if report.failed:
+            raise CommandError(f"{summary}, {report.failed} rows failed")
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    @staticmethod
+    def import_file(file, format, options):
+        return import_rows(
+            options["kind"], read_rows(file, format), options["batch_size"]
+        )
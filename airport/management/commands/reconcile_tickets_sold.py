@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from airport.cache import bump_model_version
+from airport.models import Flight, Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Flight.tickets_sold with the tickets of each flight, in "
+        "batches of flight ids, and with --fix recount the flights that "
+        "drifted"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        drifted = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Flight.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            rows = list(
+                Flight.objects.filter(id__gte=ids[0], id__lte=ids[-1])
+                .annotate(actual=Count("tickets"))
+                .exclude(tickets_sold=F("actual"))
+                .values_list("id", "tickets_sold", "actual")
+            )
+            for flight_id, tickets_sold, actual in rows:
+                self.stdout.write(
+                    f"  flight {flight_id}: tickets_sold={tickets_sold} "
+                    f"tickets={actual}"
+                )
+            if rows and options["fix"]:
+                self.recount([flight_id for flight_id, _, _ in rows])
+            drifted += len(rows)
+            last_id = ids[-1]
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("tickets_sold matches every flight"))
+        elif options["fix"]:
+            bump_model_version(Flight)
+            self.stdout.write(self.style.SUCCESS(f"Recounted {drifted} flights"))
+        else:
+            raise CommandError(f"{drifted} flights drifted, run with --fix")
+
+    @staticmethod
+    def recount(flight_ids) -> None:
+        with transaction.atomic():
+            # Wait for the orders in flight to commit, so the count below
+            # sees their tickets
+            list(
+                Flight.objects.select_for_update(no_key=True)
+                .filter(id__in=flight_ids)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+            Flight.objects.filter(id__in=flight_ids).update(
+                tickets_sold=Coalesce(
+                    Subquery(
+                        Ticket.objects.filter(flight=OuterRef("pk"))
+                        .order_by()
+                        .values("flight")
+                        .annotate(count=Count("id"))
+                        .values("count")
+                    ),
+                    Value(0),
+                )
+            )
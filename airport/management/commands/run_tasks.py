@@ -0,0 +1,50 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.module_loading import autodiscover_modules
+
+from airport import queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a worker of the task queue. Start as many as needed, they "
+        "share the queue without taking the same task twice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no task is due instead of waiting for more",
+        )
+
+    def handle(self, *args, **options):
+        autodiscover_modules("tasks")
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        processed = 0
+        while not self.stopping:
+            close_old_connections()
+            ran = queue.run_due(options["batch_size"])
+            processed += ran
+            if not ran:
+                if options["burst"]:
+                    break
+                time.sleep(options["poll_interval"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} tasks"))
+
+    def stop(self, signum, frame):
+        # Finish the batch at hand, then exit
+        self.stopping = True
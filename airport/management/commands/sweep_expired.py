@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from airport.models import IdempotencyKey, SeatHold
+
+
+class Command(BaseCommand):
+    help = "Delete expired seat holds and idempotency keys in bulk"
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted, _ = SeatHold.objects.filter(expires_at__lte=now).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired seat holds"))
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now).delete()
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys")
+        )
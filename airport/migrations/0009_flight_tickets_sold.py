@@ -0,0 +1,31 @@
+# Generated by Django 5.0.8 on 2026-10-18 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport", "0008_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flight",
+            name="tickets_sold",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE airport_flight
+            SET tickets_sold = sold.count
+            FROM (
+                SELECT flight_id, COUNT(*) AS count
+                FROM airport_ticket
+                GROUP BY flight_id
+            ) AS sold
+            WHERE airport_flight.id = sold.flight_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
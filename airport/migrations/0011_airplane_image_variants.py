@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport", "0010_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="airplane",
+            name="image_variants",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
@@ -2,13 +2,24 @@ import os
 import uuid
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils.text import slugify
 
 
 class Country(models.Model):
     name = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="country_name_trgm_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -20,6 +31,14 @@ class Airport(models.Model):
         Country, related_name="airports", on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="airport_name_trgm_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -58,6 +77,8 @@ class Airplane(models.Model):
         AirplaneType, related_name="airplanes", on_delete=models.CASCADE
     )
     image = models.ImageField(null=True, upload_to=airplane_image_file_path)
+    # {width: {format: storage name}}, see airport.images
+    image_variants = models.JSONField(default=dict, editable=False)
 
     @property
     def capacity(self) -> int:
@@ -87,9 +108,19 @@ class Flight(models.Model):
     crew = models.ManyToManyField(Crew, related_name="flights", blank=True)
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    # Denormalized count of the tickets of the flight, kept in step by
+    # OrderSerializer.create and the ticket signals. See the
+    # reconcile_tickets_sold command.
+    tickets_sold = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["-departure_time"]
+        indexes = [
+            models.Index(fields=["departure_time"], name="flight_departure_time_idx"),
+            models.Index(
+                fields=["route", "departure_time"], name="flight_route_departure_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.route} {self.departure_time}"
@@ -104,6 +135,12 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at"], name="order_user_created_at_idx"
+            ),
+            models.Index(fields=["created_at"], name="order_created_at_idx"),
+        ]
 
 
 class Ticket(models.Model):
@@ -131,3 +168,76 @@ class Ticket(models.Model):
                         f"(1, {count_attrs})"
                     }
                 )
+
+
+class SeatHold(models.Model):
+    row = models.IntegerField()
+    seat = models.IntegerField()
+    flight = models.ForeignKey(Flight, related_name="holds", on_delete=models.CASCADE)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="seat_holds", on_delete=models.CASCADE
+    )
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("row", "seat", "flight")
+
+    def __str__(self):
+        return f"{self.flight} (row: {self.row}, seat: {self.seat})"
+
+
+class IdempotencyKey(models.Model):
+    """The response to a request sent with an Idempotency-Key header,
+    replayed to retries of the request with the same key."""
+
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="idempotency_keys",
+        on_delete=models.CASCADE,
+    )
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("user", "key")
+
+    def __str__(self):
+        return self.key
+
+
+class Task(models.Model):
+    """A call of a function registered with airport.queue.task, waiting
+    for a worker of the run_tasks command."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        FAILED = "failed"
+
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    # When the task is due. While it runs, when the attempt times out
+    run_after = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["run_after"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="task_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
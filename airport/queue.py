@@ -0,0 +1,179 @@
+"""A small task queue on top of Postgres.
+
+Functions decorated with ``@task`` can be enqueued instead of called::
+
+    @task(max_attempts=5)
+    def send_order_confirmation(order_id): ...
+
+    send_order_confirmation.enqueue_on_commit(order.id)
+
+With TASK_QUEUE_BACKEND = "database" each call is a Task row that the
+workers of the run_tasks command claim with SELECT ... FOR UPDATE SKIP
+LOCKED, so any number of them can share the table. A failed call is
+retried with exponential backoff until it runs out of attempts. With
+"immediate" the call runs in the process that enqueues it, for
+development without a worker.
+"""
+
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from airport.models import Task
+from airport_service import metrics
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class TaskFunction:
+    def __init__(self, func, max_attempts):
+        self.func = func
+        self.name = f"{func.__module__}.{func.__name__}"
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+        registry[self.name] = self
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, **kwargs):
+        if settings.TASK_QUEUE_BACKEND == "immediate":
+            self.func(*args, **kwargs)
+            return None
+        return Task.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=self.max_attempts,
+            run_after=timezone.now(),
+        )
+
+    def enqueue_on_commit(self, *args, **kwargs):
+        """Enqueues the call once the current transaction commits.
+
+        The database backend writes the task in the transaction itself,
+        where workers can not see it before the commit, and where it is
+        dropped along with everything else on a rollback, with no window
+        in which a crash loses a committed order's task.
+        """
+        if settings.TASK_QUEUE_BACKEND == "immediate":
+            transaction.on_commit(lambda: self.enqueue(*args, **kwargs))
+            return None
+        return self.enqueue(*args, **kwargs)
+
+
+def task(func=None, *, max_attempts=None):
+    def register(func):
+        return TaskFunction(func, max_attempts or settings.TASK_MAX_ATTEMPTS)
+
+    return register(func) if func is not None else register
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with jitter, so tasks that failed together do
+    not all retry together."""
+    delay = min(
+        settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.TASK_RETRY_BACKOFF_MAX,
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def claim(batch_size: int) -> list[Task]:
+    """Takes up to batch_size due tasks off the queue.
+
+    A claimed task stays in the table as running until it finishes. If
+    its worker dies, it is due again once TASK_TIMEOUT has passed. The
+    timeout restarts for each task as it starts, see renew.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[Task.Status.QUEUED, Task.Status.RUNNING],
+                run_after__lte=now,
+            )
+            .order_by("run_after")[:batch_size]
+        )
+        Task.objects.filter(id__in=[queued.id for queued in tasks]).update(
+            status=Task.Status.RUNNING,
+            attempts=F("attempts") + 1,
+            run_after=now + timedelta(seconds=settings.TASK_TIMEOUT),
+        )
+    for queued in tasks:
+        queued.attempts += 1
+    return tasks
+
+
+def renew(queued: Task) -> bool:
+    """Restarts the timeout of a claimed task as it starts.
+
+    The tasks of a batch run one after the other, so a task late in a
+    slow batch may have timed out before its turn and been claimed by
+    another worker, which is then the one to run it. False in that case.
+    """
+    return bool(
+        Task.objects.filter(
+            id=queued.id, status=Task.Status.RUNNING, attempts=queued.attempts
+        ).update(run_after=timezone.now() + timedelta(seconds=settings.TASK_TIMEOUT))
+    )
+
+
+def run(queued: Task) -> str:
+    """Runs a claimed task and records the outcome: "done", "retry" or
+    "failed"."""
+    function = registry.get(queued.name)
+    if function is None:
+        return finish(queued, "failed", f"No task named {queued.name}")
+    if queued.attempts > queued.max_attempts:
+        # Claimed again after its last attempt timed out
+        return finish(queued, "failed", "The last attempt timed out")
+    try:
+        function(*queued.args, **queued.kwargs)
+    except Exception:
+        outcome = "retry" if queued.attempts < queued.max_attempts else "failed"
+        return finish(queued, outcome, traceback.format_exc())
+    return finish(queued, "done")
+
+
+def finish(queued: Task, outcome: str, error: str = "") -> str:
+    tasks = Task.objects.filter(id=queued.id)
+    if outcome == "done":
+        tasks.delete()
+    elif outcome == "retry":
+        tasks.update(
+            status=Task.Status.QUEUED,
+            run_after=timezone.now() + retry_delay(queued.attempts),
+            last_error=error,
+        )
+        logger.warning(
+            "Task %s failed, attempt %s of %s:\n%s",
+            queued.name,
+            queued.attempts,
+            queued.max_attempts,
+            error,
+        )
+    else:
+        tasks.update(status=Task.Status.FAILED, last_error=error)
+        logger.error("Task %s failed for good:\n%s", queued.name, error)
+    metrics.tasks_processed.labels(queued.name, outcome).inc()
+    return outcome
+
+
+def run_due(batch_size: int = 10) -> int:
+    """Claims and runs one batch of due tasks, returns how many ran."""
+    ran = 0
+    for queued in claim(batch_size):
+        if renew(queued):
+            run(queued)
+            ran += 1
+    return ran
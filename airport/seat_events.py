@@ -0,0 +1,259 @@
+"""Live seat availability of flights.
+
+Tickets publish "taken" and "released" events for their flight once
+their transaction commits. Every process keeps a single broadcast per
+flight that copies each event onto the queue of each of its
+subscribers, the streams of FlightViewSet.seats, so thousands of them
+cost one publish and no queries.
+
+With SEAT_EVENTS_BROKER = "memory" an event only reaches the process
+that published it, enough for one process and for the tests. With
+"postgres" it goes out with NOTIFY and one LISTEN thread per process
+hands it to the local broadcasts, so a seat sold by one worker shows up
+on the streams of all of them.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, transaction
+
+from airport.models import Ticket
+from airport_service import metrics
+from airport_service.db_router import primary
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "airport_seat_events"
+# Keeps NOTIFY payloads well under the 8000 bytes Postgres allows
+PLACES_PER_NOTIFY = 200
+
+# How long a client waits to reconnect to a stream served under WSGI,
+# which sends the snapshot and ends instead of holding a thread
+WSGI_RETRY_MS = 5000
+
+# Put on the queue of a subscriber that fell behind instead of the events
+# it missed
+RESYNC = object()
+
+
+class SeatBroadcast:
+    """Fans events out to the subscribers of each flight in this process.
+
+    Subscribers are asyncio queues that belong to an event loop; events
+    may come from any thread. Each event costs one call_soon_threadsafe
+    per flight and loop, however many subscribers the flight has.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(lambda: defaultdict(set))
+
+    def subscribe(self, flight_id: int) -> asyncio.Queue:
+        """Must be called from the event loop that reads the queue."""
+        queue = asyncio.Queue(maxsize=settings.SEAT_STREAM_QUEUE_SIZE)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers[flight_id][loop].add(queue)
+        metrics.seat_stream_subscribers.inc()
+        return queue
+
+    def unsubscribe(self, flight_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            loops = self._subscribers.get(flight_id, {})
+            for loop, queues in list(loops.items()):
+                queues.discard(queue)
+                if not queues:
+                    del loops[loop]
+            if not loops:
+                self._subscribers.pop(flight_id, None)
+        metrics.seat_stream_subscribers.dec()
+
+    def subscriber_count(self, flight_id: int) -> int:
+        with self._lock:
+            loops = self._subscribers.get(flight_id, {})
+            return sum(len(queues) for queues in loops.values())
+
+    def dispatch(self, flight_id: int, event: dict) -> None:
+        with self._lock:
+            loops = [
+                (loop, list(queues))
+                for loop, queues in self._subscribers.get(flight_id, {}).items()
+            ]
+        for loop, queues in loops:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, queues, event)
+            except RuntimeError:
+                # The loop closed, its subscribers go with it
+                pass
+
+    @staticmethod
+    def _fan_out(queues, event) -> None:
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The stream sends a new snapshot instead of the backlog
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+
+broadcast = SeatBroadcast()
+
+
+class MemoryBroker:
+    def publish(self, flight_id: int, event: dict) -> None:
+        broadcast.dispatch(flight_id, event)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class PostgresBroker:
+    """Carries events between processes over LISTEN/NOTIFY."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listening = threading.Event()
+        self._stopping = threading.Event()
+
+    def publish(self, flight_id: int, event: dict) -> None:
+        places = event["places"]
+        with connections["default"].cursor() as cursor:
+            for start in range(0, len(places), PLACES_PER_NOTIFY):
+                payload = {
+                    "flight": flight_id,
+                    "event": {
+                        **event,
+                        "places": places[start : start + PLACES_PER_NOTIFY],
+                    },
+                }
+                cursor.execute(
+                    "SELECT pg_notify(%s, %s)", [CHANNEL, json.dumps(payload)]
+                )
+
+    def start(self) -> None:
+        """Starts the LISTEN thread of the process if it is not running,
+        and waits a moment for it to listen."""
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._stopping.clear()
+                self._listener = threading.Thread(
+                    target=self.listen, name="seat-events", daemon=True
+                )
+                self._listener.start()
+        self._listening.wait(timeout=5)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopping.set()
+            if self._listener is not None:
+                self._listener.join()
+                self._listener = None
+
+    def listen(self) -> None:
+        try:
+            while not self._stopping.is_set():
+                try:
+                    self._listen()
+                except Exception:
+                    logger.exception("Lost the connection to %s", CHANNEL)
+                    self._listening.clear()
+                    connections["default"].close()
+                    time.sleep(1)
+        finally:
+            self._listening.clear()
+            connections["default"].close()
+
+    def _listen(self) -> None:
+        connection = connections["default"]
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        self._listening.set()
+        raw = connection.connection
+        while not self._stopping.is_set():
+            if select.select([raw], [], [], 1) == ([], [], []):
+                continue
+            raw.poll()
+            while raw.notifies:
+                notify = raw.notifies.pop(0)
+                payload = json.loads(notify.payload)
+                broadcast.dispatch(payload["flight"], payload["event"])
+
+
+_brokers = {"memory": MemoryBroker(), "postgres": PostgresBroker()}
+
+
+def broker():
+    return _brokers[settings.SEAT_EVENTS_BROKER]
+
+
+def publish_on_commit(flight_id: int, kind: str, places) -> None:
+    """Publishes a "taken" or "released" event for the (row, seat) places
+    of a flight once the current transaction commits."""
+    event = {
+        "type": kind,
+        "places": [{"row": row, "seat": seat} for row, seat in places],
+    }
+    transaction.on_commit(lambda: broker().publish(flight_id, event))
+
+
+def taken_places(flight_id: int) -> list[dict]:
+    # From the primary: a replica may not have the tickets yet whose
+    # events were published before the stream subscribed
+    with primary():
+        return list(
+            Ticket.objects.filter(flight_id=flight_id)
+            .order_by("row", "seat")
+            .values("row", "seat")
+        )
+
+
+def server_sent_event(kind: str, data: dict) -> str:
+    return f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream(flight_id: int):
+    """The server-sent events of a flight: a snapshot of its taken places,
+    then the places taken and released since, with a comment line every
+    SEAT_STREAM_HEARTBEAT seconds so proxies keep the connection open."""
+    await sync_to_async(broker().start, thread_sensitive=False)()
+    # Subscribed before the snapshot is read, so no event falls in between
+    queue = broadcast.subscribe(flight_id)
+    try:
+        snapshot = await sync_to_async(taken_places)(flight_id)
+        yield server_sent_event("snapshot", {"taken_places": snapshot})
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), settings.SEAT_STREAM_HEARTBEAT
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is RESYNC:
+                snapshot = await sync_to_async(taken_places)(flight_id)
+                yield server_sent_event("snapshot", {"taken_places": snapshot})
+            else:
+                yield server_sent_event(event["type"], {"places": event["places"]})
+    finally:
+        broadcast.unsubscribe(flight_id, queue)
+
+
+def snapshot_stream(flight_id: int):
+    """The stream under WSGI, where it would hold a thread for as long as
+    the client stays: only the snapshot, and a hint to reconnect."""
+    yield f"retry: {WSGI_RETRY_MS}\n\n"
+    yield server_sent_event("snapshot", {"taken_places": taken_places(flight_id)})
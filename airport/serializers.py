@@ -1,7 +1,18 @@
-from django.db import transaction
+import base64
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from airport import seat_events
+from airport.cache import bump_model_version
+from airport.imports import FORMATS, IMPORTERS, format_of
 from airport.models import (
     Country,
     Airport,
@@ -12,7 +23,38 @@ from airport.models import (
     Flight,
     Order,
     Ticket,
+    SeatHold,
 )
+from airport.tasks import send_order_confirmation
+from airport_service import metrics
+from airport_service.db_router import primary
+
+
+def unavailable_seats(places, user) -> dict:
+    """Map (flight_id, row, seat) places that are sold or held by another
+    user to the reason they can not be booked."""
+    if not places:
+        return {}
+    exact = Q()
+    for flight_id, row, seat in places:
+        exact |= Q(flight_id=flight_id, row=row, seat=seat)
+
+    unavailable = {}
+    for place in (
+        SeatHold.objects.filter(exact, expires_at__gt=timezone.now())
+        .exclude(user=user)
+        .values_list("flight_id", "row", "seat")
+    ):
+        unavailable[place] = "This seat is held by another customer."
+    for place in Ticket.objects.filter(exact).values_list("flight_id", "row", "seat"):
+        unavailable[place] = "This seat is already taken."
+    return unavailable
+
+
+def record_sale(places) -> None:
+    metrics.tickets_sold.inc(len(places))
+    for count in Counter(flight_id for flight_id, _, _ in places).values():
+        metrics.flight_tickets_sold.observe(count)
 
 
 class CountrySerializer(serializers.ModelSerializer):
@@ -85,14 +127,40 @@ class AirplaneListRetrieveSerializer(AirplaneSerializer):
             "airplane_type",
             "capacity",
             "image",
+            "image_variants",
         )
 
+    image_variants = serializers.SerializerMethodField()
+
+    def get_image_variants(self, obj) -> dict:
+        """URLs of the resized images by width and format, empty until
+        they are built after an upload."""
+        request = self.context.get("request")
+        return {
+            width: {
+                format: (
+                    request.build_absolute_uri(default_storage.url(name))
+                    if request
+                    else default_storage.url(name)
+                )
+                for format, name in formats.items()
+            }
+            for width, formats in obj.image_variants.items()
+        }
+
 
 class AirplaneImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Airplane
         fields = ("id", "image")
 
+    def validate_image(self, image):
+        if image.size > settings.AIRPLANE_IMAGE_MAX_MB * 1024 * 1024:
+            raise ValidationError(
+                f"Images are limited to {settings.AIRPLANE_IMAGE_MAX_MB} MB."
+            )
+        return image
+
 
 class CrewSerializer(serializers.ModelSerializer):
     class Meta:
@@ -113,9 +181,53 @@ class FlightListSerializer(FlightSerializer):
     crew = serializers.SlugRelatedField(
         many=True, read_only=True, slug_field="full_name"
     )
+    capacity = serializers.IntegerField(read_only=True)
+    tickets_available = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Flight
+        fields = (
+            "id",
+            "route",
+            "airplane",
+            "crew",
+            "departure_time",
+            "arrival_time",
+            "capacity",
+            "tickets_available",
+        )
+
+
+class TicketFlightField(serializers.PrimaryKeyRelatedField):
+    """Looks flights up in the map preloaded by TicketListSerializer."""
+
+    def to_internal_value(self, data):
+        flights = getattr(self.parent.parent, "flights", None)
+        if flights is None:
+            return super().to_internal_value(data)
+        try:
+            return flights[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class TicketListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            flight_ids = set()
+            for item in data:
+                try:
+                    flight_ids.add(int(item["flight"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            self.flights = Flight.objects.select_related("airplane").in_bulk(flight_ids)
+        return super().to_internal_value(data)
 
 
 class TicketSerializer(serializers.ModelSerializer):
+    flight = TicketFlightField(queryset=Flight.objects.select_related("airplane"))
 
     def validate(self, attrs):
         data = super().validate(attrs=attrs)
@@ -132,6 +244,10 @@ class TicketSerializer(serializers.ModelSerializer):
             "seat",
             "flight",
         )
+        list_serializer_class = TicketListSerializer
+        # Seat collisions are checked for the whole order at once
+        # in OrderSerializer.validate_tickets
+        validators = []
 
 
 class TicketSeatsSerializer(TicketSerializer):
@@ -159,8 +275,165 @@ class FlightDetailSerializer(FlightSerializer):
         )
 
 
+class FlightSeatMapSerializer(FlightDetailSerializer):
+    """Flight detail with taken places packed into a base64 bitmap.
+
+    Bit ``(row - 1) * seats_in_row + (seat - 1)`` is set when the seat is
+    taken, most significant bit first within each byte. The places are
+    read with a values_list scan, or taken from ``taken_seats`` when the
+    view loaded them already.
+    """
+
+    seat_map = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Flight
+        fields = (
+            "id",
+            "route",
+            "airplane",
+            "crew",
+            "departure_time",
+            "arrival_time",
+            "seat_map",
+        )
+
+    def get_seat_map(self, obj) -> str:
+        rows, seats_in_row = obj.airplane.rows, obj.airplane.seats_in_row
+        taken = getattr(obj, "taken_seats", None)
+        if taken is None:
+            taken = obj.tickets.values_list("row", "seat")
+        bitmap = bytearray((rows * seats_in_row + 7) // 8)
+        for row, seat in taken:
+            # Places outside the airplane, e.g. sold before it was resized,
+            # have no bit
+            if not (0 < row <= rows and 0 < seat <= seats_in_row):
+                continue
+            index = (row - 1) * seats_in_row + seat - 1
+            bitmap[index // 8] |= 0x80 >> (index % 8)
+        return base64.b64encode(bitmap).decode("ascii")
+
+
+class SeatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeatHold
+        fields = ("row", "seat")
+
+
+class FlightHoldSerializer(serializers.Serializer):
+    seats = SeatSerializer(many=True, allow_empty=False)
+    expires_at = serializers.DateTimeField(read_only=True)
+
+    def validate_seats(self, seats):
+        places = [(seat["row"], seat["seat"]) for seat in seats]
+        if len(set(places)) != len(places):
+            raise ValidationError("Seats must not repeat.")
+        return seats
+
+    def create(self, validated_data):
+        flight = validated_data["flight"]
+        user = validated_data["user"]
+        seats = validated_data["seats"]
+        for seat in seats:
+            Ticket.validate_ticket(
+                seat["row"], seat["seat"], flight.airplane, ValidationError
+            )
+
+        with transaction.atomic():
+            # Holds and orders on the same flight queue up on this lock
+            Flight.objects.select_for_update(no_key=True).filter(pk=flight.pk).get()
+            now = timezone.now()
+            flight.holds.filter(expires_at__lte=now).delete()
+
+            places = [(flight.id, seat["row"], seat["seat"]) for seat in seats]
+            unavailable = unavailable_seats(places, user)
+            if unavailable:
+                metrics.order_failures.labels("seat_unavailable").inc()
+                raise ValidationError(
+                    {
+                        "seats": [
+                            {"seat": unavailable[place]} if place in unavailable else {}
+                            for place in places
+                        ]
+                    }
+                )
+
+            expires_at = now + timedelta(minutes=settings.SEAT_HOLD_MINUTES)
+            flight.holds.filter(user=user).delete()
+            SeatHold.objects.bulk_create(
+                SeatHold(flight=flight, user=user, expires_at=expires_at, **seat)
+                for seat in seats
+            )
+        return {"seats": seats, "expires_at": expires_at}
+
+
+class ImportSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=list(IMPORTERS))
+    format = serializers.ChoiceField(choices=FORMATS, required=False)
+    file = serializers.FileField()
+
+    def validate(self, attrs):
+        if "format" not in attrs:
+            attrs["format"] = format_of(attrs["file"].name)
+            if attrs["format"] is None:
+                raise ValidationError(
+                    {
+                        "format": "The format of a file without a .csv or .ndjson "
+                        "extension is required."
+                    }
+                )
+        return attrs
+
+
+class OrderExportSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["end"] < attrs["start"]:
+            raise ValidationError({"to": "The end of the range is before its start."})
+        return attrs
+
+
+class ItinerarySearchSerializer(serializers.Serializer):
+    source = serializers.PrimaryKeyRelatedField(queryset=Airport.objects.all())
+    destination = serializers.PrimaryKeyRelatedField(queryset=Airport.objects.all())
+    date = serializers.DateField()
+    max_stops = serializers.IntegerField(min_value=0, max_value=3, default=1)
+
+
+class ItineraryFlightSerializer(FlightSerializer):
+    route = RouteListSerializer(read_only=True)
+    airplane = serializers.SlugRelatedField(
+        many=False, read_only=True, slug_field="name"
+    )
+
+    class Meta:
+        model = Flight
+        fields = ("id", "route", "airplane", "departure_time", "arrival_time")
+
+
+class ItinerarySerializer(serializers.Serializer):
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    stops = serializers.IntegerField()
+    distance = serializers.IntegerField()
+    flights = ItineraryFlightSerializer(many=True)
+
+
+class SharedFlightDetailSerializer(FlightDetailSerializer):
+    """Serializes each flight once per response, the tickets of an order
+    on the same flight share the representation."""
+
+    def to_representation(self, instance):
+        representations = self.context.setdefault("flight_representations", {})
+        if instance.pk not in representations:
+            representations[instance.pk] = super().to_representation(instance)
+        return representations[instance.pk]
+
+
 class TicketDetailSerializer(TicketSerializer):
-    flight = FlightDetailSerializer(read_only=True)
+    flight = SharedFlightDetailSerializer(read_only=True)
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -171,12 +444,79 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ("id", "created_at", "tickets", "user")
         read_only_fields = ("id", "user", "created_at")
 
+    def validate_tickets(self, tickets):
+        errors = [{} for _ in tickets]
+        seen = set()
+        for index, ticket in enumerate(tickets):
+            place = (ticket["flight"].id, ticket["row"], ticket["seat"])
+            if place in seen:
+                errors[index] = {"seat": "This seat is repeated in the order."}
+            seen.add(place)
+
+        if any(errors):
+            raise ValidationError(errors)
+        return tickets
+
     def create(self, validated_data):
-        with transaction.atomic():
+        with primary(), transaction.atomic():
             tickets_data = validated_data.pop("tickets")
+            user = validated_data["user"]
+            places = [
+                (ticket["flight"].id, ticket["row"], ticket["seat"])
+                for ticket in tickets_data
+            ]
+            flight_ids = sorted({flight_id for flight_id, _, _ in places})
+
+            # Lock in a stable order so concurrent orders can not deadlock
+            list(
+                Flight.objects.select_for_update(no_key=True)
+                .filter(id__in=flight_ids)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+            unavailable = unavailable_seats(places, user)
+            if unavailable:
+                metrics.order_failures.labels("seat_unavailable").inc()
+                raise ValidationError(
+                    {
+                        "tickets": [
+                            {"seat": unavailable[place]} if place in unavailable else {}
+                            for place in places
+                        ]
+                    }
+                )
+
             order = Order.objects.create(**validated_data)
-            for ticket_data in tickets_data:
-                Ticket.objects.create(order=order, **ticket_data)
+            try:
+                Ticket.objects.bulk_create(
+                    Ticket(order=order, **ticket_data) for ticket_data in tickets_data
+                )
+            except IntegrityError:
+                metrics.order_failures.labels("seat_taken").inc()
+                raise ValidationError(
+                    {"tickets": "Some of the seats have just been taken."}
+                )
+            # The flights are locked above, so the counts can not race
+            sold = Counter(flight_id for flight_id, _, _ in places)
+            Flight.objects.filter(id__in=sold).update(
+                tickets_sold=F("tickets_sold")
+                + Case(
+                    *(
+                        When(id=flight_id, then=count)
+                        for flight_id, count in sold.items()
+                    )
+                )
+            )
+            SeatHold.objects.filter(flight__in=flight_ids, user=user).delete()
+            # bulk_create sends no post_save signals
+            transaction.on_commit(lambda: bump_model_version(Ticket))
+            transaction.on_commit(lambda: record_sale(places))
+            taken = defaultdict(list)
+            for flight_id, row, seat in places:
+                taken[flight_id].append((row, seat))
+            for flight_id, seats in taken.items():
+                seat_events.publish_on_commit(flight_id, "taken", seats)
+            send_order_confirmation.enqueue_on_commit(order.id)
             return order
 
 
@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from airport import seat_events
+from airport.cache import bump_model_version
+from airport.itineraries import itinerary_index
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Country,
+    Crew,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+
+VERSIONED_MODELS = (
+    Country,
+    Airport,
+    Route,
+    AirplaneType,
+    Airplane,
+    Crew,
+    Flight,
+    Order,
+    Ticket,
+)
+
+
+@receiver([post_save, post_delete])
+def bump_table_version(sender, **kwargs):
+    if sender in VERSIONED_MODELS:
+        transaction.on_commit(lambda: bump_model_version(sender))
+
+
+@receiver(m2m_changed, sender=Flight.crew.through)
+def bump_flight_crew_version(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(lambda: bump_model_version(Flight))
+
+
+@receiver(post_save, sender=Route)
+def update_itinerary_route(sender, instance, **kwargs):
+    transaction.on_commit(lambda: itinerary_index.update_route(instance))
+
+
+@receiver(post_delete, sender=Route)
+def remove_itinerary_route(sender, instance, **kwargs):
+    route_id = instance.id
+    transaction.on_commit(lambda: itinerary_index.remove_route(route_id))
+
+
+@receiver(post_save, sender=Flight)
+def update_itinerary_flight(sender, instance, **kwargs):
+    transaction.on_commit(lambda: itinerary_index.update_flight(instance))
+
+
+@receiver(post_delete, sender=Flight)
+def remove_itinerary_flight(sender, instance, **kwargs):
+    flight_id = instance.id
+    transaction.on_commit(lambda: itinerary_index.remove_flight(flight_id))
+
+
+@receiver(post_save, sender=Ticket)
+def count_ticket_sold(sender, instance, created, **kwargs):
+    # OrderSerializer.create uses bulk_create and counts its tickets itself
+    if created:
+        Flight.objects.filter(id=instance.flight_id).update(
+            tickets_sold=F("tickets_sold") + 1
+        )
+        seat_events.publish_on_commit(
+            instance.flight_id, "taken", [(instance.row, instance.seat)]
+        )
+
+
+@receiver(post_delete, sender=Ticket)
+def count_ticket_returned(sender, instance, **kwargs):
+    Flight.objects.filter(id=instance.flight_id).update(
+        tickets_sold=F("tickets_sold") - 1
+    )
+    seat_events.publish_on_commit(
+        instance.flight_id, "released", [(instance.row, instance.seat)]
+    )
@@ -0,0 +1,32 @@
+from django.core.mail import send_mail
+
+from airport.models import Order
+from airport.queue import task
+
+
+@task
+def send_order_confirmation(order_id: int) -> None:
+    """Emails the customer the tickets of their order."""
+    order = (
+        Order.objects.select_related("user")
+        .prefetch_related(
+            "tickets__flight__route__source", "tickets__flight__route__destination"
+        )
+        .filter(id=order_id)
+        .first()
+    )
+    if order is None:
+        return
+    lines = [
+        f"{ticket.flight.route.source.name} - "
+        f"{ticket.flight.route.destination.name}, "
+        f"{ticket.flight.departure_time:%Y-%m-%d %H:%M %Z}, "
+        f"row {ticket.row}, seat {ticket.seat}"
+        for ticket in order.tickets.all()
+    ]
+    send_mail(
+        f"Your order #{order.id}",
+        "Thank you for your order.\n\n" + "\n".join(lines),
+        None,
+        [order.user.email],
+    )
@@ -1,10 +1,16 @@
 import os.path
+import shutil
 import tempfile
+from io import StringIO
 
 from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 
+from airport.images import build_image_variants
 from airport.models import Airplane
 from airport.tests.base import (
     BaseSetUp,
@@ -135,3 +141,98 @@ class AirplaneImageUploadTests(BaseSetUp):
         res = self.client.get(AIRPLANE_URL)
 
         self.assertIn("image", res.data[0].keys())
+
+
+@override_settings(AIRPLANE_IMAGE_WORKERS=0)
+class AirplaneImageVariantsTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client.force_authenticate(self.admin)
+        self.airplane = sample_airplane()
+
+    def upload(self, image, suffix=".jpg", format="JPEG"):
+        url = reverse("airport:airplane-upload-image", args=[self.airplane.id])
+        with tempfile.NamedTemporaryFile(suffix=suffix) as ntf:
+            image.save(ntf, format=format)
+            ntf.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(url, {"image": ntf}, format="multipart")
+        self.airplane.refresh_from_db()
+        return res
+
+    def test_variants_built_after_upload(self):
+        res = self.upload(Image.new("RGB", (2000, 1000)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self.airplane.image_variants), {"160", "480", "1024"})
+        for width, formats in self.airplane.image_variants.items():
+            self.assertEqual(set(formats), {"jpg", "webp"})
+            for name in formats.values():
+                with default_storage.open(name) as file, Image.open(file) as image:
+                    self.assertEqual(image.size, (int(width), int(width) // 2))
+
+    def test_variants_on_airplane_list(self):
+        self.upload(Image.new("RGB", (600, 300)))
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(AIRPLANE_URL)
+
+        variants = res.data[0]["image_variants"]
+        self.assertTrue(variants["160"]["webp"].startswith("http://testserver/"))
+        self.assertTrue(variants["160"]["webp"].endswith("-160.webp"))
+
+    def test_small_images_are_not_enlarged(self):
+        self.upload(Image.new("RGB", (300, 100)))
+
+        name = self.airplane.image_variants["1024"]["jpg"]
+        with default_storage.open(name) as file, Image.open(file) as image:
+            self.assertEqual(image.size, (300, 100))
+
+    def test_transparent_images_keep_alpha(self):
+        self.upload(Image.new("RGBA", (200, 200)), suffix=".png", format="PNG")
+
+        self.assertEqual(set(self.airplane.image_variants["160"]), {"png", "webp"})
+
+    def test_new_upload_clears_variants(self):
+        self.upload(Image.new("RGB", (200, 200)))
+        url = reverse("airport:airplane-upload-image", args=[self.airplane.id])
+
+        # The variants of the new image are built once the upload commits
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new("RGB", (200, 200)).save(ntf, format="JPEG")
+            ntf.seek(0)
+            self.client.post(url, {"image": ntf}, format="multipart")
+
+        self.airplane.refresh_from_db()
+        self.assertEqual(self.airplane.image_variants, {})
+
+    def test_variants_of_a_replaced_image_are_dropped(self):
+        self.upload(Image.new("RGB", (200, 200)))
+        old_image = self.airplane.image.name
+        self.upload(Image.new("RGB", (300, 300)))
+        variants = self.airplane.image_variants
+
+        build_image_variants(self.airplane.id, old_image)
+
+        self.airplane.refresh_from_db()
+        self.assertEqual(self.airplane.image_variants, variants)
+
+    @override_settings(AIRPLANE_IMAGE_MAX_MB=0)
+    def test_image_size_limit(self):
+        res = self.upload(Image.new("RGB", (10, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_build_image_variants_command(self):
+        self.upload(Image.new("RGB", (200, 200)))
+        Airplane.objects.update(image_variants={})
+
+        call_command("build_image_variants", stdout=StringIO())
+
+        self.airplane.refresh_from_db()
+        self.assertEqual(set(self.airplane.image_variants), {"160", "480", "1024"})
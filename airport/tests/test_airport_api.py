@@ -29,7 +29,7 @@ class UserAirportAPITests(BaseSetUp):
         serializer = AirportListSerializer(airports, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_list_airports_with_filter_by_name(self):
         airport1 = sample_airport(name="AAA")
@@ -41,8 +41,8 @@ class UserAirportAPITests(BaseSetUp):
         serializer2 = AirportListSerializer(airport2)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
 
     def test_list_airports_with_filter_by_country(self):
         country1 = sample_country(name="AAA")
@@ -56,8 +56,8 @@ class UserAirportAPITests(BaseSetUp):
         serializer2 = AirportListSerializer(airport2)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
 
     def test_create_airport_forbidden(self):
         payload = {
@@ -0,0 +1,164 @@
+import asyncio
+import datetime
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.models import Order, Ticket
+from airport.tests.base import (
+    BaseSetUp,
+    sample_airplane,
+    sample_flight,
+    sample_route,
+)
+from airport.views import FlightViewSet, RouteViewSet
+
+FLIGHT_URL = reverse("airport:flight-list")
+ROUTE_URL = reverse("airport:route-list")
+
+
+def async_view(viewset, actions, **initkwargs):
+    with override_settings(ASYNC_VIEWS=True):
+        return viewset.as_view(actions, **initkwargs)
+
+
+class AsyncViewTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.factory = AsyncRequestFactory()
+        self.token = AccessToken.for_user(self.user)
+        self.flight_list = async_view(
+            FlightViewSet,
+            {"get": "list", "post": "create"},
+            basename="flight",
+            detail=False,
+        )
+        self.flight_detail = async_view(
+            FlightViewSet, {"get": "retrieve"}, basename="flight", detail=True
+        )
+
+    def get(self, view, path, data=None, headers=None, **kwargs):
+        request = self.factory.get(
+            path,
+            data,
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                **(headers or {}),
+            },
+        )
+        return async_to_sync(view)(request, **kwargs)
+
+    def test_async_views_are_opt_in(self):
+        self.assertTrue(asyncio.iscoroutinefunction(self.flight_list))
+        self.assertFalse(
+            asyncio.iscoroutinefunction(
+                FlightViewSet.as_view({"get": "list"}, basename="flight")
+            )
+        )
+        self.assertFalse(
+            asyncio.iscoroutinefunction(
+                async_view(RouteViewSet, {"get": "retrieve"}, basename="route")
+            )
+        )
+
+    def test_flight_list(self):
+        flight = sample_flight(airplane=sample_airplane(rows=2, seats_in_row=2))
+        sample_flight()
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.user), flight=flight, row=1, seat=1
+        )
+
+        res = self.get(self.flight_list, FLIGHT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, self.client.get(FLIGHT_URL).data)
+
+    def test_flight_list_cursor_pagination(self):
+        flights = [
+            sample_flight(departure_time=datetime.datetime(2024, 8, day, 21, 0, 0))
+            for day in (1, 2, 2, 3)
+        ]
+
+        res = self.get(self.flight_list, FLIGHT_URL, {"page_size": 1})
+        ids = [flight["id"] for flight in res.data["results"]]
+        while res.data["next"]:
+            res = self.get(self.flight_list, res.data["next"])
+            ids += [flight["id"] for flight in res.data["results"]]
+        previous = self.get(self.flight_list, res.data["previous"])
+
+        self.assertEqual(res.data["count"], 4)
+        self.assertEqual(ids, [flight.id for flight in reversed(flights)])
+        self.assertEqual(previous.data["results"][0]["id"], flights[1].id)
+
+    def test_flight_detail(self):
+        flight = sample_flight()
+        flight.crew.create(first_name="Olena", last_name="Kovalenko")
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.user), flight=flight, row=1, seat=1
+        )
+        url = reverse("airport:flight-detail", args=[flight.id])
+
+        for params in ({}, {"seat_format": "bitmap"}):
+            with self.subTest(params=params):
+                res = self.get(self.flight_detail, url, params, pk=flight.id)
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(res.data, self.client.get(url, params).data)
+
+    def test_flight_detail_not_found(self):
+        for pk in ("0", "abc"):
+            with self.subTest(pk=pk):
+                res = self.get(self.flight_detail, FLIGHT_URL, pk=pk)
+
+                self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_flight_detail_not_modified(self):
+        flight = sample_flight()
+        url = reverse("airport:flight-detail", args=[flight.id])
+        etag = self.get(self.flight_detail, url, pk=flight.id)["ETag"]
+
+        res = self.get(
+            self.flight_detail, url, headers={"If-None-Match": etag}, pk=flight.id
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_route_list(self):
+        sample_route()
+        route_list = async_view(RouteViewSet, {"get": "list"}, basename="route")
+
+        res = self.get(route_list, ROUTE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(res.data, self.client.get(ROUTE_URL).data)
+        self.assertEqual(self.get(route_list, ROUTE_URL)["X-Cache"], "HIT")
+
+    def test_auth_required(self):
+        request = self.factory.get(FLIGHT_URL)
+
+        res = async_to_sync(self.flight_list)(request)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_methods_use_sync_view(self):
+        payload = {
+            "route": sample_route().id,
+            "airplane": sample_airplane().id,
+            "departure_time": "2024-08-31T20:00:00Z",
+            "arrival_time": "2024-08-31T21:00:00Z",
+        }
+        request = self.factory.post(
+            FLIGHT_URL,
+            payload,
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {AccessToken.for_user(self.admin)}"},
+        )
+
+        res = async_to_sync(self.flight_list)(request)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
@@ -0,0 +1,112 @@
+import asyncio
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+
+from airport.management.commands.benchmark_api import percentile
+from airport.management.commands.benchmark_http import read_response
+from airport.models import Flight, Order, Route, Ticket
+from airport.tests.base import BaseSetUp, sample_airplane
+
+DATASET = {
+    "countries": 2,
+    "airports": 5,
+    "routes": 10,
+    "airplane_types": 2,
+    "airplanes": 3,
+    "crew": 5,
+    "users": 4,
+    "flights": 30,
+    "tickets": 90,
+    "chunk_size": 7,
+}
+
+
+class GenerateDatasetTests(BaseSetUp):
+    def test_generate_dataset(self):
+        call_command("generate_dataset", stdout=StringIO(), **DATASET)
+
+        self.assertEqual(Route.objects.count(), 10)
+        self.assertEqual(Flight.objects.count(), 30)
+        self.assertEqual(Flight.objects.filter(crew__isnull=True).count(), 0)
+        self.assertTrue(Ticket.objects.exists())
+        self.assertFalse(
+            Ticket.objects.filter(row__gt=F("flight__airplane__rows")).exists()
+        )
+        self.assertFalse(
+            Ticket.objects.filter(seat__gt=F("flight__airplane__seats_in_row")).exists()
+        )
+        call_command("reconcile_tickets_sold", stdout=StringIO())
+
+    def test_generated_ids_do_not_collide(self):
+        call_command("generate_dataset", stdout=StringIO(), **DATASET)
+
+        flight = Flight.objects.first()
+        last_flight = Flight.objects.latest("id")
+        last_order = Order.objects.latest("id")
+        created = Flight.objects.create(
+            route=flight.route,
+            airplane=sample_airplane(),
+            departure_time=flight.departure_time,
+            arrival_time=flight.arrival_time,
+        )
+        order = Order.objects.create(user=self.user)
+
+        self.assertGreater(created.id, last_flight.id)
+        self.assertGreater(order.id, last_order.id)
+
+
+class BenchmarkAPITests(BaseSetUp):
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_benchmark_api(self):
+        call_command("generate_dataset", stdout=StringIO(), **DATASET)
+        orders = Order.objects.count()
+        out = StringIO()
+
+        call_command("benchmark_api", requests=20, warmup=0, json=True, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            sum(row["requests"] for row in report["operations"].values()), 20
+        )
+        for row in report["operations"].values():
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+            self.assertGreater(row["queries_per_request"], 0)
+        self.assertEqual(Order.objects.count(), orders)
+
+
+class BenchmarkHTTPTests(BaseSetUp):
+    @staticmethod
+    def read(payload: bytes):
+        async def read():
+            reader = asyncio.StreamReader()
+            reader.feed_data(payload)
+            reader.feed_eof()
+            return await read_response(reader), await reader.read()
+
+        return asyncio.run(read())
+
+    def test_read_response(self):
+        self.assertEqual(
+            self.read(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}next"),
+            (200, b"next"),
+        )
+        self.assertEqual(
+            self.read(
+                b"HTTP/1.1 404 Not Found\r\nTransfer-Encoding: chunked\r\n\r\n"
+                b"3\r\nabc\r\n0\r\n\r\nnext"
+            ),
+            (404, b"next"),
+        )
+
+    def test_read_response_connection_close(self):
+        with self.assertRaises(ConnectionResetError):
+            self.read(b"HTTP/1.1 200 OK\r\nConnection: close\r\n\r\n{}")
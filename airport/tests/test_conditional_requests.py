@@ -0,0 +1,148 @@
+import time
+from unittest import mock
+
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+
+from airport.cache import bump_model_version, model_versions
+from airport.models import Flight, Order
+from airport.tests.base import BaseSetUp, detail_url, sample_flight, sample_route
+from airport.views import FlightViewSet, OrderViewSet
+
+FLIGHT_URL = reverse("airport:flight-list")
+ORDER_URL = reverse("airport:order-list")
+
+
+class ConditionalRequestTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        self.flight_url = detail_url("airport:flight-detail", self.flight.id)
+
+    def seconds_after_last_write(self, seconds, url=None, viewset=FlightViewSet):
+        """Moves the clock of the versions to seconds after the latest one."""
+        self.client.get(url or self.flight_url)
+        latest = max(model_versions(viewset.cache_models))
+        clock = mock.patch("airport.cache.time")
+        clock.start().time_ns.return_value = latest + int(seconds * 10**9)
+        self.addCleanup(clock.stop)
+
+    def test_response_has_validators(self):
+        self.seconds_after_last_write(1)
+
+        res = self.client.get(self.flight_url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", res)
+        self.assertIn("Last-Modified", res)
+
+    def test_no_last_modified_within_second_of_write(self):
+        self.seconds_after_last_write(0)
+
+        res = self.client.get(self.flight_url)
+
+        self.assertIn("ETag", res)
+        self.assertNotIn("Last-Modified", res)
+
+    def test_etag_is_per_renderer(self):
+        json_etag = self.client.get(
+            self.flight_url, HTTP_ACCEPT="application/json"
+        ).get("ETag")
+
+        res = self.client.get(
+            self.flight_url, HTTP_ACCEPT="text/html", HTTP_IF_NONE_MATCH=json_etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], json_etag)
+
+    def test_matching_etag_skips_database(self):
+        etag = self.client.get(FLIGHT_URL)["ETag"]
+
+        with self.assertNumQueries(0):
+            res = self.client.get(FLIGHT_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res["ETag"], etag)
+
+    def test_matching_etag_of_retrieve(self):
+        etag = self.client.get(self.flight_url)["ETag"]
+
+        res = self.client.get(self.flight_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res["ETag"], etag)
+
+    def test_missing_object_not_found_despite_modified_since(self):
+        self.seconds_after_last_write(1)
+        future = http_date(time.time() + 3600)
+
+        res = self.client.get(
+            detail_url("airport:flight-detail", self.flight.id + 1),
+            HTTP_IF_MODIFIED_SINCE=future,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_order_of_other_user_not_found_despite_modified_since(self):
+        order = Order.objects.create(user=self.admin)
+        self.seconds_after_last_write(1, ORDER_URL, OrderViewSet)
+
+        res = self.client.get(
+            detail_url("airport:order-detail", order.id),
+            HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 3600),
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_not_modified_since(self):
+        self.seconds_after_last_write(1)
+        last_modified = self.client.get(FLIGHT_URL)["Last-Modified"]
+
+        res = self.client.get(FLIGHT_URL, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_modified_since_ignored_within_second_of_write(self):
+        self.seconds_after_last_write(0)
+        bump_model_version(Flight)
+        second = max(model_versions(FlightViewSet.cache_models)) // 10**9
+
+        res = self.client.get(FLIGHT_URL, HTTP_IF_MODIFIED_SINCE=http_date(second))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_changes_after_ticket_sale(self):
+        etag = self.client.get(self.flight_url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                ORDER_URL,
+                {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]},
+                format="json",
+            )
+        res = self.client.get(self.flight_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["taken_places"]), 1)
+
+    def test_etag_changes_after_related_model_update(self):
+        etag = self.client.get(self.flight_url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flight.route = sample_route(distance=1)
+            self.flight.save()
+        res = self.client.get(self.flight_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_is_per_user(self):
+        Order.objects.create(user=self.user)
+        etag = self.client.get(ORDER_URL)["ETag"]
+        self.client.force_authenticate(self.admin)
+
+        res = self.client.get(ORDER_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+
+from airport_service.middleware import ConnectionGateMiddleware
+
+
+def sample_value(name: str) -> float:
+    return REGISTRY.get_sample_value(name) or 0
+
+
+def view(request):
+    return HttpResponse()
+
+
+async def async_view(request):
+    return HttpResponse()
+
+
+@override_settings(DATABASE_POOL_SIZE=1, DATABASE_POOL_TIMEOUT=0.01)
+class ConnectionGateMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/api/airport/flights/")
+
+    def test_passes_requests_while_slots_are_free(self):
+        gate = ConnectionGateMiddleware(view)
+
+        self.assertEqual(gate(self.request).status_code, 200)
+        self.assertEqual(gate(self.request).status_code, 200)
+
+    def test_rejects_requests_when_full(self):
+        rejected = sample_value("airport_db_gate_rejected_total")
+        gate = ConnectionGateMiddleware(view)
+        gate.slots.acquire()
+
+        with self.assertLogs("airport_service.requests", "WARNING"):
+            res = gate(self.request)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res["Retry-After"], "1")
+        self.assertEqual(sample_value("airport_db_gate_rejected_total"), rejected + 1)
+
+    def test_async_rejects_requests_when_full(self):
+        gate = ConnectionGateMiddleware(async_view)
+
+        async def request_when_full():
+            await gate.async_slots.acquire()
+            return await gate(self.request)
+
+        with self.assertLogs("airport_service.requests", "WARNING"):
+            res = async_to_sync(request_when_full)()
+
+        self.assertEqual(res.status_code, 503)
+
+    def test_async_requests_wait_for_a_slot_in_order(self):
+        gate = ConnectionGateMiddleware(async_view)
+        served = []
+
+        async def request(name):
+            res = await gate(self.request)
+            served.append((name, res.status_code))
+
+        async def requests():
+            await gate.async_slots.acquire()
+            waiting = [asyncio.create_task(request(name)) for name in "ab"]
+            await asyncio.sleep(0)
+            gate.async_slots.release()
+            await asyncio.gather(*waiting)
+
+        with override_settings(DATABASE_POOL_TIMEOUT=1):
+            async_to_sync(requests)()
+
+        self.assertEqual(served, [("a", 200), ("b", 200)])
+
+    def test_async_request_releases_its_slot(self):
+        gate = ConnectionGateMiddleware(async_view)
+
+        res = async_to_sync(gate)(self.request)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(gate.async_slots.locked())
+
+    def test_streaming_response_keeps_its_slot_until_sent(self):
+        gate = ConnectionGateMiddleware(
+            lambda request: StreamingHttpResponse(iter([b"a", b"b"]))
+        )
+
+        res = gate(self.request)
+        self.assertFalse(gate.slots.acquire(blocking=False))
+        self.assertEqual(b"".join(res.streaming_content), b"ab")
+
+        self.assertTrue(gate.slots.acquire(blocking=False))
+
+    def test_async_streaming_response_keeps_its_slot_until_sent(self):
+        async def chunks():
+            yield b"a"
+
+        async def streaming_view(request):
+            return StreamingHttpResponse(chunks())
+
+        gate = ConnectionGateMiddleware(streaming_view)
+
+        async def send():
+            res = await gate(self.request)
+            held = gate.async_slots.locked()
+            content = b"".join([chunk async for chunk in res.streaming_content])
+            return held, content
+
+        held, content = async_to_sync(send)()
+
+        self.assertTrue(held)
+        self.assertEqual(content, b"a")
+        self.assertFalse(gate.async_slots.locked())
+
+    def test_async_body_of_sync_gate_keeps_its_slot_until_sent(self):
+        async def chunks():
+            yield b"a"
+
+        gate = ConnectionGateMiddleware(lambda request: StreamingHttpResponse(chunks()))
+
+        res = gate(self.request)
+        self.assertFalse(gate.slots.acquire(blocking=False))
+
+        async def send():
+            return b"".join([chunk async for chunk in res.streaming_content])
+
+        self.assertEqual(async_to_sync(send)(), b"a")
+        self.assertTrue(gate.slots.acquire(blocking=False))
+
+    def test_event_stream_gives_its_slot_back(self):
+        gate = ConnectionGateMiddleware(
+            lambda request: StreamingHttpResponse(
+                iter([b"data: 1\n\n"]), content_type="text/event-stream"
+            )
+        )
+
+        gate(self.request)
+
+        self.assertTrue(gate.slots.acquire(blocking=False))
+
+    def test_slot_released_on_error(self):
+        def failing_view(request):
+            raise ValueError
+
+        gate = ConnectionGateMiddleware(failing_view)
+
+        with self.assertRaises(ValueError):
+            gate(self.request)
+
+        self.assertTrue(gate.slots.acquire(blocking=False))
+
+    def test_exempt_paths(self):
+        gate = ConnectionGateMiddleware(view)
+        gate.slots.acquire()
+
+        res = gate(RequestFactory().get("/metrics"))
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(DATABASE_POOL_SIZE=0)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ConnectionGateMiddleware(view)
+
+
+class ASGISettingsTests(SimpleTestCase):
+    def test_asgi_closes_connections_after_each_request(self):
+        # In a process of its own, as settings are configured once
+        script = (
+            "import airport_service.asgi\n"
+            "from django.conf import settings\n"
+            "print(settings.DATABASES['default']['CONN_MAX_AGE'])\n"
+        )
+        env = {**os.environ, "DATABASE_CONN_MAX_AGE": "60"}
+
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        self.assertEqual(result.stdout.strip(), "0")
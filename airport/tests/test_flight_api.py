@@ -1,9 +1,17 @@
+import base64
 import datetime
+from io import StringIO
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 
-from airport.models import Flight
+from airport.models import Flight, Order, SeatHold, Ticket
 from airport.tests.base import (
     BaseSetUp,
     sample_flight,
@@ -15,9 +23,20 @@ from airport.tests.base import (
 from airport.serializers import (
     FlightListSerializer,
     FlightDetailSerializer,
+    FlightSeatMapSerializer,
 )
 
 FLIGHT_URL = reverse("airport:flight-list")
+ORDER_URL = reverse("airport:order-list")
+
+
+def annotated_flights():
+    return Flight.objects.annotate(
+        capacity=F("airplane__rows") * F("airplane__seats_in_row"),
+        tickets_available=(
+            F("airplane__rows") * F("airplane__seats_in_row") - F("tickets_sold")
+        ),
+    )
 
 
 class UnauthenticatedFlightAPITests(BaseSetUp):
@@ -32,16 +51,16 @@ class UserFlightAPITests(BaseSetUp):
         self.client.force_authenticate(self.user)
 
     def test_list_flights(self):
-        sample_flight()
-        sample_flight()
+        sample_flight(departure_time=datetime.datetime(2024, 8, 30, 21, 0, 0))
+        sample_flight(departure_time=datetime.datetime(2024, 8, 31, 21, 0, 0))
 
         res = self.client.get(FLIGHT_URL)
 
-        flights = Flight.objects.order_by("id")
+        flights = annotated_flights().order_by("-departure_time", "-id")
         serializer = FlightListSerializer(flights, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_detail_flight(self):
         flight = sample_flight()
@@ -55,6 +74,42 @@ class UserFlightAPITests(BaseSetUp):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_detail_flight_seat_map(self):
+        flight = sample_flight(airplane=sample_airplane(rows=3, seats_in_row=4))
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(order=order, flight=flight, row=1, seat=1)
+        Ticket.objects.create(order=order, flight=flight, row=3, seat=4)
+
+        view_name = "airport:flight-detail"
+
+        res = self.client.get(
+            detail_url(view_name, flight.id), {"seat_format": "bitmap"}
+        )
+
+        serializer = FlightSeatMapSerializer(flight)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, serializer.data)
+        self.assertNotIn("taken_places", res.data)
+        self.assertEqual(
+            base64.b64decode(res.data["seat_map"]), bytes([0b10000000, 0b00010000])
+        )
+
+    def test_detail_flight_seat_map_skips_places_outside_airplane(self):
+        airplane = sample_airplane(rows=3, seats_in_row=4)
+        flight = sample_flight(airplane=airplane)
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(order=order, flight=flight, row=1, seat=2)
+        Ticket.objects.create(order=order, flight=flight, row=3, seat=5)
+        Ticket.objects.create(order=order, flight=flight, row=4, seat=1)
+
+        res = self.client.get(
+            detail_url("airport:flight-detail", flight.id), {"seat_format": "bitmap"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(base64.b64decode(res.data["seat_map"]), bytes([0b01000000, 0]))
+
     def test_filter_flights_by_departure(self):
         flight1 = sample_flight(departure_time=datetime.datetime(2024, 8, 25, 21, 0, 0))
         flight2 = sample_flight(departure_time=datetime.datetime(2024, 9, 25, 21, 0, 0))
@@ -64,14 +119,14 @@ class UserFlightAPITests(BaseSetUp):
 
         res = self.client.get(FLIGHT_URL, {"departure": "2024-09-01"})
 
-        serializer1 = FlightListSerializer(flight1)
-        serializer2 = FlightListSerializer(flight2)
-        serializer3 = FlightListSerializer(flight3)
+        serializer1 = FlightListSerializer(annotated_flights().get(id=flight1.id))
+        serializer2 = FlightListSerializer(annotated_flights().get(id=flight2.id))
+        serializer3 = FlightListSerializer(annotated_flights().get(id=flight3.id))
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(serializer2.data, res.data)
-        self.assertIn(serializer3.data, res.data)
-        self.assertNotIn(serializer1.data, res.data)
+        self.assertIn(serializer2.data, res.data["results"])
+        self.assertIn(serializer3.data, res.data["results"])
+        self.assertNotIn(serializer1.data, res.data["results"])
 
     def test_filter_flights_by_arrival(self):
         flight1 = sample_flight(arrival_time=datetime.datetime(2024, 8, 25, 21, 0, 0))
@@ -80,14 +135,88 @@ class UserFlightAPITests(BaseSetUp):
 
         res = self.client.get(FLIGHT_URL, {"arrival": "2024-10-01"})
 
-        serializer1 = FlightListSerializer(flight1)
-        serializer2 = FlightListSerializer(flight2)
-        serializer3 = FlightListSerializer(flight3)
+        serializer1 = FlightListSerializer(annotated_flights().get(id=flight1.id))
+        serializer2 = FlightListSerializer(annotated_flights().get(id=flight2.id))
+        serializer3 = FlightListSerializer(annotated_flights().get(id=flight3.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertIn(serializer2.data, res.data["results"])
+        self.assertNotIn(serializer3.data, res.data["results"])
+
+    def test_list_flights_tickets_available(self):
+        flight = sample_flight(airplane=sample_airplane(rows=2, seats_in_row=2))
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(order=order, flight=flight, row=1, seat=1)
+        Ticket.objects.create(order=order, flight=flight, row=1, seat=2)
+
+        res = self.client.get(FLIGHT_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertEqual(res.data["results"][0]["capacity"], 4)
+        self.assertEqual(res.data["results"][0]["tickets_available"], 2)
+
+    def test_filter_flights_by_has_seats(self):
+        full_flight = sample_flight(airplane=sample_airplane(rows=1, seats_in_row=1))
+        free_flight = sample_flight()
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.user),
+            flight=full_flight,
+            row=1,
+            seat=1,
+        )
+
+        with self.assertNumQueries(3):
+            res = self.client.get(FLIGHT_URL, {"has_seats": "true"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [flight["id"] for flight in res.data["results"]], [free_flight.id]
+        )
+
+    def test_list_flights_cursor_pagination(self):
+        flights = [
+            sample_flight(departure_time=datetime.datetime(2024, 8, day, 21, 0, 0))
+            for day in (1, 2, 2, 3)
+        ]
+
+        res = self.client.get(FLIGHT_URL, {"page_size": 1})
+        ids = [flight["id"] for flight in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += [flight["id"] for flight in res.data["results"]]
+
+        self.assertEqual(res.data["count"], 4)
+        self.assertEqual(ids, [flight.id for flight in reversed(flights)])
+
+    def test_list_flights_cursor_seeks_past_ties(self):
+        departure = datetime.datetime(2024, 8, 1, 21, 0, 0)
+        flights = [sample_flight(departure_time=departure) for _ in range(3)]
+        res = self.client.get(FLIGHT_URL, {"page_size": 1, "count": "false"})
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(res.data["next"])
+        (page_query,) = [
+            query["sql"]
+            for query in queries
+            if 'FROM "airport_flight" ' in query["sql"]
+        ]
+        previous = self.client.get(res.data["previous"])
+
+        self.assertEqual(res.data["results"][0]["id"], flights[1].id)
+        self.assertEqual(previous.data["results"][0]["id"], flights[2].id)
+        self.assertIn('"airport_flight"."id" <', page_query)
+        self.assertNotIn("OFFSET", page_query)
+
+    def test_list_flights_without_count(self):
+        sample_flight()
+
+        with self.assertNumQueries(2):
+            res = self.client.get(FLIGHT_URL, {"count": "false"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", res.data)
+        self.assertEqual(len(res.data["results"]), 1)
 
     def test_create_flight_forbidden(self):
         payload = {
@@ -100,6 +229,129 @@ class UserFlightAPITests(BaseSetUp):
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
 
 
+class FlightHoldAPITests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        self.hold_url = reverse("airport:flight-hold", args=[self.flight.id])
+
+    def test_hold_seats(self):
+        payload = {"seats": [{"row": 1, "seat": 1}, {"row": 1, "seat": 2}]}
+
+        res = self.client.post(self.hold_url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn("expires_at", res.data)
+        self.assertEqual(
+            SeatHold.objects.filter(flight=self.flight, user=self.user).count(), 2
+        )
+
+    def test_hold_replaces_previous_hold(self):
+        self.client.post(
+            self.hold_url, {"seats": [{"row": 1, "seat": 1}]}, format="json"
+        )
+        self.client.post(
+            self.hold_url, {"seats": [{"row": 2, "seat": 2}]}, format="json"
+        )
+
+        self.assertEqual(list(self.flight.holds.values_list("row", "seat")), [(2, 2)])
+
+    def test_hold_seat_held_by_another_user(self):
+        SeatHold.objects.create(
+            flight=self.flight,
+            user=self.admin,
+            row=1,
+            seat=1,
+            expires_at=timezone.now() + datetime.timedelta(minutes=5),
+        )
+
+        res = self.client.post(
+            self.hold_url, {"seats": [{"row": 1, "seat": 1}]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("seat", res.data["seats"][0])
+
+    def test_hold_seat_with_expired_hold(self):
+        SeatHold.objects.create(
+            flight=self.flight,
+            user=self.admin,
+            row=1,
+            seat=1,
+            expires_at=timezone.now() - datetime.timedelta(minutes=1),
+        )
+
+        res = self.client.post(
+            self.hold_url, {"seats": [{"row": 1, "seat": 1}]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.flight.holds.get().user, self.user)
+
+    def test_hold_sold_seat(self):
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.admin),
+            flight=self.flight,
+            row=1,
+            seat=1,
+        )
+
+        res = self.client.post(
+            self.hold_url, {"seats": [{"row": 1, "seat": 1}]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_release_hold(self):
+        self.client.post(
+            self.hold_url, {"seats": [{"row": 1, "seat": 1}]}, format="json"
+        )
+
+        res = self.client.delete(self.hold_url)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.flight.holds.exists())
+
+    def test_order_held_seat(self):
+        self.client.post(
+            self.hold_url, {"seats": [{"row": 1, "seat": 1}]}, format="json"
+        )
+        payload = {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]}
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(self.flight.holds.exists())
+
+    def test_order_seat_held_by_another_user(self):
+        self.client.force_authenticate(self.admin)
+        self.client.post(
+            self.hold_url, {"seats": [{"row": 1, "seat": 1}]}, format="json"
+        )
+        self.client.force_authenticate(self.user)
+        payload = {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]}
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("seat", res.data["tickets"][0])
+
+    def test_sweep_expired_holds(self):
+        for seat, minutes in [(1, -1), (2, 5)]:
+            SeatHold.objects.create(
+                flight=self.flight,
+                user=self.user,
+                row=1,
+                seat=seat,
+                expires_at=timezone.now() + datetime.timedelta(minutes=minutes),
+            )
+
+        call_command("sweep_expired", stdout=StringIO())
+
+        self.assertEqual(list(self.flight.holds.values_list("seat", flat=True)), [2])
+
+
 class AdminRouteAPITests(BaseSetUp):
     def setUp(self):
         super().setUp()
@@ -114,3 +366,66 @@ class AdminRouteAPITests(BaseSetUp):
         }
         res = self.client.post(FLIGHT_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+
+class FlightTicketsSoldTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.flight = sample_flight()
+        self.order = Order.objects.create(user=self.user)
+
+    def tickets_sold(self) -> int:
+        self.flight.refresh_from_db()
+        return self.flight.tickets_sold
+
+    def test_counted_by_order(self):
+        self.client.force_authenticate(self.user)
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "flight": self.flight.id},
+                {"row": 1, "seat": 2, "flight": self.flight.id},
+            ]
+        }
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.tickets_sold(), 2)
+
+    def test_failed_order_not_counted(self):
+        Ticket.objects.create(order=self.order, flight=self.flight, row=1, seat=1)
+        self.client.force_authenticate(self.admin)
+        payload = {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]}
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.tickets_sold(), 1)
+
+    def test_counted_on_ticket_create_and_delete(self):
+        ticket = Ticket.objects.create(
+            order=self.order, flight=self.flight, row=1, seat=1
+        )
+        Ticket.objects.create(order=self.order, flight=self.flight, row=1, seat=2)
+        self.assertEqual(self.tickets_sold(), 2)
+
+        ticket.delete()
+        self.assertEqual(self.tickets_sold(), 1)
+
+        self.order.delete()
+        self.assertEqual(self.tickets_sold(), 0)
+
+    def test_reconcile(self):
+        Ticket.objects.create(order=self.order, flight=self.flight, row=1, seat=1)
+        other_flight = sample_flight()
+        Flight.objects.filter(id=self.flight.id).update(tickets_sold=5)
+        Flight.objects.filter(id=other_flight.id).update(tickets_sold=2)
+
+        with self.assertRaisesMessage(CommandError, "2 flights drifted"):
+            call_command("reconcile_tickets_sold", stdout=StringIO(), batch_size=1)
+        call_command("reconcile_tickets_sold", fix=True, stdout=StringIO())
+
+        self.assertEqual(self.tickets_sold(), 1)
+        other_flight.refresh_from_db()
+        self.assertEqual(other_flight.tickets_sold, 0)
+        call_command("reconcile_tickets_sold", stdout=StringIO())
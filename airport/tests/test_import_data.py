@@ -0,0 +1,261 @@
+import json
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from airport.imports import import_rows, read_rows
+from airport.models import Airport, Country, Crew, Flight, Route
+from airport.tests.base import (
+    BaseSetUp,
+    sample_airplane,
+    sample_airport,
+    sample_country,
+    sample_crew,
+    sample_route,
+)
+
+IMPORT_URL = reverse("airport:import-list")
+
+
+def csv_rows(text: str):
+    return read_rows(BytesIO(text.encode()), "csv")
+
+
+def ndjson_rows(*rows):
+    return read_rows(
+        BytesIO("\n".join(json.dumps(row) for row in rows).encode()), "ndjson"
+    )
+
+
+class ImportRowsTests(BaseSetUp):
+    def test_import_countries_and_skip_existing(self):
+        sample_country(name="Ukraine")
+
+        report = import_rows("countries", csv_rows("name\nUkraine\nPoland\nPoland\n"))
+
+        self.assertEqual(
+            report.as_dict(), {"created": 1, "skipped": 2, "failed": 0, "errors": []}
+        )
+        self.assertEqual(Country.objects.filter(name="Poland").count(), 1)
+
+    def test_import_resolves_natural_keys(self):
+        country = sample_country(name="Ukraine")
+
+        report = import_rows(
+            "airports",
+            ndjson_rows(
+                {"name": "Boryspil", "closest_big_city": "Kyiv", "country": "Ukraine"},
+                {"name": "Lviv", "closest_big_city": "Lviv", "country": "Ukraine"},
+            ),
+        )
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual(
+            set(Airport.objects.filter(country=country).values_list("name", flat=True)),
+            {"Boryspil", "Lviv"},
+        )
+
+    def test_failed_rows_are_reported_and_the_rest_imported(self):
+        sample_airport(name="Boryspil")
+        sample_airport(name="Lviv")
+        sample_airport(name="Twin")
+        sample_airport(name="Twin")
+
+        report = import_rows(
+            "routes",
+            csv_rows(
+                "source,destination,distance\n"
+                "Boryspil,Lviv,470\n"
+                "Boryspil,Odesa,440\n"
+                "Lviv,Boryspil,many\n"
+                "Twin,Lviv,100\n"
+                "Lviv,Lviv,1\n"
+            ),
+        )
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.failed, 4)
+        self.assertEqual(
+            report.errors,
+            [
+                {"line": 3, "errors": {"destination": 'No airport named "Odesa".'}},
+                {"line": 4, "errors": {"distance": "A valid integer is required."}},
+                {
+                    "line": 5,
+                    "errors": {"source": 'More than one airport named "Twin".'},
+                },
+                {
+                    "line": 6,
+                    "errors": {
+                        "destination": "The destination must differ from the source."
+                    },
+                },
+            ],
+        )
+
+    def test_rows_the_database_rejects_do_not_fail_the_batch(self):
+        sample_airport(name="Boryspil")
+        sample_airport(name="Lviv")
+        sample_airport(name="Odesa")
+
+        report = import_rows(
+            "routes",
+            csv_rows(
+                "source,destination,distance\n"
+                "Boryspil,Lviv,470\n"
+                "Boryspil,Odesa,99999999999\n"
+                "Lviv,Odesa,650\n"
+            ),
+        )
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(report.errors[0]["line"], 3)
+        self.assertEqual(Route.objects.count(), 2)
+
+    def test_invalid_ndjson_line(self):
+        rows = read_rows(BytesIO(b'{"name": "Poland"}\n{"name": \n[1]\n'), "ndjson")
+
+        report = import_rows("countries", rows)
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual([error["line"] for error in report.errors], [2, 3])
+
+    def test_import_flights(self):
+        route = sample_route(
+            source=sample_airport(name="Boryspil"),
+            destination=sample_airport(name="Lviv"),
+        )
+        airplane = sample_airplane(name="UR-PSA")
+        pilot = sample_crew(first_name="Olena", last_name="Melnyk")
+        steward = sample_crew(first_name="Taras", last_name="Boyko")
+        rows = (
+            "source,destination,airplane,departure_time,arrival_time,crew\n"
+            "Boryspil,Lviv,UR-PSA,2024-09-01T08:00:00Z,2024-09-01T09:10:00Z,"
+            "Olena Melnyk;Taras Boyko\n"
+            "Boryspil,Lviv,UR-PSA,2024-09-02T08:00:00Z,2024-09-02T09:10:00Z,\n"
+            "Lviv,Boryspil,UR-PSA,2024-09-01T12:00:00Z,2024-09-01T13:10:00Z,\n"
+            "Boryspil,Lviv,UR-PSA,2024-09-03T08:00:00Z,2024-09-03T07:10:00Z,"
+            "Ivan Moroz\n"
+        )
+
+        report = import_rows("flights", csv_rows(rows), batch_size=2)
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual(
+            [error["errors"] for error in report.errors],
+            [
+                {"route": 'No route from "Lviv" to "Boryspil".'},
+                {
+                    "arrival_time": "The arrival must be after the departure.",
+                    "crew": 'No single crew member named "Ivan Moroz"',
+                },
+            ],
+        )
+        first, second = Flight.objects.order_by("departure_time")
+        self.assertEqual((first.route, first.airplane), (route, airplane))
+        self.assertEqual(set(first.crew.all()), {pilot, steward})
+        self.assertFalse(second.crew.exists())
+        self.assertEqual(first.tickets_sold, 0)
+
+        # Imported again, the flights are found by route, airplane and departure
+        again = import_rows("flights", csv_rows(rows))
+        self.assertEqual((again.created, again.skipped), (0, 2))
+
+        # Ids came off the sequence, so flights created later do not collide
+        created = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=timezone.now(),
+            arrival_time=timezone.now(),
+        )
+        self.assertGreater(created.id, second.id)
+
+    def test_import_crew(self):
+        sample_crew(first_name="Olena", last_name="Melnyk")
+
+        report = import_rows(
+            "crew",
+            ndjson_rows(
+                {"first_name": "Olena", "last_name": "Melnyk"},
+                {"first_name": "Taras", "last_name": "Boyko"},
+                {"first_name": "Taras"},
+            ),
+        )
+
+        self.assertEqual((report.created, report.skipped, report.failed), (1, 1, 1))
+        self.assertEqual(
+            report.errors[0]["errors"], {"last_name": "This field is required."}
+        )
+        self.assertEqual(Crew.objects.count(), 2)
+
+
+class ImportDataCommandTests(BaseSetUp):
+    def test_import_file(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as file:
+            file.write(b"name\nUkraine\nPoland\n")
+            file.flush()
+            out = StringIO()
+
+            call_command("import_data", "countries", file.name, stdout=out)
+
+        self.assertIn("Created 2 countries", out.getvalue())
+        self.assertEqual(Country.objects.count(), 2)
+
+    def test_failed_rows_fail_the_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".ndjson") as file:
+            file.write(b'{"name": "Ukraine"}\n{"name": ""}\n')
+            file.flush()
+            err = StringIO()
+
+            with self.assertRaisesMessage(CommandError, "1 rows failed"):
+                call_command("import_data", "countries", file.name, stderr=err)
+
+        self.assertIn("line 2", err.getvalue())
+        self.assertEqual(Country.objects.count(), 1)
+
+    def test_format_required_without_extension(self):
+        with self.assertRaises(CommandError):
+            call_command("import_data", "countries", "-")
+
+
+class ImportAPITests(BaseSetUp):
+    def upload(self, content: bytes, name="countries.csv", **data):
+        return self.client.post(
+            IMPORT_URL,
+            {"kind": "countries", "file": SimpleUploadedFile(name, content), **data},
+            format="multipart",
+        )
+
+    def test_admin_required(self):
+        self.client.force_authenticate(self.user)
+
+        res = self.upload(b"name\nUkraine\n")
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Country.objects.exists())
+
+    def test_import(self):
+        self.client.force_authenticate(self.admin)
+
+        res = self.upload(b"name\nUkraine\n\n")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, {"created": 1, "skipped": 0, "failed": 0, "errors": []}
+        )
+
+    def test_format_of_file_without_extension(self):
+        self.client.force_authenticate(self.admin)
+
+        res = self.upload(b'{"name": "Ukraine"}\n', name="countries")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("format", res.data)
+
+        res = self.upload(b'{"name": "Ukraine"}\n', name="countries", format="ndjson")
+        self.assertEqual(res.data["created"], 1)
@@ -0,0 +1,166 @@
+import datetime
+import threading
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from airport.itineraries import itinerary_index
+from airport.tests.base import (
+    BaseSetUp,
+    sample_airport,
+    sample_route,
+    sample_flight,
+)
+
+ITINERARY_URL = reverse("airport:itinerary-list")
+
+
+class UnauthenticatedItineraryAPITests(BaseSetUp):
+    def test_auth_required(self):
+        res = self.client.get(ITINERARY_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserItineraryAPITests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        itinerary_index.clear()
+
+        self.day = timezone.localdate() + datetime.timedelta(days=2)
+        self.kyiv = sample_airport(name="Kyiv")
+        self.warsaw = sample_airport(name="Warsaw")
+        self.london = sample_airport(name="London")
+        self.kyiv_london = sample_route(source=self.kyiv, destination=self.london)
+        self.kyiv_warsaw = sample_route(source=self.kyiv, destination=self.warsaw)
+        self.warsaw_london = sample_route(source=self.warsaw, destination=self.london)
+
+        self.direct = self.flight(self.kyiv_london, "10:00", "14:00")
+        self.first_leg = self.flight(self.kyiv_warsaw, "08:00", "09:00")
+        self.second_leg = self.flight(self.warsaw_london, "10:00", "11:00")
+        self.flight(self.warsaw_london, "09:20", "10:20")
+
+    def flight(self, route, departure, arrival):
+        def at(clock):
+            return timezone.make_aware(
+                datetime.datetime.combine(self.day, datetime.time.fromisoformat(clock))
+            )
+
+        return sample_flight(
+            route=route, departure_time=at(departure), arrival_time=at(arrival)
+        )
+
+    def search(self, **params):
+        defaults = {"from": self.kyiv.id, "to": self.london.id, "date": self.day}
+        defaults.update(params)
+        return self.client.get(ITINERARY_URL, defaults)
+
+    @staticmethod
+    def flight_ids(res):
+        return [
+            [flight["id"] for flight in itinerary["flights"]] for itinerary in res.data
+        ]
+
+    def test_search_ranks_by_arrival_time(self):
+        res = self.search()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.flight_ids(res),
+            [[self.first_leg.id, self.second_leg.id], [self.direct.id]],
+        )
+        self.assertEqual(res.data[0]["stops"], 1)
+        self.assertEqual(res.data[0]["distance"], 2468)
+        self.assertEqual(res.data[0]["flights"][0]["route"]["source"], "Kyiv")
+
+    def test_search_without_stops(self):
+        res = self.search(max_stops=0)
+
+        self.assertEqual(self.flight_ids(res), [[self.direct.id]])
+
+    def test_search_other_date(self):
+        res = self.search(date=self.day + datetime.timedelta(days=1))
+
+        self.assertEqual(res.data, [])
+
+    def test_search_picks_up_new_and_deleted_flights(self):
+        self.search()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            early = self.flight(self.kyiv_london, "06:00", "07:00")
+            self.direct.delete()
+
+        res = self.search()
+
+        self.assertEqual(
+            self.flight_ids(res),
+            [[early.id], [self.first_leg.id, self.second_leg.id]],
+        )
+
+    def test_search_requires_airports_and_date(self):
+        res = self.client.get(ITINERARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("source", res.data)
+        self.assertIn("date", res.data)
+
+    def test_search_picks_up_flights_with_naive_times(self):
+        self.search()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            early = self.flight(self.kyiv_london, "06:00", "07:00")
+            early.departure_time = timezone.make_naive(early.departure_time)
+            early.arrival_time = timezone.make_naive(early.arrival_time)
+            early.save()
+
+        res = self.search()
+
+        self.assertEqual(self.flight_ids(res)[0], [early.id])
+
+    def test_stale_index_answers_while_another_thread_rebuilds(self):
+        self.search()
+
+        with override_settings(ITINERARY_INDEX_MAX_AGE=-1):
+            with itinerary_index._build_lock:
+                with self.assertNumQueries(0):
+                    itinerary_index.search(
+                        self.kyiv.id,
+                        self.london.id,
+                        timezone.now(),
+                        timezone.now() + datetime.timedelta(days=3),
+                        max_stops=1,
+                    )
+
+            with self.captureOnCommitCallbacks(execute=True):
+                early = self.flight(self.kyiv_london, "06:00", "07:00")
+            res = self.search()
+
+        self.assertEqual(self.flight_ids(res)[0], [early.id])
+
+    def test_search_does_not_wait_for_changes(self):
+        self.search()
+        results = []
+
+        def search():
+            results.append(
+                itinerary_index.search(
+                    self.kyiv.id,
+                    self.london.id,
+                    timezone.now(),
+                    timezone.now() + datetime.timedelta(days=3),
+                    max_stops=1,
+                )
+            )
+
+        # As while a signal of another thread changes the index
+        with itinerary_index._lock:
+            thread = threading.Thread(target=search)
+            thread.start()
+            thread.join(timeout=5)
+            searched = not thread.is_alive()
+        thread.join()
+
+        self.assertTrue(searched)
+        self.assertEqual(len(results[0]), 2)
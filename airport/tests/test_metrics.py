@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.throttling import UserRateThrottle
+
+from airport.models import Order, Ticket
+from airport.tests.base import BaseSetUp, sample_flight
+
+METRICS_URL = reverse("metrics")
+COUNTRY_URL = reverse("airport:country-list")
+ORDER_URL = reverse("airport:order-list")
+
+
+def sample_value(name: str, labels: dict = None) -> float:
+    return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+
+class MetricsViewTests(BaseSetUp):
+    def test_metrics(self):
+        self.client.force_authenticate(self.user)
+        self.client.get(COUNTRY_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(
+            b'airport_request_duration_seconds_count{action="list",view="country"}',
+            res.content,
+        )
+        self.assertIn(b"airport_response_cache_requests_total", res.content)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 401)
+        self.assertEqual(
+            self.client.get(
+                METRICS_URL, headers={"Authorization": "Bearer secret"}
+            ).status_code,
+            200,
+        )
+
+
+class MetricsTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+
+    def test_cache_requests(self):
+        labels = {"view": "country", "outcome": "miss"}
+        misses = sample_value("airport_response_cache_requests_total", labels)
+
+        self.client.get(COUNTRY_URL)
+
+        self.assertEqual(
+            sample_value("airport_response_cache_requests_total", labels), misses + 1
+        )
+
+    def test_throttled_requests(self):
+        labels = {"view": "country", "action": "list"}
+        throttled = sample_value("airport_throttled_requests_total", labels)
+
+        with mock.patch.multiple(
+            UserRateThrottle,
+            allow_request=mock.Mock(return_value=False),
+            wait=mock.Mock(return_value=60),
+        ):
+            res = self.client.get(COUNTRY_URL)
+
+        self.assertEqual(res.status_code, 429)
+        self.assertEqual(
+            sample_value("airport_throttled_requests_total", labels), throttled + 1
+        )
+
+    def test_tickets_sold(self):
+        sold = sample_value("airport_tickets_sold_total")
+        flights = sample_value("airport_flight_tickets_sold_count")
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "flight": self.flight.id},
+                {"row": 1, "seat": 2, "flight": self.flight.id},
+            ]
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(sample_value("airport_tickets_sold_total"), sold + 2)
+        self.assertEqual(sample_value("airport_flight_tickets_sold_count"), flights + 1)
+
+    def test_order_failures(self):
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.admin),
+            flight=self.flight,
+            row=1,
+            seat=1,
+        )
+        labels = {"reason": "seat_unavailable"}
+        failures = sample_value("airport_order_failures_total", labels)
+        payload = {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]}
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(
+            sample_value("airport_order_failures_total", labels), failures + 1
+        )
@@ -1,12 +1,24 @@
+import datetime
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.test import APIClient
 
-from airport.models import Order
+from airport.models import IdempotencyKey, Order, Ticket
 from airport.tests.base import (
     BaseSetUp,
     detail_url,
     sample_ticket,
     sample_flight,
+    sample_crew,
 )
 from airport.serializers import (
     OrderDetailSerializer,
@@ -57,3 +69,259 @@ class UserOrderAPITests(BaseSetUp):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
+
+    def test_detail_order_query_count(self):
+        flights = [sample_flight(), sample_flight()]
+        for flight in flights:
+            flight.crew.add(sample_crew(), sample_crew())
+        order = Order.objects.create(user=self.user)
+        for seat in range(1, 7):
+            Ticket.objects.create(
+                order=order, flight=flights[seat % 2], row=1, seat=seat
+            )
+
+        view_name = "airport:order-detail"
+
+        with self.assertNumQueries(5):
+            res = self.client.get(detail_url(view_name, order.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, OrderDetailSerializer(order).data)
+        self.assertEqual(len(res.data["tickets"][0]["flight"]["taken_places"]), 3)
+
+    def test_create_order(self):
+        flight = sample_flight()
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "flight": flight.id},
+                {"row": 1, "seat": 2, "flight": flight.id},
+            ]
+        }
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(id=res.data["id"])
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.tickets.count(), 2)
+
+    def test_create_order_query_count_does_not_grow_with_tickets(self):
+        flights = [sample_flight(), sample_flight(), sample_flight()]
+
+        def create_order(seats):
+            payload = {
+                "tickets": [
+                    {"row": 1, "seat": seat, "flight": flights[seat % 3].id}
+                    for seat in seats
+                ]
+            }
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(ORDER_URL, payload, format="json")
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        self.assertEqual(create_order([1]), create_order(range(2, 11)))
+
+    def test_create_order_with_taken_seat(self):
+        flight = sample_flight()
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.admin), flight=flight, row=1, seat=2
+        )
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "flight": flight.id},
+                {"row": 1, "seat": 2, "flight": flight.id},
+            ]
+        }
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["tickets"][0], {})
+        self.assertIn("seat", res.data["tickets"][1])
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 0)
+
+    def test_create_order_next_to_taken_seats(self):
+        flight, other = sample_flight(), sample_flight()
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.admin), flight=flight, row=1, seat=1
+        )
+        payload = {
+            "tickets": [
+                {"row": 2, "seat": 1, "flight": flight.id},
+                {"row": 1, "seat": 1, "flight": other.id},
+            ]
+        }
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_order_with_repeated_seat(self):
+        flight = sample_flight()
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "flight": flight.id},
+                {"row": 1, "seat": 1, "flight": flight.id},
+            ]
+        }
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("seat", res.data["tickets"][1])
+
+    def test_create_order_with_seat_out_of_range(self):
+        flight = sample_flight()
+        payload = {"tickets": [{"row": 1000, "seat": 1, "flight": flight.id}]}
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("row", res.data["tickets"][0])
+
+    def test_create_order_with_unknown_flight(self):
+        payload = {"tickets": [{"row": 1, "seat": 1, "flight": 0}]}
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("flight", res.data["tickets"][0])
+
+
+class IdempotentOrderTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        self.payload = {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]}
+
+    def post(self, key, payload=None):
+        return self.client.post(
+            ORDER_URL,
+            payload or self.payload,
+            format="json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_retry_replays_response(self):
+        first = self.post("order-1")
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.post("order-1")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(
+            [query for query in queries if "airport_ticket" in query["sql"]]
+        )
+
+    def test_key_reused_for_another_order(self):
+        self.post("order-1")
+
+        res = self.post(
+            "order-1",
+            {"tickets": [{"row": 1, "seat": 2, "flight": self.flight.id}]},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.post("order-1")
+        self.client.force_authenticate(self.admin)
+
+        res = self.post(
+            "order-1",
+            {"tickets": [{"row": 1, "seat": 2, "flight": self.flight.id}]},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_request_is_not_stored(self):
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.admin),
+            flight=self.flight,
+            row=1,
+            seat=1,
+        )
+
+        res = self.post("order-1")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_key_runs_again(self):
+        self.post("order-1")
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        Ticket.objects.all().delete()
+
+        res = self.post("order-1")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", res)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_invalid_key(self):
+        res = self.post("k" * 256)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sweep_expired_keys(self):
+        self.post("order-1")
+        self.post(
+            "order-2",
+            {"tickets": [{"row": 1, "seat": 2, "flight": self.flight.id}]},
+        )
+        IdempotencyKey.objects.filter(key="order-1").update(
+            expires_at=timezone.now() - datetime.timedelta(minutes=1)
+        )
+
+        call_command("sweep_expired", stdout=StringIO())
+
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["order-2"]
+        )
+
+
+class ConcurrentIdempotentOrderTests(TransactionTestCase):
+    def test_concurrent_duplicates_collapse(self):
+        user = get_user_model().objects.create_user("test@test.com", "testpass")
+        departure_time = timezone.now() + datetime.timedelta(days=1)
+        flight = sample_flight(
+            departure_time=departure_time,
+            arrival_time=departure_time + datetime.timedelta(hours=1),
+        )
+        payload = {"tickets": [{"row": 1, "seat": 1, "flight": flight.id}]}
+        barrier = threading.Barrier(3)
+        responses = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                responses.append(
+                    client.post(
+                        ORDER_URL,
+                        payload,
+                        format="json",
+                        headers={"Idempotency-Key": "order-1"},
+                    )
+                )
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([res.status_code for res in responses], [201] * 3)
+        self.assertEqual(len({res.data["id"] for res in responses}), 1)
+        self.assertEqual(Order.objects.count(), 1)
@@ -0,0 +1,155 @@
+import csv
+import datetime
+import io
+import json
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.exports import COLUMNS, pyarrow
+from airport.models import Order, Ticket
+from airport.tests.base import BaseSetUp, sample_airport, sample_flight, sample_route
+
+EXPORT_URL = reverse("airport:order-export")
+
+
+def content_of(response) -> bytes:
+    return b"".join(response.streaming_content)
+
+
+class OrderExportTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.flight = sample_flight(
+            route=sample_route(
+                source=sample_airport(name="Boryspil"),
+                destination=sample_airport(name="Lviv"),
+                distance=470,
+            )
+        )
+        self.orders = []
+        for day, seats in ((1, 2), (15, 1), (31, 3)):
+            order = Order.objects.create(user=self.user)
+            Order.objects.filter(id=order.id).update(
+                created_at=timezone.make_aware(datetime.datetime(2024, 8, day, 23))
+            )
+            for seat in range(1, seats + 1):
+                Ticket.objects.create(
+                    order=order, flight=self.flight, row=day, seat=seat
+                )
+            self.orders.append(order)
+
+    def test_admin_required(self):
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_export_csv(self):
+        res = self.client.get(EXPORT_URL, {"format": "csv"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(
+            res["Content-Disposition"], 'attachment; filename="tickets.csv"'
+        )
+        rows = list(csv.DictReader(io.StringIO(content_of(res).decode())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(list(rows[0]), [name for name, _ in COLUMNS])
+        self.assertEqual(
+            [(row["order_id"], row["row"], row["seat"]) for row in rows[:3]],
+            [
+                (str(self.orders[0].id), "1", "1"),
+                (str(self.orders[0].id), "1", "2"),
+                (str(self.orders[1].id), "15", "1"),
+            ],
+        )
+        self.assertEqual(rows[0]["user_email"], self.user.email)
+        self.assertEqual(
+            (rows[0]["source"], rows[0]["destination"], rows[0]["distance"]),
+            ("Boryspil", "Lviv", "470"),
+        )
+
+    def test_export_ndjson_by_accept_header(self):
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT="application/x-ndjson")
+
+        self.assertEqual(res["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in content_of(res).decode().splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]["flight_id"], self.flight.id)
+        self.assertEqual(rows[0]["order_created_at"], "2024-08-01T23:00:00Z")
+
+    def test_export_date_range(self):
+        res = self.client.get(
+            EXPORT_URL, {"format": "ndjson", "from": "2024-08-15", "to": "2024-08-31"}
+        )
+
+        orders = {
+            json.loads(line)["order_id"]
+            for line in content_of(res).decode().splitlines()
+        }
+        self.assertEqual(orders, {self.orders[1].id, self.orders[2].id})
+
+        res = self.client.get(EXPORT_URL, {"format": "ndjson", "to": "2024-08-14"})
+
+        orders = {
+            json.loads(line)["order_id"]
+            for line in content_of(res).decode().splitlines()
+        }
+        self.assertEqual(orders, {self.orders[0].id})
+
+    def test_invalid_date_range(self):
+        res = self.client.get(
+            EXPORT_URL, {"format": "csv", "from": "2024-08-15", "to": "2024-08-01"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("to", res.json())
+
+        res = self.client.get(EXPORT_URL, {"format": "csv", "from": "yesterday"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(pyarrow, "pyarrow is not installed")
+    @override_settings(EXPORT_CHUNK_SIZE=4)
+    def test_export_parquet(self):
+        import pyarrow.parquet
+
+        res = self.client.get(EXPORT_URL, {"format": "parquet"})
+
+        self.assertEqual(res["Content-Type"], "application/vnd.apache.parquet")
+        file = pyarrow.parquet.ParquetFile(io.BytesIO(content_of(res)))
+        self.assertEqual(file.metadata.num_rows, 6)
+        self.assertEqual(file.metadata.num_row_groups, 2)
+        table = file.read()
+        self.assertEqual(table.column_names, [name for name, _ in COLUMNS])
+        self.assertEqual(table.column("seat").to_pylist(), [1, 2, 1, 1, 2, 3])
+        self.assertEqual(
+            table.column("order_created_at")[0].as_py(),
+            datetime.datetime(2024, 8, 1, 23, tzinfo=datetime.timezone.utc),
+        )
+
+    def test_export_streams_asynchronously_under_asgi(self):
+        request = AsyncRequestFactory().get(
+            EXPORT_URL,
+            {"format": "csv"},
+            headers={"Authorization": f"Bearer {AccessToken.for_user(self.admin)}"},
+        )
+        match = resolve(request.path)
+
+        response = match.func(request, *match.args, **match.kwargs)
+
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        lines = async_to_sync(read)().decode().splitlines()
+        self.assertEqual(len(lines), 7)
@@ -0,0 +1,162 @@
+import datetime
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from airport.itineraries import itinerary_index
+from airport.models import Order, Ticket
+from airport.tests.base import (
+    BaseSetUp,
+    detail_url,
+    sample_airplane,
+    sample_airplane_type,
+    sample_airport,
+    sample_country,
+    sample_crew,
+    sample_flight,
+    sample_route,
+)
+from airport.urls import router
+
+# Queries allowed per request, whatever the number of objects involved.
+# A change that makes an endpoint exceed its budget or issue more queries
+# for 50 objects than for 1 fails the suite.
+QUERY_BUDGETS = {
+    "country": {"list": 1, "retrieve": 1},
+    "airport": {"list": 2, "retrieve": 1},
+    "route": {"list": 2, "retrieve": 1},
+    "airplanetype": {"list": 1, "retrieve": 1},
+    "airplane": {"list": 1, "retrieve": 1},
+    "crew": {"list": 1, "retrieve": 1},
+    "flight": {"list": 3, "retrieve": 5},
+    "itinerary": {"list": 5},
+    "order": {"list": 3, "retrieve": 5},
+    # Write only
+    "import": {},
+}
+
+
+class QueryCountTests(BaseSetUp):
+    """Seeds each endpoint registered in airport.urls with 1 and then
+    50 objects and compares the number of queries of its requests."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.departure = timezone.now() + datetime.timedelta(days=1)
+        self.route = sample_route()
+
+    def seed_country(self, count):
+        return [sample_country() for _ in range(count)][0]
+
+    def seed_airport(self, count):
+        return [sample_airport() for _ in range(count)][0]
+
+    def seed_route(self, count):
+        return [sample_route() for _ in range(count)][0]
+
+    def seed_airplanetype(self, count):
+        return [sample_airplane_type() for _ in range(count)][0]
+
+    def seed_airplane(self, count):
+        return [sample_airplane() for _ in range(count)][0]
+
+    def seed_crew(self, count):
+        return [sample_crew() for _ in range(count)][0]
+
+    def seed_flight(self, count):
+        """Adds flights with crew and tickets to the first flight."""
+        if not hasattr(self, "flight"):
+            self.flight = sample_flight(route=self.route)
+            self.order = Order.objects.create(user=self.user)
+            count -= 1
+        for _ in range(count):
+            flight = sample_flight(route=self.route)
+            crew = sample_crew()
+            flight.crew.add(crew)
+            self.flight.crew.add(crew)
+            Ticket.objects.create(
+                order=self.order,
+                flight=self.flight,
+                row=self.flight.tickets.count() + 1,
+                seat=1,
+            )
+        return self.flight
+
+    def seed_itinerary(self, count):
+        for _ in range(count):
+            sample_flight(
+                route=self.route,
+                departure_time=self.departure,
+                arrival_time=self.departure + datetime.timedelta(hours=1),
+            )
+        itinerary_index.clear()
+
+    def seed_order(self, count):
+        """Adds orders and tickets on new flights to the first order."""
+        if not hasattr(self, "order"):
+            self.order = Order.objects.create(user=self.user)
+        for _ in range(count):
+            Order.objects.create(user=self.user)
+            flight = sample_flight(route=self.route)
+            flight.crew.add(sample_crew())
+            Ticket.objects.create(order=self.order, flight=flight, row=1, seat=1)
+        return self.order
+
+    def seed_import(self, count):
+        return None
+
+    def count_queries(self, url, params=None) -> int:
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, 200, res.data)
+        return len(queries)
+
+    def requests(self, basename, instance):
+        if not QUERY_BUDGETS[basename]:
+            return {}
+        if basename == "itinerary":
+            params = {
+                "from": self.route.source_id,
+                "to": self.route.destination_id,
+                "date": self.departure.date(),
+            }
+            return {"list": (reverse(f"airport:{basename}-list"), params)}
+        return {
+            "list": (reverse(f"airport:{basename}-list"), None),
+            "retrieve": (detail_url(f"airport:{basename}-detail", instance.id), None),
+        }
+
+    def test_every_endpoint_has_a_budget(self):
+        self.assertEqual(
+            {basename for _, _, basename in router.registry}, set(QUERY_BUDGETS)
+        )
+
+    def test_query_counts_do_not_grow_with_data(self):
+        for _, _, basename in router.registry:
+            seed = getattr(self, f"seed_{basename}")
+            with self.subTest(basename=basename):
+                instance = seed(1)
+                small = {
+                    action: self.count_queries(url, params)
+                    for action, (url, params) in self.requests(
+                        basename, instance
+                    ).items()
+                }
+                instance = seed(49)
+                large = {
+                    action: self.count_queries(url, params)
+                    for action, (url, params) in self.requests(
+                        basename, instance
+                    ).items()
+                }
+
+                self.assertEqual(small, large)
+                for action, queries in large.items():
+                    self.assertLessEqual(
+                        queries, QUERY_BUDGETS[basename][action], action
+                    )
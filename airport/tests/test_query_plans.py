@@ -0,0 +1,79 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from airport.models import Order
+from airport.tests.base import (
+    BaseSetUp,
+    sample_airport,
+    sample_country,
+    sample_flight,
+)
+
+
+class QueryPlanTests(BaseSetUp):
+    """The test tables are tiny, so sequential scans are disabled to see
+    which index the planner would pick for the queries of an endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def require_pg_trgm(self):
+        # Asked of the test database once a test runs, not at import time
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest("pg_trgm extension is not installed")
+
+    def explain_list(self, url_name: str, params: dict, table: str) -> str:
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse(url_name), params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        sql = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT") and f'FROM "{table}"' in query["sql"]
+        ][-1]
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}")
+            return "\n".join(row[0] for row in cursor.fetchall())
+
+    def test_flight_list_filtered_by_departure_uses_index(self):
+        sample_flight()
+
+        plan = self.explain_list(
+            "airport:flight-list", {"departure": "2024-08-01"}, "airport_flight"
+        )
+
+        self.assertIn("flight_departure_time_idx", plan)
+
+    def test_order_list_uses_user_created_at_index(self):
+        Order.objects.create(user=self.user)
+
+        plan = self.explain_list("airport:order-list", {}, "airport_order")
+
+        self.assertIn("order_user_created_at_idx", plan)
+
+    def test_airport_name_search_uses_trigram_index(self):
+        self.require_pg_trgm()
+        sample_airport(name="Boryspil")
+
+        plan = self.explain_list(
+            "airport:airport-list", {"name": "bor"}, "airport_airport"
+        )
+
+        self.assertIn("airport_name_trgm_idx", plan)
+
+    def test_country_name_search_uses_trigram_index(self):
+        self.require_pg_trgm()
+        sample_country(name="Ukraine")
+
+        plan = self.explain_list(
+            "airport:country-list", {"name": "ukr"}, "airport_country"
+        )
+
+        self.assertIn("country_name_trgm_idx", plan)
@@ -0,0 +1,82 @@
+import datetime
+import io
+import json
+import uuid
+import zoneinfo
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from airport.management.commands.benchmark_renderers import (
+    flight_detail_payload,
+    order_detail_payload,
+)
+from airport_service import parsers, renderers
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_render_matches_json_renderer(self):
+        payload = flight_detail_payload(rows=2, seats_in_row=2)
+
+        self.assertEqual(
+            renderers.ORJSONRenderer().render(payload),
+            JSONRenderer().render(payload),
+        )
+
+    def test_render_native_types(self):
+        utc = datetime.UTC
+        kyiv = datetime.timezone(datetime.timedelta(hours=3))
+        london = zoneinfo.ZoneInfo("Europe/London")
+        payload = {
+            "time": datetime.datetime(2024, 8, 31, 21, 0, tzinfo=utc),
+            "precise": datetime.datetime(2024, 8, 31, 21, 0, 0, 123456, tzinfo=utc),
+            "local": datetime.datetime(2024, 8, 31, 21, 0, 0, 5000, tzinfo=kyiv),
+            "london": datetime.datetime(2024, 1, 31, 21, 0, tzinfo=london),
+            "naive": datetime.datetime(2024, 8, 31, 21, 0),
+            "date": datetime.date(2024, 8, 31),
+            "clock": datetime.time(21, 0, 0, 123456),
+            "reference": uuid.uuid4(),
+            "price": Decimal("12.50"),
+            "message": gettext_lazy("Not found."),
+        }
+
+        ret = renderers.ORJSONRenderer().render(payload)
+
+        self.assertEqual(ret, JSONRenderer().render(payload))
+        data = json.loads(ret)
+        self.assertEqual(data["time"], "2024-08-31T21:00:00Z")
+        self.assertEqual(data["precise"], "2024-08-31T21:00:00.123456Z")
+
+    def test_render_none(self):
+        self.assertEqual(renderers.ORJSONRenderer().render(None), b"")
+
+    def test_render_without_orjson(self):
+        payload = order_detail_payload(tickets=1)
+
+        with mock.patch.object(renderers, "orjson", None):
+            ret = renderers.ORJSONRenderer().render(payload)
+
+        self.assertEqual(ret, JSONRenderer().render(payload))
+
+
+class ORJSONParserTests(SimpleTestCase):
+    def test_parse(self):
+        stream = io.BytesIO(b'{"tickets": [{"row": 1, "seat": 2, "flight": 3}]}')
+
+        data = parsers.ORJSONParser().parse(stream)
+
+        self.assertEqual(data, {"tickets": [{"row": 1, "seat": 2, "flight": 3}]})
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            parsers.ORJSONParser().parse(io.BytesIO(b"{"))
+
+    def test_parse_without_orjson(self):
+        with mock.patch.object(parsers, "orjson", None):
+            data = parsers.ORJSONParser().parse(io.BytesIO(b'{"row": 1}'))
+
+        self.assertEqual(data, {"row": 1})
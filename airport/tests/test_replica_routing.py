@@ -0,0 +1,171 @@
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.cache import bump_model_version, model_versions
+from airport.models import Country, Flight
+from airport.tests.base import BaseSetUp, sample_country, sample_flight
+from airport_service.db_router import primary
+from airport_service.middleware import ReplicaRoutingMiddleware
+
+COUNTRY_URL = reverse("airport:country-list")
+FLIGHT_URL = reverse("airport:flight-list")
+ORDER_URL = reverse("airport:order-list")
+ME_URL = reverse("user:manage")
+
+
+def read_alias(request):
+    """Answers with the alias the router picks for a read."""
+    status = 201 if request.method == "POST" else 200
+    if request.GET.get("fail"):
+        status = 400
+    return HttpResponse(router.db_for_read(Flight), status=status)
+
+
+async def async_read_alias(request):
+    return read_alias(request)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"])
+class ReplicaRoutingMiddlewareTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(read_alias)
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def read_from(self, method, path, headers=None, middleware=None, **extra):
+        request = getattr(self.factory, method)(
+            path, headers=headers or self.headers, **extra
+        )
+        middleware = middleware or self.middleware
+        if iscoroutinefunction(middleware):
+            middleware = async_to_sync(middleware)
+        return middleware(request).content.decode()
+
+    def test_safe_airport_requests_read_from_replicas(self):
+        self.assertEqual(self.read_from("get", FLIGHT_URL), "replica_1")
+        self.assertEqual(self.read_from("head", FLIGHT_URL), "replica_1")
+
+    def test_writes_read_from_primary(self):
+        self.assertEqual(self.read_from("post", ORDER_URL), "default")
+
+    def test_other_apps_read_from_primary(self):
+        self.assertEqual(self.read_from("get", ME_URL), "default")
+        self.assertEqual(self.read_from("get", "/missing/"), "default")
+
+    def test_user_pinned_to_primary_after_write(self):
+        other_user = {"Authorization": f"Bearer {AccessToken.for_user(self.admin)}"}
+
+        self.read_from("post", ORDER_URL)
+
+        self.assertEqual(self.read_from("get", ORDER_URL), "default")
+        self.assertEqual(self.read_from("get", ORDER_URL, other_user), "replica_1")
+
+    def test_failed_write_does_not_pin(self):
+        self.read_from("post", f"{ORDER_URL}?fail=1")
+
+        self.assertEqual(self.read_from("get", ORDER_URL), "replica_1")
+
+    def test_async(self):
+        middleware = ReplicaRoutingMiddleware(async_read_alias)
+
+        self.assertEqual(
+            self.read_from("get", FLIGHT_URL, middleware=middleware), "replica_1"
+        )
+        self.read_from("post", ORDER_URL, middleware=middleware)
+        self.assertEqual(
+            self.read_from("get", FLIGHT_URL, middleware=middleware), "default"
+        )
+
+    def test_primary_block(self):
+        def read_in_primary_block(request):
+            with primary():
+                return read_alias(request)
+
+        middleware = ReplicaRoutingMiddleware(read_in_primary_block)
+
+        self.assertEqual(
+            self.read_from("get", FLIGHT_URL, middleware=middleware), "default"
+        )
+
+    def test_reads_of_related_objects_follow_their_instance(self):
+        flight = sample_flight()
+
+        self.assertEqual(router.db_for_read(Flight, instance=flight), "default")
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"], REPLICA_PIN_SECONDS=10)
+class CachedResponseReplicaTests(BaseSetUp):
+    """A second connection to the test database stands in for a lagging
+    replica, as it does not see the rows of the test transaction."""
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings["replica_1"] = {**connections.settings["default"]}
+        cls.databases = {"default", "replica_1"}
+        cls.addClassCleanup(connections.settings.pop, "replica_1")
+        cls.addClassCleanup(connections.close_all)
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        # A client of its own loads the middleware with the replica
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        sample_country(name="Ukraine")
+        bump_model_version(Country)
+
+    def names(self, url=COUNTRY_URL):
+        return [country["name"] for country in self.client.get(url).data]
+
+    def test_recent_write_read_from_primary_for_unpinned_user(self):
+        with CaptureQueriesContext(connections["replica_1"]) as queries:
+            self.assertEqual(self.names(), ["Ukraine"])
+            self.assertEqual(len(queries), 0)
+
+        # Cached under the new version, and validated by the ETag
+        self.assertEqual(self.names(), ["Ukraine"])
+        etag = self.client.get(COUNTRY_URL)["ETag"]
+        self.assertEqual(
+            self.client.get(COUNTRY_URL, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+    def test_replicas_read_again_once_they_caught_up(self):
+        latest = max(model_versions([Country]))
+        clock = mock.patch("airport.cache.time")
+        clock.start().time_ns.return_value = latest + 10 * 10**9
+        self.addCleanup(clock.stop)
+
+        self.assertEqual(self.names(), [])
+
+
+@skipUnless(
+    settings.DATABASE_REPLICAS,
+    "Set DATABASE_REPLICA_HOSTS to run against a replica",
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    # The replica connection does not see the transaction of a TestCase
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    def test_reads_from_replica(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user("test@test.com", "testpass")
+        )
+        sample_flight()
+
+        with CaptureQueriesContext(connections["replica_1"]) as queries:
+            res = client.get(FLIGHT_URL)
+
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertGreater(len(queries), 0)
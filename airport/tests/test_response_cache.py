@@ -0,0 +1,79 @@
+from django.urls import reverse
+from rest_framework import status
+
+from airport.cache import cache_stats
+from airport.tests.base import BaseSetUp, sample_airport, sample_country
+
+COUNTRY_URL = reverse("airport:country-list")
+AIRPORT_URL = reverse("airport:airport-list")
+
+
+class ResponseCacheTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_second_request_is_served_from_cache(self):
+        sample_country()
+        hits = cache_stats().get(("country", "hit"), 0)
+
+        res1 = self.client.get(COUNTRY_URL)
+        with self.assertNumQueries(0):
+            res2 = self.client.get(COUNTRY_URL)
+
+        self.assertEqual(res1["X-Cache"], "MISS")
+        self.assertEqual(res2["X-Cache"], "HIT")
+        self.assertEqual(res1.data, res2.data)
+        self.assertEqual(cache_stats()[("country", "hit")], hits + 1)
+
+    def test_query_params_are_cached_separately(self):
+        sample_country(name="Ukraine")
+        sample_country(name="Poland")
+
+        self.client.get(COUNTRY_URL)
+        res = self.client.get(COUNTRY_URL, {"name": "ukr"})
+
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual([country["name"] for country in res.data], ["Ukraine"])
+
+    def test_roles_are_cached_separately(self):
+        self.client.get(COUNTRY_URL)
+        self.client.force_authenticate(self.admin)
+
+        res = self.client.get(COUNTRY_URL)
+
+        self.assertEqual(res["X-Cache"], "MISS")
+
+    def test_write_invalidates_cache(self):
+        country = sample_country(name="Ukraine")
+        self.client.get(COUNTRY_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            country.name = "Poland"
+            country.save()
+        res = self.client.get(COUNTRY_URL)
+
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(res.data[0]["name"], "Poland")
+
+    def test_write_to_related_model_invalidates_cache(self):
+        country = sample_country(name="Ukraine")
+        sample_airport(country=country)
+        self.client.get(AIRPORT_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            country.name = "Poland"
+            country.save()
+        res = self.client.get(AIRPORT_URL)
+
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(res.data["results"][0]["country"], "Poland")
+
+    def test_errors_are_not_cached(self):
+        url = reverse("airport:country-detail", args=[0])
+        self.client.get(url)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
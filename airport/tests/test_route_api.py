@@ -37,7 +37,7 @@ class UserRouteAPITests(BaseSetUp):
         serializer = RouteListSerializer(routes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_detail_route(self):
         route = sample_route()
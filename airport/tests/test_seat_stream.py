@@ -0,0 +1,252 @@
+import asyncio
+import datetime
+import json
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import (
+    AsyncRequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport import seat_events
+from airport.models import Order, Ticket
+from airport.seat_events import RESYNC, SeatBroadcast
+from airport.tests.base import BaseSetUp, sample_airplane, sample_flight
+
+ORDER_URL = reverse("airport:order-list")
+
+
+def seats_url(flight_id: int) -> str:
+    return reverse("airport:flight-seats", args=[flight_id])
+
+
+def parse(chunk: bytes) -> tuple[str, dict]:
+    lines = dict(line.split(": ", 1) for line in chunk.decode().strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+class SeatBroadcastTests(SimpleTestCase):
+    async def test_fans_out_to_subscribers_of_the_flight(self):
+        broadcast = SeatBroadcast()
+        first = broadcast.subscribe(1)
+        second = broadcast.subscribe(1)
+        other = broadcast.subscribe(2)
+        event = {"type": "taken", "places": [{"row": 1, "seat": 1}]}
+
+        # Events come from the threads the requests run in
+        thread = threading.Thread(target=broadcast.dispatch, args=(1, event))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(await asyncio.wait_for(first.get(), 1), event)
+        self.assertEqual(await asyncio.wait_for(second.get(), 1), event)
+        self.assertTrue(other.empty())
+
+    @override_settings(SEAT_STREAM_QUEUE_SIZE=2)
+    async def test_resync_when_subscriber_falls_behind(self):
+        broadcast = SeatBroadcast()
+        queue = broadcast.subscribe(1)
+
+        for seat in range(3):
+            broadcast.dispatch(
+                1, {"type": "taken", "places": [{"row": 1, "seat": seat}]}
+            )
+        await asyncio.sleep(0)
+
+        self.assertIs(queue.get_nowait(), RESYNC)
+        self.assertTrue(queue.empty())
+
+    async def test_unsubscribe(self):
+        broadcast = SeatBroadcast()
+        queue = broadcast.subscribe(1)
+        broadcast.subscribe(1)
+
+        broadcast.unsubscribe(1, queue)
+        self.assertEqual(broadcast.subscriber_count(1), 1)
+        broadcast.dispatch(1, {"type": "taken", "places": []})
+        await asyncio.sleep(0)
+
+        self.assertTrue(queue.empty())
+
+
+class SeatStreamTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight(airplane=sample_airplane(rows=5, seats_in_row=5))
+        self.order = Order.objects.create(user=self.user)
+        Ticket.objects.create(order=self.order, flight=self.flight, row=1, seat=1)
+
+    def stream(self):
+        request = AsyncRequestFactory().get(
+            seats_url(self.flight.id),
+            headers={
+                "Authorization": f"Bearer {AccessToken.for_user(self.user)}",
+                "Accept": "text/event-stream",
+            },
+        )
+        match = resolve(request.path)
+        return match.func(request, *match.args, **match.kwargs)
+
+    def test_stream_sends_snapshot_then_changes(self):
+        response = self.stream()
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+        def sell(row, seat):
+            with self.captureOnCommitCallbacks(execute=True):
+                return Ticket.objects.create(
+                    order=self.order, flight=self.flight, row=row, seat=seat
+                )
+
+        def give_back(ticket):
+            with self.captureOnCommitCallbacks(execute=True):
+                ticket.delete()
+
+        async def read():
+            events = aiter(response.streaming_content)
+            chunks = [await anext(events)]
+            self.assertEqual(seat_events.broadcast.subscriber_count(self.flight.id), 1)
+            ticket = await sync_to_async(sell)(2, 3)
+            chunks.append(await asyncio.wait_for(anext(events), 1))
+            await sync_to_async(give_back)(ticket)
+            chunks.append(await asyncio.wait_for(anext(events), 1))
+            await events.aclose()
+            return chunks
+
+        chunks = async_to_sync(read)()
+
+        self.assertEqual(
+            [parse(chunk) for chunk in chunks],
+            [
+                ("snapshot", {"taken_places": [{"row": 1, "seat": 1}]}),
+                ("taken", {"places": [{"row": 2, "seat": 3}]}),
+                ("released", {"places": [{"row": 2, "seat": 3}]}),
+            ],
+        )
+        self.assertEqual(seat_events.broadcast.subscriber_count(self.flight.id), 0)
+
+    @override_settings(SEAT_STREAM_HEARTBEAT=0.01)
+    def test_stream_heartbeat(self):
+        response = self.stream()
+
+        async def read():
+            events = aiter(response.streaming_content)
+            chunks = [await anext(events), await anext(events)]
+            await events.aclose()
+            return chunks
+
+        self.assertEqual(async_to_sync(read)()[1], b": keep-alive\n\n")
+
+    def test_stream_under_wsgi_sends_snapshot_only(self):
+        res = self.client.get(seats_url(self.flight.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        retry, snapshot = b"".join(res.streaming_content).decode().split("\n\n")[:2]
+        self.assertEqual(retry, f"retry: {seat_events.WSGI_RETRY_MS}")
+        self.assertEqual(
+            parse(snapshot.encode()),
+            ("snapshot", {"taken_places": [{"row": 1, "seat": 1}]}),
+        )
+
+    def test_stream_requires_authentication(self):
+        self.client.force_authenticate(None)
+
+        res = self.client.get(
+            seats_url(self.flight.id), HTTP_ACCEPT="text/event-stream"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertTrue(res.content.startswith(b"event: error\n"))
+
+    def test_stream_of_missing_flight(self):
+        res = self.client.get(seats_url(self.flight.id + 1))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @mock.patch.object(seat_events.MemoryBroker, "publish")
+    def test_order_publishes_taken_seats_per_flight(self, publish):
+        other = sample_flight()
+        payload = {
+            "tickets": [
+                {"row": 2, "seat": 1, "flight": self.flight.id},
+                {"row": 1, "seat": 1, "flight": other.id},
+                {"row": 2, "seat": 2, "flight": self.flight.id},
+            ]
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertCountEqual(
+            publish.call_args_list,
+            [
+                mock.call(
+                    self.flight.id,
+                    {
+                        "type": "taken",
+                        "places": [{"row": 2, "seat": 1}, {"row": 2, "seat": 2}],
+                    },
+                ),
+                mock.call(
+                    other.id, {"type": "taken", "places": [{"row": 1, "seat": 1}]}
+                ),
+            ],
+        )
+
+    @mock.patch.object(seat_events.MemoryBroker, "publish")
+    def test_failed_order_publishes_nothing(self, publish):
+        payload = {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        publish.assert_not_called()
+
+
+@override_settings(SEAT_EVENTS_BROKER="postgres")
+class PostgresBrokerTests(TransactionTestCase):
+    def tearDown(self):
+        seat_events.broker().stop()
+
+    def test_events_reach_listeners_over_notify(self):
+        flight = sample_flight(
+            departure_time=timezone.make_aware(datetime.datetime(2024, 8, 31, 21)),
+            arrival_time=timezone.make_aware(datetime.datetime(2024, 8, 31, 22)),
+        )
+        places = [(row, seat) for row in range(1, 31) for seat in range(1, 31)]
+
+        async def listen():
+            await sync_to_async(seat_events.broker().start)()
+            queue = seat_events.broadcast.subscribe(flight.id)
+            try:
+                # Published by another process as far as this one can tell
+                await sync_to_async(seat_events.publish_on_commit)(
+                    flight.id, "taken", places
+                )
+                events = []
+                while sum(len(event["places"]) for event in events) < len(places):
+                    events.append(await asyncio.wait_for(queue.get(), 5))
+                return events
+            finally:
+                seat_events.broadcast.unsubscribe(flight.id, queue)
+
+        events = async_to_sync(listen)()
+
+        # Split up to fit the NOTIFY payload limit
+        self.assertGreater(len(events), 1)
+        self.assertEqual({event["type"] for event in events}, {"taken"})
+        self.assertEqual(
+            [place for event in events for place in event["places"]],
+            [{"row": row, "seat": seat} for row, seat in places],
+        )
@@ -0,0 +1,99 @@
+import re
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from airport.serializers import FlightListSerializer
+from airport.tests.base import BaseSetUp, sample_flight
+
+FLIGHT_URL = reverse("airport:flight-list")
+
+
+def server_timing(response) -> dict:
+    return {
+        name: (float(duration), description)
+        for name, duration, description in re.findall(
+            r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', response["Server-Timing"]
+        )
+    }
+
+
+class ServerTimingMiddlewareTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        sample_flight()
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(FLIGHT_URL)
+
+        timings = server_timing(res)
+        self.assertEqual(set(timings), {"db", "serializer", "app", "render", "total"})
+        self.assertEqual(timings["db"][1], f"{len(queries)} queries")
+        self.assertLessEqual(
+            timings["db"][0] + timings["serializer"][0] + timings["render"][0],
+            timings["total"][0] + 0.1,
+        )
+
+    def test_serializer_time(self):
+        to_representation = FlightListSerializer.to_representation
+
+        def slow(serializer, instance):
+            time.sleep(0.05)
+            return to_representation(serializer, instance)
+
+        labels = {"view": "flight", "action": "list"}
+        before = REGISTRY.get_sample_value(
+            "airport_request_serializer_duration_seconds_sum", labels
+        )
+
+        with mock.patch.object(FlightListSerializer, "to_representation", slow):
+            with self.assertLogs("airport_service.requests", "INFO") as logs:
+                res = self.client.get(FLIGHT_URL)
+
+        timings = server_timing(res)
+        self.assertGreaterEqual(timings["serializer"][0], 50)
+        self.assertLess(timings["app"][0], 50)
+        self.assertGreaterEqual(logs.records[0].serializer_ms, 50)
+        self.assertGreaterEqual(
+            REGISTRY.get_sample_value(
+                "airport_request_serializer_duration_seconds_sum", labels
+            ),
+            (before or 0) + 0.05,
+        )
+
+    def test_server_timing_header_on_errors(self):
+        self.client.force_authenticate(None)
+
+        res = self.client.get(FLIGHT_URL)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertIn("total", server_timing(res))
+
+    def test_histograms_per_view_and_action(self):
+        labels = {"view": "flight", "action": "list"}
+        before = REGISTRY.get_sample_value(
+            "airport_request_duration_seconds_count", labels
+        )
+
+        self.client.get(FLIGHT_URL)
+
+        self.assertEqual(
+            REGISTRY.get_sample_value("airport_request_duration_seconds_count", labels),
+            (before or 0) + 1,
+        )
+        self.assertGreater(
+            REGISTRY.get_sample_value("airport_request_db_queries_sum", labels), 0
+        )
+
+    def test_log_line(self):
+        with self.assertLogs("airport_service.requests", "INFO") as logs:
+            self.client.get(FLIGHT_URL)
+
+        self.assertIn("view=flight action=list status=200", logs.output[0])
+        self.assertEqual(logs.records[0].view, "flight")
@@ -0,0 +1,199 @@
+import datetime
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from airport import queue
+from airport.models import Task
+from airport.queue import task
+from airport.tasks import send_order_confirmation
+from airport.tests.base import BaseSetUp, sample_flight
+
+ORDER_URL = reverse("airport:order-list")
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def fail():
+    raise ValueError("failed")
+
+
+class TaskQueueTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        record.enqueue(1)
+        record.enqueue(value=2)
+
+        self.assertEqual(queue.run_due(), 2)
+
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(queue.run_due(), 0)
+
+    def test_retry_with_backoff(self):
+        queued = fail.enqueue()
+
+        with self.assertLogs("airport.queue", "WARNING"):
+            queue.run_due()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.Status.QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn("ValueError: failed", queued.last_error)
+        self.assertGreater(
+            queued.run_after, timezone.now() + datetime.timedelta(seconds=4)
+        )
+        self.assertEqual(queue.run_due(), 0)
+
+    def test_failed_after_last_attempt(self):
+        queued = fail.enqueue()
+
+        for _ in range(2):
+            Task.objects.update(run_after=timezone.now())
+            with self.assertLogs("airport.queue", "WARNING"):
+                queue.run_due()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.Status.FAILED)
+        self.assertEqual(queued.attempts, 2)
+        Task.objects.update(run_after=timezone.now())
+        self.assertEqual(queue.run_due(), 0)
+
+    def test_retry_delay_grows(self):
+        self.assertLessEqual(queue.retry_delay(1).total_seconds(), 10)
+        self.assertGreaterEqual(queue.retry_delay(4).total_seconds(), 40)
+        self.assertLessEqual(queue.retry_delay(30).total_seconds(), 3600)
+
+    def test_unknown_task_fails(self):
+        Task.objects.create(name="missing", max_attempts=5, run_after=timezone.now())
+
+        with self.assertLogs("airport.queue", "ERROR"):
+            queue.run_due()
+
+        self.assertEqual(Task.objects.get().status, Task.Status.FAILED)
+
+    def test_lost_task_runs_again(self):
+        record.enqueue(1)
+        queue.claim(10)
+
+        self.assertEqual(queue.run_due(), 0)
+        Task.objects.update(run_after=timezone.now())
+        self.assertEqual(queue.run_due(), 1)
+
+        self.assertEqual(calls, [1])
+
+    def test_task_timed_out_in_batch_is_left_to_its_new_worker(self):
+        record.enqueue(1)
+        record.enqueue(2)
+        first, second = queue.claim(10)
+
+        queue.run(first)
+        # The batch was slow, another worker claimed the second task again
+        Task.objects.filter(id=second.id).update(attempts=F("attempts") + 1)
+
+        self.assertFalse(queue.renew(second))
+        self.assertEqual(calls, [1])
+
+    def test_task_timeout_restarts_as_it_starts(self):
+        record.enqueue(1)
+        (queued,) = queue.claim(10)
+        Task.objects.update(run_after=timezone.now())
+
+        self.assertTrue(queue.renew(queued))
+
+        self.assertGreater(
+            Task.objects.get().run_after,
+            timezone.now() + datetime.timedelta(seconds=settings.TASK_TIMEOUT - 60),
+        )
+
+    def test_run_tasks_command(self):
+        record.enqueue(1)
+
+        # It would close the connection of the test transaction
+        with mock.patch("airport.management.commands.run_tasks.close_old_connections"):
+            call_command("run_tasks", burst=True, stdout=StringIO())
+
+        self.assertEqual(calls, [1])
+
+
+class OrderConfirmationTests(BaseSetUp):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        self.payload = {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]}
+
+    def test_order_enqueues_confirmation(self):
+        res = self.client.post(ORDER_URL, self.payload, format="json")
+
+        queued = Task.objects.get()
+        self.assertEqual(queued.name, send_order_confirmation.name)
+        self.assertEqual(queued.args, [res.data["id"]])
+        self.assertEqual(mail.outbox, [])
+
+        queue.run_due()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        self.assertIn("row 1, seat 1", mail.outbox[0].body)
+
+    def test_failed_order_enqueues_nothing(self):
+        self.client.post(ORDER_URL, self.payload, format="json")
+        Task.objects.all().delete()
+
+        res = self.client.post(ORDER_URL, self.payload, format="json")
+
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASK_QUEUE_BACKEND="immediate")
+    def test_immediate_backend(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(ORDER_URL, self.payload, format="json")
+
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_deleted_order(self):
+        send_order_confirmation(0)
+
+        self.assertEqual(mail.outbox, [])
+
+
+class ConcurrentWorkerTests(TransactionTestCase):
+    def test_workers_skip_claimed_tasks(self):
+        first = record.enqueue(1)
+        second = record.enqueue(2)
+        claimed = []
+
+        def claim():
+            try:
+                claimed.extend(queued.id for queued in queue.claim(10))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            list(Task.objects.select_for_update().filter(id=first.id))
+            worker = threading.Thread(target=claim)
+            worker.start()
+            worker.join()
+
+        self.assertEqual(claimed, [second.id])
@@ -8,6 +8,8 @@ from airport.views import (
     AirplaneViewSet,
     CrewViewSet,
     FlightViewSet,
+    ImportViewSet,
+    ItineraryViewSet,
     OrderViewSet,
 )
 
@@ -19,7 +21,9 @@ router.register("airplane-types", AirplaneTypeViewSet)
 router.register("airplanes", AirplaneViewSet)
 router.register("crew-members", CrewViewSet)
 router.register("flights", FlightViewSet)
+router.register("itineraries", ItineraryViewSet, basename="itinerary")
 router.register("orders", OrderViewSet)
+router.register("imports", ImportViewSet, basename="import")
 
 urlpatterns = router.urls
 
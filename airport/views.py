@@ -1,12 +1,31 @@
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F, Prefetch, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
-
+from rest_framework.viewsets import ModelViewSet, ViewSet
+
+from airport import seat_events
+from airport.async_views import AsyncViewSetMixin
+from airport.cache import CachedResponseMixin, ConditionalResponseMixin
+from airport.exports import WRITERS, aiterate, export_rows
+from airport.images import schedule_image_variants
+from airport.imports import import_rows, read_rows
+from airport.itineraries import itinerary_index
 from airport.models import (
     Airport,
     Airplane,
@@ -14,10 +33,20 @@ from airport.models import (
     Crew,
     Country,
     Flight,
+    IdempotencyKey,
     Order,
     Route,
+    Ticket,
 )
 from airport.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airport_service.middleware import SerializerTimingMixin, time_serializer
+from airport_service.renderers import (
+    CSVRenderer,
+    EventStreamRenderer,
+    NDJSONRenderer,
+    ORJSONRenderer,
+    ParquetRenderer,
+)
 
 from airport.serializers import (
     CountrySerializer,
@@ -28,24 +57,198 @@ from airport.serializers import (
     AirplaneTypeSerializer,
     CrewSerializer,
     FlightDetailSerializer,
+    FlightHoldSerializer,
+    FlightSeatMapSerializer,
     FlightSerializer,
+    ImportSerializer,
     OrderDetailSerializer,
+    OrderExportSerializer,
     OrderSerializer,
     RouteListSerializer,
     AirplaneListRetrieveSerializer,
     FlightListSerializer,
     AirportListSerializer,
     AirplaneImageSerializer,
+    ItinerarySearchSerializer,
+    ItinerarySerializer,
 )
 
 
-class CountryViewSet(ModelViewSet):
+class KeysetPagination(CursorPagination):
+    """Keyset pagination over the ordering of the viewset.
+
+    The cursor holds the values of every ordering field of the row at the
+    edge of the page, and the next page starts past that row in the whole
+    ordering, so rows that tie on the first field are neither skipped nor
+    counted off with an OFFSET. The total count is included unless the
+    client opts out with ?count=false.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if self.count_requested(request):
+            self.count = queryset.count()
+        queryset = self.page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.paginate_rows(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset with the page fetched by the async ORM."""
+        self.count = None
+        if self.count_requested(request):
+            self.count = await queryset.acount()
+        queryset = self.page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.paginate_rows([row async for row in queryset])
+
+    def count_requested(self, request) -> bool:
+        return request.query_params.get(self.count_query_param, "").lower() not in (
+            "false",
+            "0",
+        )
+
+    def page_queryset(self, queryset, request, view=None):
+        """The query of the page, with one extra row to tell if there is
+        more, or None when pagination is off."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.cursor is not None and self.cursor.reverse:
+            ordering = [
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.past(ordering, self.decode_position()))
+        return queryset[: self.page_size + 1]
+
+    @staticmethod
+    def past(ordering, position) -> Q:
+        """Rows after position in ordering: (a, b) > (x, y) spelled as
+        a >= x AND (a > x OR (a = x AND b > y)), so the leading field
+        still bounds an index range scan."""
+        name = ordering[0].lstrip("-")
+        bound = Q(
+            **{f"{name}__{'lte' if ordering[0][0] == '-' else 'gte'}": position[0]}
+        )
+        after = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            after |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return bound & after
+
+    def decode_position(self) -> list:
+        try:
+            position = json.loads(self.cursor.position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_position(self, row) -> str:
+        values = []
+        for field in self.ordering:
+            value = getattr(row, field.lstrip("-"))
+            # isoformat keeps the microseconds DjangoJSONEncoder drops
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        return json.dumps(values)
+
+    def paginate_rows(self, rows):
+        has_more = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = self.cursor is not None, has_more
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = (
+            self.encode_position(self.page[-1]) if self.page else self.cursor.position
+        )
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = (
+            self.encode_position(self.page[0]) if self.page else self.cursor.position
+        )
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {"count": self.count, **response.data}
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {"type": "integer", "example": 123},
+            **response_schema["properties"],
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Pass false to skip the total count.",
+                "schema": {"type": "boolean"},
+            }
+        ]
+
+
+class AirportPagination(KeysetPagination):
+    ordering = "id"
+
+
+class RoutePagination(KeysetPagination):
+    ordering = "id"
+
+
+class FlightPagination(KeysetPagination):
+    ordering = ("-departure_time", "-id")
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class CountryViewSet(
+    ConditionalResponseMixin, CachedResponseMixin, SerializerTimingMixin, ModelViewSet
+):
     serializer_class = CountrySerializer
     permission_classes = [IsAdminOrIfAuthenticatedReadOnly]
     queryset = Country.objects.all()
+    cache_models = (Country,)
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.queryset.all()
 
         name = self.request.query_params.get("name")
         if name:
@@ -64,9 +267,13 @@ class CountryViewSet(ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class AirportViewSet(ModelViewSet):
+class AirportViewSet(
+    ConditionalResponseMixin, CachedResponseMixin, SerializerTimingMixin, ModelViewSet
+):
     permission_classes = [IsAdminOrIfAuthenticatedReadOnly]
     queryset = Airport.objects.all()
+    pagination_class = AirportPagination
+    cache_models = (Airport, Country)
 
     def get_queryset(self):
         queryset = self.queryset.select_related("country")
@@ -101,9 +308,18 @@ class AirportViewSet(ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class RouteViewSet(ModelViewSet):
+class RouteViewSet(
+    ConditionalResponseMixin,
+    CachedResponseMixin,
+    AsyncViewSetMixin,
+    SerializerTimingMixin,
+    ModelViewSet,
+):
     queryset = Route.objects.select_related("source", "destination")
     permission_classes = [IsAdminOrIfAuthenticatedReadOnly]
+    pagination_class = RoutePagination
+    cache_models = (Route, Airport)
+    async_actions = ("list",)
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -113,15 +329,21 @@ class RouteViewSet(ModelViewSet):
         return RouteSerializer
 
 
-class AirplaneTypeViewSet(ModelViewSet):
+class AirplaneTypeViewSet(
+    ConditionalResponseMixin, CachedResponseMixin, SerializerTimingMixin, ModelViewSet
+):
     queryset = AirplaneType.objects.all()
     permission_classes = [IsAdminOrIfAuthenticatedReadOnly]
     serializer_class = AirplaneTypeSerializer
+    cache_models = (AirplaneType,)
 
 
-class AirplaneViewSet(ModelViewSet):
+class AirplaneViewSet(
+    ConditionalResponseMixin, CachedResponseMixin, SerializerTimingMixin, ModelViewSet
+):
     queryset = Airplane.objects.select_related("airplane_type")
     permission_classes = [IsAdminOrIfAuthenticatedReadOnly]
+    cache_models = (Airplane, AirplaneType)
 
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
@@ -142,42 +364,94 @@ class AirplaneViewSet(ModelViewSet):
         serializer = self.get_serializer(airplane, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            airplane = serializer.save(image_variants={})
+            schedule_image_variants(airplane)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CrewViewSet(ModelViewSet):
+class CrewViewSet(
+    ConditionalResponseMixin, CachedResponseMixin, SerializerTimingMixin, ModelViewSet
+):
     queryset = Crew.objects.all()
     serializer_class = CrewSerializer
     permission_classes = [IsAdminOrIfAuthenticatedReadOnly]
+    cache_models = (Crew,)
 
 
-class FlightViewSet(ModelViewSet):
+class FlightViewSet(
+    ConditionalResponseMixin, AsyncViewSetMixin, SerializerTimingMixin, ModelViewSet
+):
     queryset = Flight.objects.select_related("route", "airplane").prefetch_related(
         "crew"
     )
     permission_classes = [IsAdminOrIfAuthenticatedReadOnly]
+    pagination_class = FlightPagination
+    cache_models = (Flight, Route, Airport, Airplane, Crew, Ticket)
 
     def get_queryset(self):
         queryset = self.queryset
 
         departure = self.request.query_params.get("departure")
         arrival = self.request.query_params.get("arrival")
+        has_seats = self.request.query_params.get("has_seats")
 
         if departure:
             queryset = queryset.filter(departure_time__gt=departure)
         if arrival:
             queryset = queryset.filter(arrival_time__lt=arrival)
 
+        if self.action == "list":
+            queryset = queryset.annotate(
+                capacity=F("airplane__rows") * F("airplane__seats_in_row"),
+                tickets_available=(
+                    F("airplane__rows") * F("airplane__seats_in_row")
+                    - F("tickets_sold")
+                ),
+            )
+            if has_seats and has_seats.lower() in ("true", "1"):
+                queryset = queryset.filter(tickets_available__gt=0)
+        elif self.action == "retrieve":
+            # Everything the detail serializers read, so the async view can
+            # serialize without going back to the database
+            queryset = queryset.select_related("route__source", "route__destination")
+            if not self.seat_map_requested():
+                queryset = queryset.prefetch_related(
+                    Prefetch(
+                        "tickets",
+                        queryset=Ticket.objects.only("row", "seat", "flight"),
+                    )
+                )
+        elif self.action == "seats":
+            queryset = queryset.select_related(None).prefetch_related(None).only("id")
+
         return queryset
 
+    def seat_map_requested(self) -> bool:
+        return self.request.query_params.get("seat_format") == "bitmap"
+
+    async def aget_object(self):
+        flight = await super().aget_object()
+        if (
+            self.action == "retrieve"
+            and self.seat_map_requested()
+            and not hasattr(flight, "taken_seats")
+        ):
+            flight.taken_seats = [
+                place async for place in flight.tickets.values_list("row", "seat")
+            ]
+        return flight
+
     def get_serializer_class(self):
         if self.action == "retrieve":
+            if self.seat_map_requested():
+                return FlightSeatMapSerializer
             return FlightDetailSerializer
         elif self.action == "list":
             return FlightListSerializer
+        elif self.action == "hold":
+            return FlightHoldSerializer
         return FlightSerializer
 
     @extend_schema(
@@ -192,21 +466,181 @@ class FlightViewSet(ModelViewSet):
                 type=OpenApiTypes.DATE,
                 description="Filter by less date (ex. ?arrival=2024-08-01T19:00:00)",
             ),
+            OpenApiParameter(
+                name="has_seats",
+                type=OpenApiTypes.BOOL,
+                description="Only flights with free seats (ex. ?has_seats=true)",
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="seat_format",
+                type=str,
+                enum=["list", "bitmap"],
+                description="Return taken places as a base64 seat bitmap "
+                "(ex. ?seat_format=bitmap)",
+            ),
+        ]
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-class OrderPagination(PageNumberPagination):
-    page_size = 10
-    max_page_size = 100
+    @extend_schema(responses={(200, "text/event-stream"): OpenApiTypes.STR})
+    @action(
+        methods=["GET"],
+        detail=True,
+        renderer_classes=[EventStreamRenderer, ORJSONRenderer],
+    )
+    def seats(self, request, pk=None):
+        """Server-sent events with the taken places of the flight: a
+        "snapshot" of all of them, then "taken" and "released" events as
+        tickets are sold and returned. A "snapshot" is sent again when the
+        client falls behind. Under WSGI only the snapshot is sent."""
+        flight = self.get_object()
+        if isinstance(request._request, ASGIRequest):
+            events = seat_events.stream(flight.id)
+        else:
+            events = seat_events.snapshot_stream(flight.id)
+        response = StreamingHttpResponse(events, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Stops nginx from buffering the events
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @action(
+        methods=["POST", "DELETE"],
+        detail=True,
+        permission_classes=[IsAuthenticated],
+    )
+    def hold(self, request, pk=None):
+        """Endpoint for holding seats on specific flight before ordering them.
+        A new hold replaces the previous one of the user on this flight."""
+        flight = self.get_object()
+
+        if request.method == "DELETE":
+            flight.holds.filter(user=request.user).delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(flight=flight, user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ImportViewSet(ViewSet):
+    permission_classes = [IsAdminUser]
+    serializer_class = ImportSerializer
+
+    @extend_schema(request=ImportSerializer, responses=OpenApiTypes.OBJECT)
+    def create(self, request):
+        """Endpoint for importing a CSV or NDJSON file of countries, airports,
+        routes, airplane types, airplanes, crew or flights. Answers with the
+        rows created, skipped as existing and failed, and the errors."""
+        serializer = ImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        with data["file"].open("rb") as file:
+            report = import_rows(data["kind"], read_rows(file, data["format"]))
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+class ItineraryViewSet(ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="from",
+                type=int,
+                required=True,
+                description="Source airport id (ex. ?from=1)",
+            ),
+            OpenApiParameter(
+                name="to",
+                type=int,
+                required=True,
+                description="Destination airport id (ex. ?to=2)",
+            ),
+            OpenApiParameter(
+                name="date",
+                type=OpenApiTypes.DATE,
+                required=True,
+                description="Departure date (ex. ?date=2024-08-01)",
+            ),
+            OpenApiParameter(
+                name="max_stops",
+                type=int,
+                description="Maximum number of connections, 0-3 (ex. ?max_stops=1)",
+            ),
+        ],
+        responses=ItinerarySerializer(many=True),
+    )
+    def list(self, request):
+        """Endpoint for searching direct and connecting flights
+        between two airports, ranked by arrival time"""
+        params = request.query_params
+        search = ItinerarySearchSerializer(
+            data={
+                "source": params.get("from"),
+                "destination": params.get("to"),
+                "date": params.get("date"),
+                "max_stops": params.get("max_stops", 1),
+            }
+        )
+        search.is_valid(raise_exception=True)
+        data = search.validated_data
+
+        earliest = timezone.make_aware(datetime.combine(data["date"], time.min))
+        itineraries = itinerary_index.search(
+            data["source"].id,
+            data["destination"].id,
+            earliest,
+            earliest + timedelta(days=1),
+            data["max_stops"],
+        )
+
+        flights = Flight.objects.select_related(
+            "route__source", "route__destination", "airplane"
+        ).in_bulk(
+            {leg.flight_id for itinerary in itineraries for leg in itinerary.legs}
+        )
+        serializer = time_serializer(
+            ItinerarySerializer(
+                [
+                    {
+                        "departure_time": itinerary.departure_time,
+                        "arrival_time": itinerary.arrival_time,
+                        "stops": itinerary.stops,
+                        "distance": itinerary.distance,
+                        "flights": [flights[leg.flight_id] for leg in itinerary.legs],
+                    }
+                    for itinerary in itineraries
+                    if all(leg.flight_id in flights for leg in itinerary.legs)
+                ],
+                many=True,
+            )
+        )
+        return Response(serializer.data)
+
+
+EXPORT_RENDERERS = [
+    renderer
+    for renderer in (CSVRenderer, NDJSONRenderer, ParquetRenderer)
+    if renderer.format in WRITERS
+]
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(ConditionalResponseMixin, SerializerTimingMixin, ModelViewSet):
     queryset = Order.objects.prefetch_related("tickets")
     permission_classes = [IsAuthenticated]
     pagination_class = OrderPagination
+    cache_models = (Order, Ticket, Flight, Route, Airport, Airplane, Crew)
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -216,6 +650,22 @@ class OrderViewSet(ModelViewSet):
     def get_queryset(self):
         queryset = self.queryset
 
+        if self.action == "retrieve":
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "tickets__flight",
+                    queryset=Flight.objects.select_related(
+                        "route__source", "route__destination", "airplane"
+                    ).prefetch_related(
+                        "crew",
+                        Prefetch(
+                            "tickets",
+                            queryset=Ticket.objects.only("row", "seat", "flight"),
+                        ),
+                    ),
+                )
+            )
+
         if not self.request.user.is_staff:
             queryset = queryset.filter(user=self.request.user)
 
@@ -228,6 +678,60 @@ class OrderViewSet(ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="Idempotency-Key",
+                type=str,
+                location=OpenApiParameter.HEADER,
+                description="Unique key of the order. Retries with the same "
+                "key get the response of the first request.",
+            )
+        ]
+    )
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        if not 1 <= len(key) <= 255:
+            return Response(
+                {"detail": "Idempotency-Key must be 1 to 255 characters long."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+        ).hexdigest()
+        now = timezone.now()
+        # A duplicate sent while the first request is running waits on the
+        # unique index until that one commits, then replays its response.
+        # A failed request rolls its key back, so its retries run again.
+        with transaction.atomic():
+            record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+                user=request.user,
+                key=key,
+                defaults={"fingerprint": fingerprint, "expires_at": now},
+            )
+            if not created and record.expires_at > now:
+                if record.fingerprint != fingerprint:
+                    return Response(
+                        {"detail": "Idempotency-Key was used for another order."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                return Response(
+                    record.response,
+                    status=record.status_code,
+                    headers={"Idempotent-Replayed": "true"},
+                )
+
+            response = super().create(request, *args, **kwargs)
+            record.fingerprint = fingerprint
+            record.status_code = response.status_code
+            record.response = response.data
+            record.expires_at = now + timedelta(hours=settings.IDEMPOTENCY_KEY_HOURS)
+            record.save()
+        return response
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -239,3 +743,73 @@ class OrderViewSet(ModelViewSet):
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="from",
+                type=OpenApiTypes.DATE,
+                description="Orders made on or after the date (ex. ?from=2024-08-01)",
+            ),
+            OpenApiParameter(
+                name="to",
+                type=OpenApiTypes.DATE,
+                description="Orders made on or before the date (ex. ?to=2024-08-31)",
+            ),
+            OpenApiParameter(
+                name="format",
+                type=str,
+                enum=[renderer.format for renderer in EXPORT_RENDERERS],
+                description="Format of the export (ex. ?format=ndjson), "
+                "or pick it with the Accept header",
+            ),
+        ],
+        responses={
+            (200, renderer.media_type): OpenApiTypes.BINARY
+            for renderer in EXPORT_RENDERERS
+        },
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        permission_classes=[IsAdminUser],
+        renderer_classes=EXPORT_RENDERERS,
+    )
+    def export(self, request):
+        """Endpoint for exporting the tickets of all orders with their
+        flight and route, a row per ticket, streamed from a server-side
+        cursor as CSV, NDJSON or Parquet"""
+        params = request.query_params
+        search = OrderExportSerializer(
+            data={
+                name: params[param]
+                for name, param in (("start", "from"), ("end", "to"))
+                if params.get(param)
+            }
+        )
+        search.is_valid(raise_exception=True)
+        data = search.validated_data
+
+        tickets = Ticket.objects.all()
+        if "start" in data:
+            start = timezone.make_aware(datetime.combine(data["start"], time.min))
+            tickets = tickets.filter(order__created_at__gte=start)
+        if "end" in data:
+            end = timezone.make_aware(datetime.combine(data["end"], time.min))
+            tickets = tickets.filter(order__created_at__lt=end + timedelta(days=1))
+        # The rows are read after the middleware that routes the reads of
+        # this request to a replica has returned, so pick the database now
+        tickets = tickets.using(tickets.db)
+
+        renderer = request.accepted_renderer
+        content = WRITERS[renderer.format](export_rows(tickets))
+        if isinstance(request._request, ASGIRequest):
+            content = aiterate(content)
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="tickets.{renderer.format}"'
+        )
+        return response
@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airport_service.settings")
+# Every ASGI request runs its queries in a thread of its own, so a persistent
+# connection would stay open, unused, after the request is gone. Put
+# pgbouncer in front of Postgres, as the production profile does, for the
+# request to get an open server connection from it instead of a new one.
+# Set, not defaulted, as the .env of a WSGI deployment may well keep them.
+os.environ["DATABASE_CONN_MAX_AGE"] = "0"
 
 application = get_asgi_application()
@@ -0,0 +1,111 @@
+"""Metrics of the service.
+
+With PROMETHEUS_MULTIPROC_DIR set before the first import of
+prometheus_client, every worker process writes its samples to that
+directory and the /metrics view merges them, so any worker can answer
+a scrape for all of them.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUEST_LABELS = ("view", "action")
+
+request_duration = Histogram(
+    "airport_request_duration_seconds",
+    "Time from the first middleware to the rendered response",
+    REQUEST_LABELS,
+    buckets=LATENCY_BUCKETS,
+)
+request_db_duration = Histogram(
+    "airport_request_db_duration_seconds",
+    "Time spent in database queries per request",
+    REQUEST_LABELS,
+    buckets=LATENCY_BUCKETS,
+)
+request_serializer_duration = Histogram(
+    "airport_request_serializer_duration_seconds",
+    "Time spent in serializers per request, their queries excluded",
+    REQUEST_LABELS,
+    buckets=LATENCY_BUCKETS,
+)
+request_app_duration = Histogram(
+    "airport_request_app_duration_seconds",
+    "Time spent outside the database, the serializers and the renderer " "per request",
+    REQUEST_LABELS,
+    buckets=LATENCY_BUCKETS,
+)
+request_render_duration = Histogram(
+    "airport_request_render_duration_seconds",
+    "Time spent rendering the response body per request",
+    REQUEST_LABELS,
+    buckets=LATENCY_BUCKETS,
+)
+request_db_queries = Histogram(
+    "airport_request_db_queries",
+    "Database queries per request",
+    REQUEST_LABELS,
+    buckets=QUERY_BUCKETS,
+)
+throttled_requests = Counter(
+    "airport_throttled_requests",
+    "Requests rejected with 429 Too Many Requests",
+    REQUEST_LABELS,
+)
+
+db_connections_opened = Counter(
+    "airport_db_connections_opened",
+    "Database connections opened, a steady rate means connections are not "
+    "being reused",
+    ("alias",),
+)
+db_gate_in_use = Gauge(
+    "airport_db_gate_in_use",
+    "Requests holding a slot of the connection gate",
+    multiprocess_mode="livesum",
+)
+db_gate_wait = Histogram(
+    "airport_db_gate_wait_seconds",
+    "Time requests waited for a slot of the connection gate",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+db_gate_rejected = Counter(
+    "airport_db_gate_rejected",
+    "Requests answered with 503 because the connection gate stayed full",
+)
+
+response_cache_requests = Counter(
+    "airport_response_cache_requests",
+    "List and retrieve requests answered from the response cache (hit) "
+    "or by the view (miss)",
+    ("view", "outcome"),
+)
+
+tickets_sold = Counter(
+    "airport_tickets_sold",
+    "Tickets sold in committed orders",
+)
+flight_tickets_sold = Histogram(
+    "airport_flight_tickets_sold",
+    "Tickets sold per flight by each order",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50),
+)
+order_failures = Counter(
+    "airport_order_failures",
+    "Orders rejected by OrderSerializer.create",
+    ("reason",),
+)
+
+seat_stream_subscribers = Gauge(
+    "airport_seat_stream_subscribers",
+    "Open live seat streams of flights",
+    multiprocess_mode="livesum",
+)
+
+tasks_processed = Counter(
+    "airport_tasks_processed",
+    "Task queue attempts by outcome: done, retry or failed",
+    ("task", "outcome"),
+)
@@ -0,0 +1,443 @@
+import asyncio
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport_service import metrics
+from airport_service.db_router import replica_reads
+
+logger = logging.getLogger("airport_service.requests")
+
+current_timings = ContextVar("current_timings", default=None)
+
+
+class RequestTimings:
+    """Time spent per request in the database, the serializers and the
+    renderer.
+
+    Queries reach __call__ through record_query, which finds the timings
+    of the request in a context variable. Context variables follow the
+    request into the threads async code runs its queries in, where a
+    per-request execute wrapper on the connection would not.
+    """
+
+    __slots__ = ("db", "queries", "serializer", "render_start", "render")
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.serializer = 0.0
+        self.render_start = None
+        self.render = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def serializing(self, to_representation):
+        """Wraps to_representation to add its time, less the queries it
+        runs, to the serializer time."""
+
+        def timed(instance):
+            start, db = time.perf_counter(), self.db
+            try:
+                return to_representation(instance)
+            finally:
+                self.serializer += time.perf_counter() - start - (self.db - db)
+
+        return timed
+
+
+def record_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # First in the list, so execute_wrapper() blocks that are open when the
+    # connection is created still pop their own wrapper on exit.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    metrics.db_connections_opened.labels(connection.alias).inc()
+
+
+def time_serializer(serializer):
+    """Counts the time serializer.data takes towards the serializer time
+    of the current request."""
+    timings = current_timings.get()
+    if timings is not None:
+        serializer.to_representation = timings.serializing(serializer.to_representation)
+    return serializer
+
+
+class SerializerTimingMixin:
+    """Times the serializers a view gets from get_serializer."""
+
+    def get_serializer(self, *args, **kwargs):
+        return time_serializer(super().get_serializer(*args, **kwargs))
+
+
+def view_labels(request) -> tuple[str, str]:
+    """(viewset basename, action) for viewsets, (URL name, method) for
+    other views."""
+    match = request.resolver_match
+    method = request.method.lower()
+    if match is None:
+        return "unresolved", method
+    actions = getattr(match.func, "actions", None)
+    if actions:
+        basename = match.func.initkwargs.get("basename", match.view_name)
+        return basename, actions.get(method, method)
+    return match.view_name or match._func_path, method
+
+
+class ServerTimingMiddleware:
+    """Measures each request and reports the timings three ways: as a
+    Server-Timing header, as a log line on the ``airport_service.requests``
+    logger and as histograms per view and action in airport_service.metrics.
+
+    ``serializer`` is the time views spend in serializer.data, see
+    SerializerTimingMixin. ``app`` is the rest of the time outside the
+    database and the renderer: authentication, permissions, throttling
+    and the views themselves.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(None, connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = request.timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timings = request.timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, time.perf_counter() - start)
+
+    def report(self, request, response, total):
+        timings = request.timings
+        app = max(0.0, total - timings.db - timings.serializer - timings.render)
+
+        response["Server-Timing"] = (
+            f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+            f"serializer;dur={timings.serializer * 1000:.1f}, "
+            f"app;dur={app * 1000:.1f}, "
+            f"render;dur={timings.render * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+        view, action = view_labels(request)
+        metrics.request_duration.labels(view, action).observe(total)
+        metrics.request_db_duration.labels(view, action).observe(timings.db)
+        metrics.request_serializer_duration.labels(view, action).observe(
+            timings.serializer
+        )
+        metrics.request_app_duration.labels(view, action).observe(app)
+        metrics.request_render_duration.labels(view, action).observe(timings.render)
+        metrics.request_db_queries.labels(view, action).observe(timings.queries)
+        if response.status_code == 429:
+            metrics.throttled_requests.labels(view, action).inc()
+
+        level = (
+            logging.WARNING
+            if total * 1000 >= settings.SLOW_REQUEST_MS
+            else logging.INFO
+        )
+        if logger.isEnabledFor(level):
+            logger.log(
+                level,
+                "method=%s path=%s view=%s action=%s status=%s total_ms=%.1f "
+                "db_ms=%.1f queries=%s serializer_ms=%.1f app_ms=%.1f "
+                "render_ms=%.1f",
+                request.method,
+                request.path,
+                view,
+                action,
+                response.status_code,
+                total * 1000,
+                timings.db * 1000,
+                timings.queries,
+                timings.serializer * 1000,
+                app * 1000,
+                timings.render * 1000,
+                extra={
+                    "view": view,
+                    "action": action,
+                    "status_code": response.status_code,
+                    "total_ms": total * 1000,
+                    "db_ms": timings.db * 1000,
+                    "queries": timings.queries,
+                    "serializer_ms": timings.serializer * 1000,
+                    "app_ms": app * 1000,
+                    "render_ms": timings.render * 1000,
+                },
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        """Runs last of all middleware before the response is rendered,
+        so the time up to the post-render callback is the render time."""
+        timings = request.timings
+        timings.render_start = time.perf_counter()
+
+        def rendered(response):
+            timings.render = time.perf_counter() - timings.render_start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ConnectionGateMiddleware:
+    """Caps the requests of this process that may use a database connection
+    at once at settings.DATABASE_POOL_SIZE.
+
+    Django 5.0 has no connection pool and every thread, and so every ASGI
+    request, holds a connection of its own. The gate keeps the connections
+    of a process within its share of the connections of pgbouncer or
+    Postgres: a request waits up to DATABASE_POOL_TIMEOUT seconds for a
+    slot, in the order it came, and is answered with 503 Service
+    Unavailable after that, instead of failing on a refused connection
+    halfway through. Paths starting with one of DATABASE_POOL_EXEMPT_PATHS
+    do not use the database and skip the gate.
+
+    A handler runs the gate either sync (WSGI), with a threading semaphore,
+    or async (ASGI), with an asyncio one, never both. A streaming response
+    keeps its slot until its body is sent, as the order export reads the
+    database while streaming. Server-sent event streams are the exception:
+    they stay open for as long as the client listens and only read the
+    database for a snapshot, so they give their slot back when the view
+    returns and those reads are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_POOL_SIZE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slots = threading.BoundedSemaphore(settings.DATABASE_POOL_SIZE)
+        self.async_slots = asyncio.BoundedSemaphore(settings.DATABASE_POOL_SIZE)
+        self.timeout = settings.DATABASE_POOL_TIMEOUT
+        self.exempt_paths = tuple(settings.DATABASE_POOL_EXEMPT_PATHS)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path.startswith(self.exempt_paths):
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        acquired = self.slots.acquire(timeout=self.timeout)
+        metrics.db_gate_wait.observe(time.perf_counter() - start)
+        if not acquired:
+            return self.rejected(request)
+        metrics.db_gate_in_use.inc()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.release(self.slots)
+            raise
+        if not self.streams_from_database(response):
+            self.release(self.slots)
+            return response
+        return self.released_when_sent(response, self.release, self.slots)
+
+    async def __acall__(self, request):
+        if request.path.startswith(self.exempt_paths):
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.async_slots.acquire(), self.timeout)
+        except TimeoutError:
+            metrics.db_gate_wait.observe(time.perf_counter() - start)
+            return self.rejected(request)
+        metrics.db_gate_wait.observe(time.perf_counter() - start)
+        metrics.db_gate_in_use.inc()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self.release(self.async_slots)
+            raise
+        if not self.streams_from_database(response):
+            self.release(self.async_slots)
+            return response
+        # A sync body is read in a thread, the asyncio semaphore is
+        # released on the event loop
+        loop = asyncio.get_running_loop()
+        return self.released_when_sent(
+            response, loop.call_soon_threadsafe, self.release, self.async_slots
+        )
+
+    @staticmethod
+    def streams_from_database(response) -> bool:
+        return getattr(response, "streaming", False) and not response.get(
+            "Content-Type", ""
+        ).startswith("text/event-stream")
+
+    @staticmethod
+    def released_when_sent(response, release, *args):
+        """response with release(*args) called once its body is sent."""
+        chunks = response.streaming_content
+        if response.is_async:
+
+            async def content():
+                try:
+                    async for chunk in chunks:
+                        yield chunk
+                finally:
+                    release(*args)
+
+        else:
+
+            def content():
+                try:
+                    yield from chunks
+                finally:
+                    release(*args)
+
+        response.streaming_content = content()
+        return response
+
+    @staticmethod
+    def release(slots) -> None:
+        metrics.db_gate_in_use.dec()
+        slots.release()
+
+    def rejected(self, request):
+        metrics.db_gate_rejected.inc()
+        logger.warning(
+            "method=%s path=%s rejected, connection gate full for %ss",
+            request.method,
+            request.path,
+            self.timeout,
+        )
+        return JsonResponse(
+            {"detail": "The service is overloaded, retry shortly."},
+            status=503,
+            headers={"Retry-After": "1"},
+        )
+
+
+def token_user_id(request):
+    """User id from the bearer token of the request, without a query."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme not in jwt_settings.AUTH_HEADER_TYPES or not token:
+        return None
+    try:
+        return AccessToken(token).get(jwt_settings.USER_ID_CLAIM)
+    except TokenError:
+        return None
+
+
+def pin_key(user_id) -> str:
+    return f"primary-pin:{user_id}"
+
+
+class ReplicaRoutingMiddleware:
+    """Sends the reads of safe requests to the airport API to the
+    replicas in settings.DATABASE_REPLICAS.
+
+    A user whose write succeeded is pinned to the primary for
+    REPLICA_PIN_SECONDS, longer than the replicas are expected to lag,
+    so an order shows up in their next order list. The user comes from
+    the bearer token, as authentication itself reads from the database.
+    Cached responses of recently written tables read from the primary
+    for everyone, see airport.cache.written_reads.
+    """
+
+    sync_capable = True
+    async_capable = True
+    apps = ("airport",)
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user_id = token_user_id(request)
+        use_replicas = self.routed(request) and not (
+            user_id is not None and cache.get(pin_key(user_id))
+        )
+        with replica_reads(use_replicas):
+            response = self.get_response(request)
+        if self.wrote(request, response) and user_id is not None:
+            cache.set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        user_id = token_user_id(request)
+        use_replicas = self.routed(request) and not (
+            user_id is not None and await cache.aget(pin_key(user_id))
+        )
+        with replica_reads(use_replicas):
+            response = await self.get_response(request)
+        if self.wrote(request, response) and user_id is not None:
+            await cache.aset(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def routed(self, request) -> bool:
+        if request.method not in SAFE_METHODS:
+            return False
+        try:
+            return resolve(request.path_info).app_name in self.apps
+        except Resolver404:
+            return False
+
+    @staticmethod
+    def wrote(request, response) -> bool:
+        return request.method not in SAFE_METHODS and response.status_code < 400
@@ -26,9 +26,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv("DJANGO_DEBUG", "true").lower() in ("true", "1")
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.getenv("ALLOWED_HOSTS", "").split(",") if host]
 
 INTERNAL_IPS = [
     "127.0.0.1",
@@ -45,14 +45,15 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "drf_spectacular",
     "rest_framework",
-    "debug_toolbar",
     "airport",
     "user",
 ]
 
 MIDDLEWARE = [
+    "airport_service.middleware.ServerTimingMiddleware",
+    "airport_service.middleware.ConnectionGateMiddleware",
+    "airport_service.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -61,6 +62,12 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# The toolbar middleware is sync only: under ASGI it would push every
+# request through a thread, so it is left out of production.
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(2, "debug_toolbar.middleware.DebugToolbarMiddleware")
+
 ROOT_URLCONF = "airport_service.urls"
 
 TEMPLATES = [
@@ -93,9 +100,54 @@ DATABASES = {
         "PASSWORD": os.environ["POSTGRES_PASSWORD"],
         "HOST": os.environ["POSTGRES_HOST"],
         "PORT": os.environ["POSTGRES_PORT"],
+        # Keep connections open between requests of a thread. Always 0 under
+        # ASGI (see asgi.py), where every request runs in a thread of its own and the
+        # connections are reused by pgbouncer instead.
+        "CONN_MAX_AGE": int(os.getenv("DATABASE_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+# Comma separated hosts of read replicas of the default database, each
+# served as a replica_<n> alias with the credentials of default. Point one
+# at POSTGRES_HOST to try the routing against a single database.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.getenv("DATABASE_REPLICA_HOSTS", "").split(",")), 1
+):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{index}")
+
+DATABASE_ROUTERS = ["airport_service.db_router.ReplicaRouter"]
+
+# Seconds a user reads from the primary after a write, to see it even when
+# the replicas lag behind
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 10))
+
+# Requests per process that may use a database connection at once, see
+# ConnectionGateMiddleware. Keep WEB_CONCURRENCY * DATABASE_POOL_SIZE below
+# the pool of pgbouncer, or Postgres' max_connections without it. 0 turns
+# the gate off.
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", 20))
+# Seconds a request waits for a free slot before it is answered with 503
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", 5))
+DATABASE_POOL_EXEMPT_PATHS = ["/metrics", "/static/"]
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "airport-service"),
     }
 }
 
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -145,11 +197,23 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": (
+        "airport_service.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "airport_service.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_THROTTLE_CLASSES": [
         "rest_framework.throttling.AnonRateThrottle",
         "rest_framework.throttling.UserRateThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "10/minute", "user": "30/minute"},
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": os.getenv("ANON_THROTTLE_RATE", "10/minute"),
+        "user": os.getenv("USER_THROTTLE_RATE", "30/minute"),
+    },
 }
 
 SIMPLE_JWT = {
@@ -168,3 +232,78 @@ SPECTACULAR_SETTINGS = {
 
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
+
+# Stream every upload to a temporary file in chunks instead of holding
+# small ones in memory. FileSystemStorage then moves the file into place.
+FILE_UPLOAD_HANDLERS = ["django.core.files.uploadhandler.TemporaryFileUploadHandler"]
+
+AIRPLANE_IMAGE_MAX_MB = int(os.getenv("AIRPLANE_IMAGE_MAX_MB", 20))
+# Widths of the resized variants of airplane images, see airport.images
+AIRPLANE_IMAGE_WIDTHS = (160, 480, 1024)
+# Threads building the variants per process, 0 builds them in the request
+AIRPLANE_IMAGE_WORKERS = int(os.getenv("AIRPLANE_IMAGE_WORKERS", 2))
+
+SEAT_HOLD_MINUTES = int(os.getenv("SEAT_HOLD_MINUTES", 10))
+
+# "memory" delivers seat events within the process that publishes them,
+# "postgres" to every process over LISTEN/NOTIFY. See airport.seat_events.
+SEAT_EVENTS_BROKER = os.getenv("SEAT_EVENTS_BROKER", "memory")
+# Events a live seat stream may fall behind by before it is resynced
+SEAT_STREAM_QUEUE_SIZE = 100
+SEAT_STREAM_HEARTBEAT = 15
+
+# "database" queues tasks for the run_tasks workers, "immediate" runs them
+# in the process that enqueues them. See airport.queue.
+TASK_QUEUE_BACKEND = os.getenv("TASK_QUEUE_BACKEND", "database")
+TASK_MAX_ATTEMPTS = 5
+# Seconds before the first retry, doubled for every further attempt
+TASK_RETRY_BACKOFF = 10
+TASK_RETRY_BACKOFF_MAX = 3600
+# Seconds after which a running task is taken to be lost and runs again
+TASK_TIMEOUT = int(os.getenv("TASK_TIMEOUT", 300))
+
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend"
+)
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "tickets@airport.example")
+# Seconds before a stuck SMTP connection fails the task, well within
+# TASK_TIMEOUT so a hung send is retried instead of taken to be lost
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", 30))
+
+# Rows fetched from the server-side cursor of an export at a time
+EXPORT_CHUNK_SIZE = 2000
+
+# How long the response to an order with an Idempotency-Key is replayed
+IDEMPOTENCY_KEY_HOURS = int(os.getenv("IDEMPOTENCY_KEY_HOURS", 24))
+
+ITINERARY_MIN_CONNECTION_MINUTES = int(
+    os.getenv("ITINERARY_MIN_CONNECTION_MINUTES", 45)
+)
+ITINERARY_MAX_LAYOVER_HOURS = int(os.getenv("ITINERARY_MAX_LAYOVER_HOURS", 24))
+ITINERARY_MAX_EXPANSIONS = 10000
+ITINERARY_INDEX_MAX_AGE = int(os.getenv("ITINERARY_INDEX_MAX_AGE", 300))
+
+# Bearer token required to scrape /metrics, open when unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Serve the read actions that have an async variant (flight list and
+# detail, route list) from async views. Only worth it under ASGI.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "false").lower() in ("true", "1")
+
+# Requests slower than this are logged as warnings
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", 1000))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "airport_service.requests": {
+            "handlers": ["console"],
+            "level": os.getenv("REQUEST_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
+}
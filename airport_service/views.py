@@ -0,0 +1,33 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+
+
+def metrics(request):
+    """Prometheus exposition of airport_service.metrics, merged across
+    worker processes when PROMETHEUS_MULTIPROC_DIR is set.
+
+    Everything is read from memory or from the multiprocess directory,
+    never from the database. When METRICS_TOKEN is set, scrapers have
+    to send it as a bearer token.
+    """
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponse(status=401)
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)